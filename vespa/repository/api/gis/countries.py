@@ -0,0 +1,135 @@
+# /gis/countries.py
+
+import json
+import logging
+import threading
+import time
+
+import numpy as np
+import shapely
+from shapely.geometry.geo import shape
+
+from .intersections import GeometryIntersect
+from ..config import VespaClient
+
+logger = logging.getLogger(__name__)
+
+
+class CountryIndex:
+    """
+    An in-process spatial index of the ISO 3166 country geometries, for assigning `ccodes` without a Vespa query per
+    feature.
+
+    The geometries of the `iso3166` namespace are fetched from Vespa once per process (see `shared`), prepared, and
+    held in a shapely STRtree, so each lookup is a tree query followed by exact intersection tests against prepared
+    geometries. Lookups may be made for single geometries or for whole arrays of geometries or points at once.
+    """
+
+    NAMESPACE = "iso3166"
+    MAX_HITS = 400  # Vespa's default maximum number of hits per query; there are c.250 countries
+    RETRY_INTERVAL = 60  # Seconds before retrying a failed or empty load
+
+    _shared = None
+    _lock = threading.Lock()
+    _failed_at = None
+
+    def __init__(self, countries):
+        """
+        :param countries: List of (ISO 3166-1 alpha-2 code, shapely geometry) tuples. A country may appear more than
+                          once (e.g. once per location).
+        """
+        self.codes = np.array([code for code, _ in countries], dtype=object)
+        geometries = np.array([geometry for _, geometry in countries], dtype=object)
+        shapely.prepare(geometries)
+        self.tree = shapely.STRtree(geometries)
+
+    @classmethod
+    def load(cls):
+        """
+        Fetches the country geometries from Vespa.
+
+        :return: A CountryIndex, or None if no countries were found.
+        """
+        with VespaClient.sync_context("feed") as sync_app:
+            response = sync_app.query({
+                "yql": f'select meta, locations from sources place where namespace contains "{cls.NAMESPACE}"',
+                "hits": cls.MAX_HITS,
+            }).json
+        if "error" in response:
+            raise ValueError(f"Error during Vespa query: {response['error']}")
+        root = response.get("root", {})
+        children = root.get("children", [])
+        if root.get("fields", {}).get("totalCount", 0) > len(children):
+            logger.warning(f"Country index truncated to {len(children)} of {root['fields']['totalCount']} countries")
+
+        countries = []
+        for child in children:
+            fields = child.get("fields", {})
+            code = json.loads(fields["meta"]).get("ISO_A2") if fields.get("meta") else None
+            if not code or code == "-":
+                continue
+            for location in fields.get("locations", []):
+                countries.append((code, shape(json.loads(location["geometry"]))))
+        if not countries:
+            return None
+        logger.info(f"Loaded country index of {len(countries)} geometries")
+        return cls(countries)
+
+    @classmethod
+    def shared(cls):
+        """
+        :return: The index of this process, loaded on first use, or None if it cannot be loaded (loading is retried
+                 after RETRY_INTERVAL seconds).
+        """
+        if cls._shared is None:
+            with cls._lock:
+                if cls._shared is None and (cls._failed_at is None
+                                            or time.monotonic() - cls._failed_at >= cls.RETRY_INTERVAL):
+                    try:
+                        cls._shared = cls.load()
+                    except Exception as e:
+                        logger.error(f"Error loading country index: {e}", exc_info=True)
+                    if cls._shared is None:
+                        logger.warning("Country index not available: falling back to Vespa intersection queries")
+                        cls._failed_at = time.monotonic()
+        return cls._shared
+
+    def _group(self, pairs, count):
+        grouped = [set() for _ in range(count)]
+        for input_index, tree_index in zip(*pairs):
+            grouped[input_index].add(self.codes[tree_index])
+        return [sorted(codes) for codes in grouped]
+
+    def intersecting(self, geometries) -> list:
+        """
+        :param geometries: Array-like of shapely geometries.
+        :return: For each geometry, the sorted list of codes of the countries it intersects.
+        """
+        geometries = np.asarray(geometries, dtype=object)
+        return self._group(self.tree.query(geometries, predicate="intersects"), len(geometries))
+
+    def containing_points(self, lats, lngs) -> list:
+        """
+        :param lats: Array-like of latitudes.
+        :param lngs: Array-like of longitudes.
+        :return: For each point, the sorted list of codes of the countries it falls within (or on the border of).
+        """
+        return self.intersecting(shapely.points(np.asarray(lngs, dtype=float), np.asarray(lats, dtype=float)))
+
+
+def country_codes(geom, bbox=None) -> list:
+    """
+    Resolves the ISO 3166-1 alpha-2 codes of the countries intersecting a geometry, using the shared CountryIndex, or a
+    Vespa intersection query if the index is not available.
+
+    :param geom: Shapely geometry.
+    :param bbox: Optional Vespa bounding box of the geometry (see `vespa_bbox`), used only by the fallback.
+    :return: Sorted list of country codes.
+    """
+    index = CountryIndex.shared()
+    if index is not None:
+        return index.intersecting([geom])[0]
+    return [
+        meta["ISO_A2"] for result in GeometryIntersect(geom=geom, bbox=bbox).resolve()
+        if "meta" in result and (meta := json.loads(result["meta"]))["ISO_A2"] != "-"
+    ]
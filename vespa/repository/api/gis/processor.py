@@ -5,7 +5,7 @@ import logging
 from shapely.geometry.geo import shape
 from shapely.io import to_geojson
 
-from .intersections import GeometryIntersect
+from .countries import country_codes
 from .utils import get_valid_geom, vespa_bbox, geo_to_cartesian
 from ..dates.dates import year_from_value
 
@@ -51,12 +51,7 @@ class GeometryProcessor:
 
         bbox = vespa_bbox(self.geom) if "bbox" in self.values or "ccodes" in self.values else {}
         convex_hull = self.geom.convex_hull if "convex_hull" in self.values else None
-        iso_results = GeometryIntersect(geom=self.geom, bbox=bbox).resolve() if "ccodes" in self.values and bbox else {}
-        # Remove "-" from the list of ISO codes if present
-        iso_codes = [
-            meta["ISO_A2"] for result in iso_results
-            if "meta" in result and (meta := json.loads(result["meta"]))["ISO_A2"] != "-"
-        ] or {}
+        iso_codes = country_codes(self.geom, bbox) if "ccodes" in self.values and bbox else {}
         representative_point = (
             {"lat": (rp := self.geom.representative_point()).y, "lng": rp.x}
             if "representative_point" in self.values
@@ -1,8 +1,10 @@
 # /gis/utils.py
 import logging
 import math
+import threading
 from typing import Optional, Tuple
 
+import numpy as np
 import pyproj
 from fastapi import Query, HTTPException, Depends
 from shapely.geometry.geo import shape, mapping
@@ -10,8 +12,19 @@ from shapely.validation import explain_validity
 
 logger = logging.getLogger(__name__)
 
-# Define transformer once for efficiency
-_wgs84_to_ecef = pyproj.Transformer.from_crs("EPSG:4326", "EPSG:4978", always_xy=True).transform
+_transformers = threading.local()
+
+
+def _wgs84_to_ecef():
+    """
+    :return: The WGS84 to ECEF transformer of the current thread, created on first use. pyproj Transformers are costly
+             to create and must not be shared between threads.
+    """
+    transformer = getattr(_transformers, "wgs84_to_ecef", None)
+    if transformer is None:
+        transformer = _transformers.wgs84_to_ecef = pyproj.Transformer.from_crs("EPSG:4326", "EPSG:4978",
+                                                                                 always_xy=True)
+    return transformer
 
 
 def geo_to_cartesian(lat: float, lon: float, elevation: float = 0) -> Tuple[float, float, float]:
@@ -19,7 +32,7 @@ def geo_to_cartesian(lat: float, lon: float, elevation: float = 0) -> Tuple[floa
     Converts geographic coordinates (latitude, longitude) to 3D Cartesian (ECEF).
     Uses WGS84 ellipsoid.
     """
-    result = _wgs84_to_ecef(lon, lat, elevation)
+    result = _wgs84_to_ecef().transform(lon, lat, elevation)
 
     if isinstance(result, tuple) and len(result) == 3:
         return result
@@ -28,6 +41,30 @@ def geo_to_cartesian(lat: float, lon: float, elevation: float = 0) -> Tuple[floa
         return 0.0, 0.0, 0.0
 
 
+def geo_to_cartesian_array(lats, lons=None, elevations=0) -> np.ndarray:
+    """
+    Converts arrays of geographic coordinates to 3D Cartesian (ECEF) in a single pyproj call.
+    Uses WGS84 ellipsoid.
+
+    :param lats: Array-like of latitudes, or (if `lons` is None) of (lat, lon) points.
+    :param lons: Array-like of longitudes.
+    :param elevations: Array-like of elevations, or a single elevation for all points.
+    :return: Array of shape (n, 3); rows of points with non-finite coordinates are NaN.
+    """
+    if lons is None:
+        points = np.asarray(lats, dtype=float).reshape(-1, 2)
+        lats, lons = points[:, 0], points[:, 1]
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    elevations = np.broadcast_to(np.asarray(elevations, dtype=float), lats.shape)
+
+    result = np.full((len(lats), 3), np.nan)
+    valid = np.isfinite(lats) & np.isfinite(lons) & np.isfinite(elevations)
+    if valid.any():
+        result[valid] = np.column_stack(_wgs84_to_ecef().transform(lons[valid], lats[valid], elevations[valid]))
+    return result
+
+
 def vespa_bbox(geom) -> dict:
     """
     Calculate the bounding box of a Shapely geometry and return it in Vespa-friendly format.
@@ -0,0 +1,120 @@
+# /ingestion/checkpoint.py
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionCheckpoint:
+    """
+    Sidecar record of the progress of one file of a dataset ingestion, allowing an interrupted run to be resumed.
+
+    The state records:
+        - source_records: Number of raw source records consumed (transformed, or rejected by filters).
+        - source_offset: Byte offset of the source up to which records have been consumed (sharded reads only).
+        - output_offsets: Byte sizes of the transformed output files matching `source_records`.
+        - transform_complete: Whether transformation of the source has finished.
+        - fed: Number of leading records of each transformed output file that have been fed to Vespa.
+        - feed_complete: Whether each transformed output file has been fully fed.
+
+    The file is written atomically (write to a temporary file, then rename), so a crash during `save` leaves the
+    previous checkpoint intact.
+    """
+
+    DOC_TYPES = ["place", "toponym", "link"]
+
+    def __init__(self, path, interval=60):
+        """
+        :param path: Path of the sidecar JSON file.
+        :param interval: Minimum number of seconds between throttled saves.
+        """
+        self.path = path
+        self.interval = interval
+        self.last_saved = 0
+        self.state = self._initial_state()
+
+    @staticmethod
+    def _initial_state():
+        return {
+            "source_records": 0,
+            "source_offset": 0,
+            "output_offsets": {doc_type: 0 for doc_type in IngestionCheckpoint.DOC_TYPES},
+            "transform_complete": False,
+            "fed": {doc_type: 0 for doc_type in IngestionCheckpoint.DOC_TYPES},
+            "feed_complete": {doc_type: False for doc_type in IngestionCheckpoint.DOC_TYPES},
+        }
+
+    def load(self) -> bool:
+        """
+        Loads the checkpoint from disk.
+
+        :return: True if a checkpoint was found.
+        """
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, "r") as f:
+            self.state = {**self._initial_state(), **json.load(f)}
+        logger.info(f"Loaded checkpoint {self.path}: {self.state}")
+        return True
+
+    def reset(self):
+        """
+        Discards any saved progress.
+        """
+        self.state = self._initial_state()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+            logger.info(f"Deleted existing checkpoint: {self.path}")
+
+    def due(self) -> bool:
+        """
+        :return: True if at least `interval` seconds have passed since the last save.
+        """
+        return time.monotonic() - self.last_saved >= self.interval
+
+    def save(self):
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(self.state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_path, self.path)
+        self.last_saved = time.monotonic()
+
+    def record_transform(self, source_records, output_offsets, complete=False, source_offset=None):
+        self.state["source_records"] = source_records
+        if source_offset is not None:
+            self.state["source_offset"] = source_offset
+        self.state["output_offsets"] = output_offsets
+        self.state["transform_complete"] = complete
+        self.save()
+
+    def record_feed(self, doc_type, position, complete=False):
+        self.state["fed"][doc_type] = position
+        self.state["feed_complete"][doc_type] = complete
+        if complete or self.due():
+            self.save()
+
+    @property
+    def source_records(self) -> int:
+        return self.state["source_records"]
+
+    @property
+    def source_offset(self) -> int:
+        return self.state["source_offset"]
+
+    @property
+    def output_offsets(self) -> dict:
+        return self.state["output_offsets"]
+
+    @property
+    def transform_complete(self) -> bool:
+        return self.state["transform_complete"]
+
+    def fed(self, doc_type) -> int:
+        return self.state["fed"].get(doc_type, 0)
+
+    def feed_complete(self, doc_type) -> bool:
+        return self.state["feed_complete"].get(doc_type, False)
@@ -0,0 +1,417 @@
+# /ingestion/condensation.py
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import zlib
+
+from ..bcp_47.bcp_47 import bcp47_fields
+from ..utils import task_tracker, escape_yql, distinct_dicts
+
+logger = logging.getLogger(__name__)
+
+
+class _Condenser:
+    """
+    Base of the bulk condensers: holds the feeder and a local SQLite work file, which is rebuilt from Vespa by each
+    run and removed once condensation succeeds.
+    """
+
+    BATCH_SIZE = 1000  # Rows per SQLite insert
+    SCHEMA = ""  # Work file tables
+
+    def __init__(self, feeder, work_path, task_id=None, workers=8):
+        """
+        :param feeder: An open DocumentFeeder for the namespace.
+        :param work_path: Path of the SQLite work file (replaced if it exists, and removed on success).
+        :param task_id: Ingestion task to report progress to (optional).
+        :param workers: Number of slices visited concurrently (and of concurrent workers, where used).
+        """
+        self.feeder = feeder
+        self.work_path = work_path
+        self.task_id = task_id
+        self.workers = workers
+        self._connection = None
+        self._lock = threading.Lock()
+
+    async def condense(self):
+        """
+        Runs all stages of condensation.
+        """
+        await asyncio.to_thread(self._open)
+        try:
+            await self._condense()
+        finally:
+            await asyncio.to_thread(self._close)
+        await asyncio.to_thread(os.remove, self.work_path)
+
+    async def _condense(self):
+        raise NotImplementedError
+
+    def _open(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.work_path + suffix):
+                os.remove(self.work_path + suffix)
+        self._connection = sqlite3.connect(self.work_path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=OFF")  # Work file: rebuilt from Vespa if lost
+        self._connection.executescript(self.SCHEMA)
+
+    def _close(self):
+        if self._connection:
+            self._connection.close()
+            self._connection = None
+
+    def _execute(self, sql, parameters=()):
+        with self._lock:
+            result = self._connection.execute(sql, parameters).fetchall()
+            self._connection.commit()
+            return result
+
+    def _insert(self, sql, rows):
+        with self._lock:
+            self._connection.executemany(sql, rows)
+            self._connection.commit()
+
+    def _update_task(self, updates):
+        if self.task_id:
+            task_tracker.update_task(self.task_id, updates)
+
+
+class ToponymCondenser(_Condenser):
+    """
+    Merges the staged toponyms of a namespace into the toponyms that already exist for the same name and BCP 47
+    fields, in bulk:
+
+    1. Enumerate: the staged toponyms are visited (over parallel slices) and recorded in a local SQLite work file,
+       partitioned by a hash of their name.
+    2. Resolve: each partition is grouped by name and BCP 47 fields in memory, and the existing (unstaged) toponyms of
+       its names are found with one query per chunk of names. The oldest toponym of each group survives: it is
+       unstaged and given the places of the others. Partitions are resolved one at a time, so that no more than the
+       feeder's `max_in_flight` requests are in flight.
+    3. Rewrite: each place that referred to a merged toponym is read and updated once, with all of its references
+       replaced.
+    4. Delete: the merged toponyms are deleted.
+
+    A staged toponym is deleted only once its survivor has been updated and every place that referred to it has been
+    rewritten. Any other staged toponym is kept, so it is merged by a later run, and an interrupted condensation can
+    simply be run again.
+
+    Usage:
+        async with DocumentFeeder(VespaClient.get_url("feed"), namespace, task_id) as feeder:
+            await ToponymCondenser(feeder, work_path, task_id).condense()
+    """
+
+    NAMES_PER_QUERY = 50  # Names looked up per query of existing toponyms
+    MAX_HITS = 400  # Vespa's default maximum number of hits per query
+    SCHEMA = """
+        CREATE TABLE staged (partition INTEGER, key TEXT, id TEXT, created INTEGER, places TEXT);
+        CREATE TABLE remaps (place_id TEXT, toponym_id TEXT, survivor_id TEXT);
+        CREATE INDEX remaps_toponym_id ON remaps (toponym_id);
+        CREATE TABLE merged (id TEXT PRIMARY KEY);
+        CREATE TABLE rewritten (place_id TEXT PRIMARY KEY);
+    """
+
+    def __init__(self, feeder, work_path, task_id=None, partitions=64, workers=8):
+        """
+        :param feeder: An open DocumentFeeder for the namespace.
+        :param work_path: Path of the SQLite work file (replaced if it exists, and removed on success).
+        :param task_id: Ingestion task to report progress to (optional).
+        :param partitions: Number of name-hash partitions.
+        :param workers: Number of slices visited concurrently.
+        """
+        super().__init__(feeder, work_path, task_id, workers)
+        self.partitions = partitions
+
+    async def _condense(self):
+        staged = await self._enumerate()
+        logger.info(f"Found {staged} staged toponyms")
+        if staged:
+            for partition in range(self.partitions):
+                await self._resolve_partition(partition)
+            await self._rewrite_places()
+            await self._delete_merged()
+
+    @staticmethod
+    def _key(fields):
+        """
+        :return: The grouping key of a toponym: its name and BCP 47 fields, as a JSON array.
+        """
+        values = [fields.get("name_strict", ""), *(fields.get(f"bcp47_{field}") or "" for field in bcp47_fields)]
+        return json.dumps(values, ensure_ascii=False)
+
+    async def _enumerate(self):
+        """
+        Visits the staged toponyms of the namespace into the work file.
+
+        :return: Number of staged toponyms.
+        """
+        field_set = "toponym:" + ",".join(["name_strict", "places", "created", *(f"bcp47_{f}" for f in bcp47_fields)])
+        rows = []
+        count = 0
+        async for document in self.feeder.visit("toponym", selection="toponym.is_staging==true", field_set=field_set,
+                                                slices=self.workers):
+            fields = document.get("fields", {})
+            key = self._key(fields)
+            # Partitioned by name, so that all groups that could share a surviving toponym are resolved together
+            partition = zlib.crc32(fields.get("name_strict", "").encode("utf-8")) % self.partitions
+            rows.append((partition, key, document["id"].split("::")[-1],
+                         fields.get("created") or 0, json.dumps(fields.get("places", []))))
+            if len(rows) >= self.BATCH_SIZE:
+                count += len(rows)
+                await asyncio.to_thread(self._insert, "INSERT INTO staged VALUES (?, ?, ?, ?, ?)", rows)
+                rows = []
+        if rows:
+            count += len(rows)
+            await asyncio.to_thread(self._insert, "INSERT INTO staged VALUES (?, ?, ?, ?, ?)", rows)
+        await asyncio.to_thread(self._execute, "CREATE INDEX staged_partition ON staged (partition, key, created)")
+        return count
+
+    async def _existing_toponyms(self, names):
+        """
+        Finds the unstaged toponyms with any of the given names, splitting the query if it would exceed MAX_HITS.
+
+        :return: List of toponym field dictionaries, each including `documentid`.
+        """
+        fields = ", ".join(["documentid", "name_strict", "places", "created", *(f"bcp47_{f}" for f in bcp47_fields)])
+        yql = (f"select {fields} from toponym where is_staging = false and name_strict in ("
+               + ", ".join(f'"{escape_yql(name)}"' for name in names) + ")")
+        root = await self.feeder.query(yql, hits=self.MAX_HITS)
+        children = root.get("children", [])
+        if root.get("fields", {}).get("totalCount", 0) > len(children):
+            if len(names) > 1:
+                middle = len(names) // 2
+                return await self._existing_toponyms(names[:middle]) + await self._existing_toponyms(names[middle:])
+            logger.warning(f"More than {self.MAX_HITS} existing toponyms named {names[0]}: "
+                           f"merging with the oldest found")
+        return [child.get("fields", {}) for child in children]
+
+    async def _resolve_partition(self, partition):
+        """
+        Chooses the surviving toponym of each group in a partition, unstages it and gives it the places of the
+        group, and records the references to rewrite and the toponyms to delete for every group whose survivor was
+        updated successfully (or needed no update).
+        """
+        rows = await asyncio.to_thread(
+            self._execute, "SELECT key, id, created, places FROM staged WHERE partition = ? ORDER BY key, created",
+            (partition,))
+        groups = {}
+        for key, toponym_id, created, places in rows:
+            groups.setdefault(key, []).append({"id": toponym_id, "created": created, "places": json.loads(places)})
+        if not groups:
+            return
+
+        keys = list(groups)
+        names = sorted({json.loads(key)[0] for key in keys})
+        existing = {}  # Name to list of existing toponyms
+        for start in range(0, len(names), self.NAMES_PER_QUERY):
+            for toponym in await self._existing_toponyms(names[start:start + self.NAMES_PER_QUERY]):
+                existing.setdefault(toponym.get("name_strict", ""), []).append(toponym)
+
+        updates = {}  # Survivor ID to update, with the IDs of the toponyms merged into it as "losers"
+        resolved = []  # Toponyms merged into survivors that need no update
+        for key in keys:
+            name, *bcp47_values = json.loads(key)
+            staged = groups[key]
+            # An existing toponym matches if it has every BCP 47 field that the staged toponyms have
+            candidates = [
+                toponym for toponym in existing.get(name, [])
+                if all(not value or toponym.get(f"bcp47_{field}") == value
+                       for field, value in zip(bcp47_fields, bcp47_values))
+            ]
+            places = {place for toponym in staged for place in toponym["places"]}
+            if candidates:
+                survivor = min(candidates, key=lambda toponym: toponym.get("created") or 0)
+                _, namespace, _, _, survivor_id = survivor["documentid"].split(":", 4)  # id:<ns>:toponym::<id>
+                losers = [(toponym, survivor_id) for toponym in staged]
+                if survivor_id in updates:  # Survivor shared with an earlier group: one update carries both
+                    update = updates[survivor_id]
+                    update["fields"]["places"] = sorted(places.union(update["fields"]["places"]))
+                    update["losers"].extend(losers)
+                elif not places.issubset(survivor.get("places", [])):
+                    updates[survivor_id] = {"id": survivor_id, "namespace": namespace, "losers": losers,
+                                            "fields": {"places": sorted(places.union(survivor.get("places", [])))}}
+                else:
+                    resolved.extend(losers)
+            else:
+                survivor_id = staged[0]["id"]  # Oldest staged toponym
+                updates[survivor_id] = {"id": survivor_id, "losers": [(toponym, survivor_id) for toponym in staged[1:]],
+                                        "fields": {"is_staging": False, "places": sorted(places)}}
+
+        async def update_stream():
+            for update in updates.values():
+                yield update
+
+        stats = await self.feeder.update("toponym", update_stream(),
+                                         on_success=lambda update: resolved.extend(update["losers"]))
+        remaps = [(place_id, toponym["id"], survivor_id) for toponym, survivor_id in resolved
+                  for place_id in toponym["places"]]
+        await asyncio.to_thread(self._insert, "INSERT INTO remaps VALUES (?, ?, ?)", remaps)
+        await asyncio.to_thread(self._insert, "INSERT OR IGNORE INTO merged VALUES (?)",
+                                [(toponym["id"],) for toponym, _ in resolved])
+        self._update_task({"unstaged_toponyms": len(rows)})
+        logger.info(f"Resolved partition {partition}: {len(keys)} groups, {len(rows)} staged toponyms, "
+                    f"{len(resolved)} merged, {stats['failure']} survivor updates failed")
+
+    async def _rewrite_places(self):
+        """
+        Replaces every reference to a merged toponym in the names of places, with one update per place.
+        """
+        rows = await asyncio.to_thread(
+            self._execute, "SELECT place_id, toponym_id, survivor_id FROM remaps ORDER BY place_id")
+
+        async def place_stream():
+            item = None
+            for place_id, toponym_id, survivor_id in rows:
+                if item is None or item["id"] != place_id:
+                    if item is not None:
+                        yield item
+                    item = {"id": place_id, "remaps": {}}
+                item["remaps"][toponym_id] = survivor_id
+            if item is not None:
+                yield item
+
+        def rewrite_names(item, fields):
+            names = fields.get("names", [])
+            changed = False
+            for name in names:
+                if name.get("toponym_id") in item["remaps"]:
+                    name["toponym_id"] = item["remaps"][name["toponym_id"]]
+                    changed = True
+            return {"names": names} if changed else None
+
+        rewritten = []
+        logger.info(f"Rewriting {len(rows)} toponym references in places")
+        stats = await self.feeder.rewrite("place", place_stream(), rewrite_names,
+                                          on_success=lambda item: rewritten.append((item["id"],)))
+        await asyncio.to_thread(self._insert, "INSERT OR IGNORE INTO rewritten VALUES (?)", rewritten)
+        logger.info(f"Rewrote {stats['success']} places ({stats['failure']} failed)")
+
+    async def _delete_merged(self):
+        """
+        Deletes the merged toponyms whose references have all been rewritten.
+        """
+        rows = await asyncio.to_thread(
+            self._execute,
+            "SELECT id FROM merged WHERE NOT EXISTS ("
+            "SELECT 1 FROM remaps WHERE remaps.toponym_id = merged.id AND remaps.place_id NOT IN ("
+            "SELECT place_id FROM rewritten))")
+
+        async def merged_stream():
+            for (toponym_id,) in rows:
+                yield {"id": toponym_id}
+
+        logger.info(f"Deleting {len(rows)} merged toponyms")
+        await self.feeder.remove("toponym", merged_stream())
+
+
+class PlaceCondenser(_Condenser):
+    """
+    Merges the staged places of a namespace (partial places carrying the `record_id` of the place they belong to)
+    into their places, in bulk:
+
+    1. Enumerate: the staged places are visited (over parallel slices) into a local SQLite work file.
+    2. Merge: the staged places are streamed from the work file grouped by `record_id`, and each place is read and
+       updated once, with the names and locations of all of its staged places merged into its own (without
+       duplicates). Up to the feeder's `max_in_flight` places are merged concurrently.
+    3. Delete: the staged places of every place merged successfully are deleted.
+
+    A staged place whose place is missing or could not be updated is kept, so it is merged by a later run.
+
+    Usage:
+        async with DocumentFeeder(VespaClient.get_url("feed"), namespace, task_id) as feeder:
+            await PlaceCondenser(feeder, work_path, task_id).condense()
+    """
+
+    MERGED_FIELDS = ["names", "locations"]
+    PAGE_SIZE = 1000  # Places read from the work file at a time
+    SCHEMA = """
+        CREATE TABLE staged (record_id TEXT, id TEXT, fields TEXT);
+        CREATE TABLE merged (record_id TEXT PRIMARY KEY);
+    """
+
+    async def _condense(self):
+        staged = await self._enumerate()
+        logger.info(f"Found {staged} staged places")
+        if staged:
+            await self._merge()
+            await self._delete_merged()
+
+    async def _enumerate(self):
+        """
+        Visits the staged places of the namespace into the work file.
+
+        :return: Number of staged places.
+        """
+        rows = []
+        count = 0
+        async for document in self.feeder.visit("place", selection="place.is_staging==true",
+                                                field_set="place:" + ",".join(["record_id", *self.MERGED_FIELDS]),
+                                                slices=self.workers):
+            fields = document.get("fields", {})
+            if not fields.get("record_id"):
+                continue
+            rows.append((fields["record_id"], document["id"].split("::")[-1],
+                         json.dumps({field: fields[field] for field in self.MERGED_FIELDS if fields.get(field)})))
+            if len(rows) >= self.BATCH_SIZE:
+                count += len(rows)
+                await asyncio.to_thread(self._insert, "INSERT INTO staged VALUES (?, ?, ?)", rows)
+                rows = []
+        if rows:
+            count += len(rows)
+            await asyncio.to_thread(self._insert, "INSERT INTO staged VALUES (?, ?, ?)", rows)
+        await asyncio.to_thread(self._execute, "CREATE INDEX staged_record_id ON staged (record_id)")
+        return count
+
+    async def _merge(self):
+        """
+        Merges the staged places of each place into it, with one read and one update per place.
+        """
+        async def place_stream():
+            last = ""
+            while True:
+                rows = await asyncio.to_thread(
+                    self._execute,
+                    "SELECT record_id, fields FROM staged WHERE record_id IN ("
+                    "SELECT DISTINCT record_id FROM staged WHERE record_id > ? ORDER BY record_id LIMIT ?"
+                    ") ORDER BY record_id", (last, self.PAGE_SIZE))
+                if not rows:
+                    return
+                item = None
+                for record_id, fields in rows:
+                    if item is None or item["id"] != record_id:
+                        if item is not None:
+                            yield item
+                        item = {"id": record_id, "fields": {field: [] for field in self.MERGED_FIELDS}}
+                    for field, values in json.loads(fields).items():
+                        item["fields"][field].extend(values)
+                yield item
+                last = item["id"]
+
+        def merge_fields(item, fields):
+            merged = {}
+            for field, values in item["fields"].items():
+                existing = fields.get(field, [])
+                if values and len(combined := distinct_dicts(existing, values)) > len(existing):
+                    merged[field] = combined
+            return merged or None
+
+        merged = []
+        stats = await self.feeder.rewrite("place", place_stream(), merge_fields,
+                                          on_success=lambda item: merged.append((item["id"],)))
+        await asyncio.to_thread(self._insert, "INSERT OR IGNORE INTO merged VALUES (?)", merged)
+        logger.info(f"Merged staged places into {stats['success']} places ({stats['failure']} failed)")
+
+    async def _delete_merged(self):
+        rows = await asyncio.to_thread(
+            self._execute, "SELECT id FROM staged WHERE record_id IN (SELECT record_id FROM merged)")
+
+        async def staged_stream():
+            for (place_id,) in rows:
+                yield {"id": place_id}
+
+        logger.info(f"Deleting {len(rows)} merged staged places")
+        await self.feeder.remove("place", staged_stream(),
+                                 on_success=lambda item: self._update_task({"unstaged_places": 1}))
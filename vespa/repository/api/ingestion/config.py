@@ -35,10 +35,12 @@ REMOTE_DATASET_CONFIGS = [
                 'file_name': 'allCountries.txt',
                 'file_type': 'csv',
                 'delimiter': '\t',
+                'quote_char': False,  # GeoNames fields are never quoted, and names may contain quotation marks
+                'column_types': {'latitude': 'float64', 'longitude': 'float64'},
             },
             {
                 'url': 'https://download.geonames.org/export/dump/alternateNamesV2.zip',  # 193MB
-                'update_place': True,  # Update existing place with alternate names
+                'update_place': True,  # Alternate names are grouped into one update of each existing place
                 'fieldnames': [
                     'alternateNameId', 'geonameid', 'isolanguage', 'alternate_name', 'isPreferredName',
                     'isShortName', 'isColloquial', 'isHistoric', 'from', 'to',
@@ -46,6 +48,7 @@ REMOTE_DATASET_CONFIGS = [
                 'file_name': 'alternateNamesV2.txt',  # Zip file also includes iso-languagecodes.txt
                 'file_type': 'csv',
                 'delimiter': '\t',
+                'quote_char': False,
                 'filters': [
                     lambda row: row.get('isolanguage') not in ['post', 'link', 'iata', 'icao', 'faac', 'tcid', 'unlc',
                                                                'abbr'],
@@ -65,7 +68,10 @@ REMOTE_DATASET_CONFIGS = [
                 'local_name': 'tgn_explicit.zip',  # 1.2GB
                 'file_name': 'TGNOut_PlaceMap.nt', # 2.3GB
                 'ld_file': 'tgn_places.ndjson',
+                'schema': 'LinkedArtPlace',  # Schema of the `ld_file` records
                 'file_type': 'nt',
+                'predicates': ['http://xmlns.com/foaf/0.1/focus'],  # Place concept -> place; other triples are skipped
+                'distinct_subjects': True,
                 'filters': [
                     # At least one of the `identified_by` list items must have "type": "crm:E47_Spatial_Coordinates"
                     lambda doc: any(
@@ -80,6 +86,8 @@ REMOTE_DATASET_CONFIGS = [
         'dataset_name': 'Wikidata',
         'namespace': 'wd',
         'vespa_schema': 'place',
+        'transform_workers': 16,  # Number of worker processes used for filtering and transformation
+        'geonames_classes': True,  # Classify places by P1566 from a GeoNames class index, built from the GeoNames dump
         'api_item': 'https://www.wikidata.org/wiki/Special:EntityData/<id>.json',
         'citation': 'Wikidata is a free and open knowledge base that can be read and edited by both humans and machines. https://www.wikidata.org/',
         'files': [
@@ -88,8 +96,11 @@ REMOTE_DATASET_CONFIGS = [
                 'local_name': '/data/k8s/vespa-ingestion/latest-all.json.gz',
                 'file_name': '/ix1/whcdh/data/wikidata/latest-all/latest-all.json.gz',
                 'file_type': 'wikidata',
+                'external_decompressor': 'pigz',  # Plain (single-member) gzip cannot be split into blocks
                 'item_path': 'entities',
                 'item_count': 120_000_000,  # Approximate number of entities in the dump
+                'prefilter': [b'"P625"'],  # Skip decoding entities that cannot have coordinates
+                'schema': 'WikidataEntity',  # Decode only the fields used by the transformer
                 'filters': [
                     lambda doc: 'claims' in doc and 'P625' in doc['claims'],
                     # Filter to only include items with coordinates
@@ -101,6 +112,7 @@ REMOTE_DATASET_CONFIGS = [
         'dataset_name': 'OSM',
         'namespace': 'osm',
         'vespa_schema': 'place',
+        'transform_workers': 16,  # Number of worker processes used for filtering and transformation
         'api_item': 'https://nominatim.openstreetmap.org/details.php?osmtype=R&osmid=<id>&format=json',
         'citation': 'OpenStreetMap is open data, licensed under the Open Data Commons Open Database License (ODbL). https://www.openstreetmap.org/',
         'files': [
@@ -122,12 +134,16 @@ REMOTE_DATASET_CONFIGS = [
         'dataset_name': 'LOC',
         'namespace': 'loc',
         'vespa_schema': 'place',
+        'transform_workers': 8,  # Number of worker processes used for filtering and transformation
         'api_item': 'https://www.loc.gov/item/<id>/',
         'citation': 'Library of Congress. https://www.loc.gov/',
         'files': [
             {
                 'url': 'http://id.loc.gov/download/authorities/names.madsrdf.jsonld.gz',
                 'file_type': 'ndjson',  # Newline-delimited JSON
+                'external_decompressor': 'pigz',
+                'prefilter': [b'madsrdf:GeographicElement'],  # Skip decoding records that cannot pass the filter
+                'schema': 'LOCRecord',
                 'filters': [
                     lambda record: any(
                         "madsrdf:GeographicElement" in graph_item.get("@type", [])
@@ -205,6 +221,7 @@ REMOTE_DATASET_CONFIGS = [
                 'file_name': 'GB1900_gazetteer_abridged_july_2018/gb1900_abridged.csv',  # Name of file within the zip
                 'file_type': 'csv',
                 'delimiter': ',',
+                'column_types': {'latitude': 'float64', 'longitude': 'float64'},
             }
         ],
     },
@@ -0,0 +1,222 @@
+# /ingestion/decompression.py
+import bz2
+import collections
+import gzip
+import io
+import logging
+import mmap
+import os
+import re
+import shutil
+import struct
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 16 * 1024 * 1024  # Approximate number of compressed bytes decompressed per task
+PROBE_SIZE = 64 * 1024 * 1024  # Bytes searched for a second bz2 stream before falling back to serial decompression
+
+# Start of a bz2 stream: "BZh", block size 1-9, then the (byte-aligned) magic number of the first block
+BZ2_STREAM_HEADER = re.compile(rb"BZh[1-9]\x31\x41\x59\x26\x53\x59")
+
+
+class ParallelDecompressor(io.RawIOBase):
+    """
+    A read-only, non-seekable file object over a compressed file made of independently compressed blocks, which are
+    decompressed on a thread pool (zlib and bz2 release the GIL while decompressing) and returned in order.
+
+    Compressed chunks are read with `os.pread`, so tasks share one file descriptor. At most `max_pending` chunks are
+    decompressed ahead of the reader, bounding memory use.
+
+    Use `open_parallel` rather than constructing this directly.
+    """
+
+    def __init__(self, file_path, chunks, decompress, workers, max_pending=None):
+        """
+        :param file_path: Path of the compressed file.
+        :param chunks: Iterator of (start, end) byte ranges, each a concatenation of whole compressed blocks.
+        :param decompress: Callable decompressing the bytes of one range.
+        :param workers: Number of decompression threads.
+        :param max_pending: Maximum number of ranges decompressed ahead (default: 2 * workers).
+        """
+        super().__init__()
+        self.file_path = file_path
+        self._fd = os.open(file_path, os.O_RDONLY)
+        self._chunks = iter(chunks)
+        self._decompress = decompress
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decompress")
+        self._max_pending = max_pending or 2 * workers
+        self._pending = collections.deque()
+        self._buffer = memoryview(b"")
+        self._exhausted = False
+
+    def readable(self):
+        return True
+
+    def _decompress_range(self, start, end):
+        return self._decompress(os.pread(self._fd, end - start, start))
+
+    def _fill(self):
+        while not self._exhausted and len(self._pending) < self._max_pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._exhausted = True
+                break
+            self._pending.append(self._executor.submit(self._decompress_range, *chunk))
+
+    def readinto(self, b):
+        while not self._buffer:
+            self._fill()
+            if not self._pending:
+                return 0  # EOF
+            self._buffer = memoryview(self._pending.popleft().result())
+        size = min(len(b), len(self._buffer))
+        b[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            for future in self._pending:
+                future.cancel()
+            self._executor.shutdown(wait=True)
+            os.close(self._fd)
+        super().close()
+
+
+def _bz2_chunks(file_path, chunk_size=CHUNK_SIZE):
+    """
+    Yields byte ranges of a multistream bz2 file, each made of whole streams and about `chunk_size` bytes long.
+    """
+    with open(file_path, "rb") as file_obj, mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+        start = 0
+        for match in BZ2_STREAM_HEADER.finditer(mapping, 1):
+            if match.start() - start >= chunk_size:
+                yield start, match.start()
+                start = match.start()
+        yield start, len(mapping)
+
+
+def _is_multistream_bz2(file_path):
+    with open(file_path, "rb") as file_obj:
+        head = file_obj.read(PROBE_SIZE)
+    return BZ2_STREAM_HEADER.search(head, 1) is not None
+
+
+def _bgzf_block_size(header):
+    """
+    :param header: The first bytes (at least 12 plus the extra field) of a gzip member.
+    :return: The total size of the BGZF block, or None if the member has no BGZF "BC" subfield.
+    """
+    if len(header) < 12 or header[:2] != b"\x1f\x8b" or not header[3] & 4:  # FEXTRA flag
+        return None
+    extra_length = struct.unpack_from("<H", header, 10)[0]
+    extra = header[12:12 + extra_length]
+    position = 0
+    while position + 4 <= len(extra):
+        subfield_id, subfield_length = extra[position:position + 2], struct.unpack_from("<H", extra, position + 2)[0]
+        if subfield_id == b"BC" and subfield_length == 2:
+            return struct.unpack_from("<H", extra, position + 4)[0] + 1
+        position += 4 + subfield_length
+    return None
+
+
+def _is_bgzf(file_path):
+    with open(file_path, "rb") as file_obj:
+        return _bgzf_block_size(file_obj.read(512)) is not None
+
+
+def _bgzf_chunks(file_path, chunk_size=CHUNK_SIZE):
+    """
+    Yields byte ranges of a BGZF file, each made of whole blocks and about `chunk_size` bytes long. Only block headers
+    are read.
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as file_obj:
+        start = position = 0
+        while position < size:
+            file_obj.seek(position)
+            block_size = _bgzf_block_size(file_obj.read(512))
+            if block_size is None:
+                raise ValueError(f"Invalid BGZF block at offset {position} of {file_path}")
+            position += block_size
+            if position - start >= chunk_size:
+                yield start, position
+                start = position
+        if position > start:
+            yield start, position
+
+
+def open_parallel(file_path, compression, workers):
+    """
+    Opens a compressed file for parallel decompression if its format allows it: bz2 files made of multiple streams
+    (as written by pbzip2 and lbzip2), and BGZF gzip files (as written by bgzip).
+
+    :param file_path: Path of the compressed file.
+    :param compression: 'gzip' or 'bz2'.
+    :param workers: Number of decompression threads.
+    :return: A buffered binary file object, or None if the file cannot be decompressed in parallel.
+    """
+    if compression == 'bz2' and _is_multistream_bz2(file_path):
+        logger.info(f"Decompressing multistream bz2 file {file_path} with {workers} threads")
+        raw = ParallelDecompressor(file_path, _bz2_chunks(file_path), bz2.decompress, workers)
+    elif compression == 'gzip' and _is_bgzf(file_path):
+        logger.info(f"Decompressing BGZF file {file_path} with {workers} threads")
+        raw = ParallelDecompressor(file_path, _bgzf_chunks(file_path), gzip.decompress, workers)
+    else:
+        return None
+    return io.BufferedReader(raw, buffer_size=1024 * 1024)
+
+
+class ExternalDecompressor(io.RawIOBase):
+    """
+    A read-only file object over the standard output of an external decompression command (e.g. pigz, which
+    decompresses gzip using separate threads for reading, decompression, checking and writing).
+    """
+
+    def __init__(self, command, file_path):
+        super().__init__()
+        self.command = command
+        self._process = subprocess.Popen([*command, file_path], stdout=subprocess.PIPE, stdin=subprocess.DEVNULL)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        size = self._process.stdout.readinto(b)
+        if not size:
+            return_code = self._process.wait()
+            if return_code not in (0, None):
+                raise IOError(f"{' '.join(self.command)} exited with status {return_code}")
+        return size
+
+    def close(self):
+        if not self.closed:
+            if self._process.poll() is None:
+                self._process.terminate()  # Stopped reading early
+            self._process.stdout.close()
+            self._process.wait()
+        super().close()
+
+
+EXTERNAL_DECOMPRESSORS = {
+    'pigz': ['pigz', '-dc'],
+    'lbzip2': ['lbzip2', '-dc'],
+}
+
+
+def open_external(file_path, decompressor):
+    """
+    Opens a compressed file through an external decompressor, if it is installed.
+
+    :param file_path: Path of the compressed file.
+    :param decompressor: One of the keys of EXTERNAL_DECOMPRESSORS.
+    :return: A buffered binary file object, or None if the decompressor is not available.
+    """
+    command = EXTERNAL_DECOMPRESSORS[decompressor]
+    if shutil.which(command[0]) is None:
+        logger.warning(f"{command[0]} not found: falling back to single-threaded decompression")
+        return None
+    logger.info(f"Decompressing {file_path} with {command[0]}")
+    return io.BufferedReader(ExternalDecompressor(command, file_path), buffer_size=1024 * 1024)
@@ -0,0 +1,304 @@
+# /ingestion/downloader.py
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from tqdm import tqdm
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadManager:
+    """
+    Downloads a remote file to a local path, with:
+        - parallel HTTP range requests, and resumption of interrupted downloads;
+        - conditional revalidation (ETag / Last-Modified), so that an unchanged file is not fetched again;
+        - checksum verification against a configured digest or a published checksum file.
+
+    Progress is recorded in a JSON manifest beside the file (`<path>.download.json`). Data is written to `<path>.part`
+    and only renamed to `<path>` once complete and verified, so a file at `<path>` is never a truncated download.
+
+    Usage:
+        DownloadManager().download(url, file_path, checksum="sha256:...")
+    """
+
+    CHUNK_SIZE = 1024 * 1024  # Bytes per read from a response
+    SEGMENT_SIZE = 64 * 1024 * 1024  # Bytes per range request
+    SAVE_INTERVAL = 10  # Seconds between manifest saves while downloading
+    HEAD_REJECTED_STATUS_CODES = {403, 405, 501}  # Responses of servers that do not allow HEAD requests
+
+    def __init__(self, connections=8, timeout=30, max_retries=5):
+        """
+        :param connections: Maximum number of parallel range requests.
+        :param timeout: Connection and read timeout in seconds.
+        :param max_retries: Maximum number of retries per segment.
+        """
+        self.connections = connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _session(self):
+        # requests.Session is not thread-safe, so each worker thread has its own
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+            # Byte ranges and sizes refer to the file itself, not to a transfer encoding of it
+            self._local.session.headers["Accept-Encoding"] = "identity"
+        return self._local.session
+
+    @staticmethod
+    def _manifest_path(file_path):
+        return f"{file_path}.download.json"
+
+    def _load_manifest(self, file_path):
+        try:
+            with open(self._manifest_path(file_path)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_manifest(self, file_path, manifest):
+        with self._lock:
+            temporary_path = f"{self._manifest_path(file_path)}.tmp"
+            with open(temporary_path, "w") as f:
+                json.dump(manifest, f)
+            os.replace(temporary_path, self._manifest_path(file_path))
+
+    def _probe(self, url, manifest=None):
+        """
+        Requests the headers of the remote file, conditionally if a complete download is recorded. Servers that reject
+        HEAD requests are probed with a GET of the first byte instead.
+
+        :return: Tuple of (not_modified, headers).
+        """
+        headers = {}
+        if manifest and manifest.get("complete"):
+            if manifest.get("etag"):
+                headers["If-None-Match"] = manifest["etag"]
+            if manifest.get("last_modified"):
+                headers["If-Modified-Since"] = manifest["last_modified"]
+        response = self._session().head(url, headers=headers, allow_redirects=True, timeout=self.timeout)
+        if response.status_code in self.HEAD_REJECTED_STATUS_CODES:
+            logger.debug(f"HEAD request for {url} rejected (HTTP {response.status_code}): probing with a range request")
+            return self._probe_range(url, headers)
+        if response.status_code == 304:
+            return True, response.headers
+        response.raise_for_status()
+        return False, response.headers
+
+    def _probe_range(self, url, headers):
+        """
+        Requests the first byte of the remote file, reading its size and range support from the response.
+
+        :return: Tuple of (not_modified, headers), with headers as a HEAD request would have returned them.
+        """
+        with self._session().get(url, headers={**headers, "Range": "bytes=0-0"}, stream=True,
+                                 timeout=self.timeout) as response:
+            if response.status_code == 304:
+                return True, response.headers
+            response.raise_for_status()
+            probed = requests.structures.CaseInsensitiveDict(response.headers)
+            if response.status_code == 206:
+                # Content-Range: bytes 0-0/<size>, where the size may be "*" if unknown
+                size = probed.get("Content-Range", "").rpartition("/")[2]
+                probed.pop("Content-Length", None)
+                if size.isdigit():
+                    probed["Content-Length"] = size
+                    probed["Accept-Ranges"] = "bytes"
+            else:
+                probed.pop("Accept-Ranges", None)  # Range header ignored: the server cannot resume
+            return False, probed
+
+    def download(self, url, file_path, checksum=None, checksum_url=None):
+        """
+        Ensures that `file_path` holds the current, complete content of `url`.
+
+        :param url: URL of the remote file.
+        :param file_path: Local destination path.
+        :param checksum: Optional expected digest, as "<algorithm>:<hex digest>" (e.g. "sha256:ab12...").
+        :param checksum_url: Optional URL of a published checksum file (e.g. md5sums.txt), with lines of
+                             "<hex digest>  <file name>", from which the digest of the file is read.
+        :return: file_path.
+        :raises IOError: If the download cannot be completed or fails verification.
+        """
+        manifest = self._load_manifest(file_path)
+        if os.path.exists(file_path) and manifest is None:
+            # Complete file from before manifests were recorded: adopt it if its size matches the remote file
+            manifest = {"url": url, "complete": True, "size": os.path.getsize(file_path)}
+
+        try:
+            not_modified, headers = self._probe(url, manifest if os.path.exists(file_path) else None)
+        except requests.RequestException as e:
+            if os.path.exists(file_path):
+                logger.warning(f"Cannot revalidate {url} ({e}): using existing file {file_path}")
+                return file_path
+            raise
+
+        size = int(headers["Content-Length"]) if headers.get("Content-Length", "").isdigit() else None
+        etag, last_modified = headers.get("ETag"), headers.get("Last-Modified")
+
+        if os.path.exists(file_path):
+            if not_modified or self._unchanged(manifest, size, etag, last_modified):
+                logger.info(f"{file_path} is up to date with {url}")
+                if "etag" not in manifest and "last_modified" not in manifest:
+                    self._save_manifest(file_path, {**manifest, "etag": etag, "last_modified": last_modified})
+                return file_path
+            logger.info(f"{url} has changed: downloading a new copy")
+            manifest = None
+
+        expected = self._expected_digest(url, checksum, checksum_url)
+
+        # Resume only if the remote file is the same one that the partial download was fetching
+        if not (manifest and not manifest.get("complete") and manifest.get("url") == url
+                and manifest.get("etag") == etag and manifest.get("size") == size and size is not None
+                and os.path.exists(f"{file_path}.part")):
+            manifest = {"url": url, "etag": etag, "last_modified": last_modified, "size": size, "complete": False,
+                        "segments": None}
+            if os.path.exists(f"{file_path}.part"):
+                os.remove(f"{file_path}.part")
+
+        if size is not None and headers.get("Accept-Ranges", "").lower() == "bytes":
+            self._download_ranges(url, file_path, manifest)
+        else:
+            self._download_stream(url, file_path, manifest)
+
+        digest = self._verify(f"{file_path}.part", expected)
+        os.replace(f"{file_path}.part", file_path)
+        manifest.update({"complete": True, "segments": None, "checksum": digest})
+        self._save_manifest(file_path, manifest)
+        logger.info(f"File downloaded successfully to {file_path}")
+        return file_path
+
+    @staticmethod
+    def _unchanged(manifest, size, etag, last_modified):
+        """
+        :return: True if the remote file is the one recorded in the manifest of a complete download.
+        """
+        if manifest.get("etag") and etag:
+            return manifest["etag"] == etag
+        if manifest.get("last_modified") and last_modified:
+            return manifest["last_modified"] == last_modified
+        return size is None or size == manifest.get("size")  # Adopted file: only its size can be compared
+
+    def _download_ranges(self, url, file_path, manifest):
+        """
+        Downloads the file in segments over parallel range requests, writing each at its offset in the part file.
+        Completed bytes of every segment are recorded in the manifest, so an interrupted download resumes.
+        """
+        size = manifest["size"]
+        if manifest["segments"] is None:
+            manifest["segments"] = [[start, min(start + self.SEGMENT_SIZE, size), 0]
+                                    for start in range(0, size, self.SEGMENT_SIZE)]
+        part_path = f"{file_path}.part"
+        with open(part_path, "ab") as f:
+            f.truncate(size)
+
+        segments = manifest["segments"]
+        done = sum(segment[2] for segment in segments)
+        logger.info(f"Downloading {url} to {file_path} over {self.connections} connections"
+                    f"{f' (resuming at {done} of {size} bytes)' if done else ''}")
+        last_saved = [time.monotonic()]
+
+        fd = os.open(part_path, os.O_WRONLY)
+        try:
+            with tqdm(desc=os.path.basename(file_path), total=size, initial=done, unit='B', unit_scale=True,
+                      unit_divisor=1024) as bar:
+
+                def fetch(segment):
+                    for attempt in range(self.max_retries + 1):
+                        start, end, completed = segment
+                        if start + completed >= end:
+                            return
+                        try:
+                            with self._session().get(url, headers={"Range": f"bytes={start + completed}-{end - 1}"},
+                                                     stream=True, timeout=self.timeout) as response:
+                                if response.status_code != 206:
+                                    raise IOError(f"Range request not honoured: HTTP {response.status_code}")
+                                for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+                                    os.pwrite(fd, chunk, start + segment[2])
+                                    with self._lock:
+                                        segment[2] += len(chunk)
+                                    bar.update(len(chunk))
+                                    if time.monotonic() - last_saved[0] >= self.SAVE_INTERVAL:
+                                        last_saved[0] = time.monotonic()
+                                        self._save_manifest(file_path, manifest)
+                            if start + segment[2] >= end:
+                                return
+                        except (requests.RequestException, IOError) as e:
+                            if attempt >= self.max_retries:
+                                raise
+                            logger.warning(f"Retrying bytes {start + segment[2]}-{end - 1} of {url}: {e}")
+                            time.sleep(min(30, 2 ** attempt))
+
+                with ThreadPoolExecutor(max_workers=self.connections, thread_name_prefix="download") as executor:
+                    for future in [executor.submit(fetch, segment) for segment in segments]:
+                        future.result()
+        finally:
+            os.close(fd)
+            self._save_manifest(file_path, manifest)
+
+        if any(start + completed < end for start, end, completed in segments):
+            raise IOError(f"Incomplete download of {url}")
+
+    def _download_stream(self, url, file_path, manifest):
+        """
+        Downloads the file over a single connection (the server does not support range requests).
+        """
+        part_path = f"{file_path}.part"
+        logger.info(f"Downloading file from {url} to {file_path}")
+        with self._session().get(url, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            with open(part_path, 'wb') as f, tqdm(desc=os.path.basename(file_path), total=manifest["size"],
+                                                  unit='B', unit_scale=True, unit_divisor=1024) as bar:
+                for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+                    f.write(chunk)
+                    bar.update(len(chunk))
+        if manifest["size"] is not None and os.path.getsize(part_path) != manifest["size"]:
+            raise IOError(f"Incomplete download of {url}: {os.path.getsize(part_path)} of {manifest['size']} bytes")
+
+    def _expected_digest(self, url, checksum, checksum_url):
+        """
+        :return: Tuple of (algorithm, hex digest), or None if no checksum is configured.
+        """
+        if checksum:
+            algorithm, _, digest = checksum.partition(":")
+            return algorithm.lower(), digest.lower()
+        if not checksum_url:
+            return None
+        response = self._session().get(checksum_url, timeout=self.timeout)
+        response.raise_for_status()
+        file_name = os.path.basename(urllib.parse.urlparse(url).path)
+        for line in response.text.splitlines():
+            parts = line.split()
+            if len(parts) >= 2 and parts[-1].lstrip("*") == file_name:
+                digest = parts[0].lower()
+                algorithm = {32: "md5", 40: "sha1", 64: "sha256", 128: "sha512"}.get(len(digest))
+                if algorithm:
+                    return algorithm, digest
+        raise IOError(f"No checksum for {file_name} found in {checksum_url}")
+
+    def _verify(self, path, expected):
+        """
+        Verifies the digest of a file.
+
+        :return: The verified digest as "<algorithm>:<hex digest>", or None if there was nothing to verify against.
+        """
+        if expected is None:
+            return None
+        algorithm, digest = expected
+        file_hash = hashlib.new(algorithm)
+        with open(path, "rb") as f:
+            while chunk := f.read(self.CHUNK_SIZE):
+                file_hash.update(chunk)
+        if file_hash.hexdigest() != digest:
+            os.remove(path)
+            raise IOError(f"Checksum mismatch for {path}: expected {algorithm}:{digest}, got {file_hash.hexdigest()}")
+        logger.info(f"Verified {algorithm} checksum of {path}")
+        return f"{algorithm}:{digest}"
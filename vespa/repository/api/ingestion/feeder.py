@@ -0,0 +1,332 @@
+# /ingestion/feeder.py
+import asyncio
+import logging
+import random
+import time
+import urllib.parse
+
+import httpx
+
+from ..utils import task_tracker
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentFeeder:
+    """
+    Asynchronous Vespa feeder using the /document/v1 API over a multiplexed HTTP/2 client.
+
+    Documents are read from an async stream and kept in flight up to `max_in_flight` concurrent requests per doc-type
+    stream. Requests rejected with 429 or 503 (and transient connection errors) are retried with exponential backoff and
+    jitter. Per-second throughput for each stream is reported to `task_tracker` as `<doc_type>_feed_rate`.
+
+    Usage:
+        async with DocumentFeeder(VespaClient.get_url("feed"), namespace, task_id) as feeder:
+            await feeder.feed("place", stream)
+
+    See: https://docs.vespa.ai/en/reference/document-v1-api-reference.html
+    """
+
+    RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+    def __init__(self, base_url, namespace, task_id=None, max_in_flight=500, max_connections=8, max_retries=10,
+                 timeout=60, report_interval=1.0):
+        """
+        :param base_url: Base URL of the Vespa feed container.
+        :param namespace: Vespa namespace of the fed documents.
+        :param task_id: Ingestion task to report progress to (optional).
+        :param max_in_flight: Maximum number of concurrent requests per stream.
+        :param max_connections: Maximum number of HTTP/2 connections (each carries many concurrent streams).
+        :param max_retries: Maximum number of retries for throttled or transiently failing requests.
+        :param timeout: Per-request timeout in seconds.
+        :param report_interval: Seconds between throughput reports.
+        """
+        self.base_url = base_url.rstrip('/')
+        self.namespace = namespace
+        self.task_id = task_id
+        self.max_in_flight = max_in_flight
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.report_interval = report_interval
+        self.client = None
+
+    async def __aenter__(self):
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=True,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.client.aclose()
+        self.client = None
+        return False
+
+    def _document_path(self, doc_type, data_id, namespace=None):
+        return (f"/document/v1/{urllib.parse.quote(namespace or self.namespace, safe='')}/{doc_type}/docid/"
+                f"{urllib.parse.quote(str(data_id), safe='')}")
+
+    async def request(self, method, doc_type, data_id, body=None, params=None, namespace=None):
+        """
+        Sends a single document operation, retrying throttled and transient failures.
+
+        :param method: HTTP method: POST (put), PUT (update), GET or DELETE.
+        :param doc_type: Vespa document type (schema).
+        :param data_id: User-specified part of the document ID.
+        :param body: Optional JSON body.
+        :param params: Optional query parameters.
+        :param namespace: Namespace of the document, if not the feeder's own.
+        :return: The final httpx.Response.
+        """
+        return await self._send(method, self._document_path(doc_type, data_id, namespace), body, params)
+
+    async def _send(self, method, path, body=None, params=None):
+        attempt = 0
+        while True:
+            try:
+                response = await self.client.request(method, path, json=body, params=params)
+                if response.status_code not in self.RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    return response
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise
+                logger.debug(f"Transport error for {method} {path}: {e}")
+            attempt += 1
+            await asyncio.sleep(min(30.0, 0.1 * 2 ** attempt) * random.uniform(0.5, 1.0))
+
+    async def query(self, yql, **params):
+        """
+        Runs a query against the search API of the container.
+
+        :param yql: YQL query.
+        :param params: Further query parameters, e.g. hits=400.
+        :return: The `root` of the query result.
+        :raises ValueError: If the query fails.
+        """
+        response = await self._send("POST", "/search/", body={"yql": yql, **params})
+        result = response.json() if response.content else {}
+        if not response.is_success or "errors" in result.get("root", {}):
+            raise ValueError(f"Query failed: {response.status_code}, Response: {response.text[:1000]}")
+        return result.get("root", {})
+
+    async def visit(self, doc_type, selection=None, field_set=None, slices=1, max_pending=1000):
+        """
+        Visits the documents of a type in the feeder's namespace, over `slices` concurrent visitor streams.
+
+        :param doc_type: Vespa document type (schema).
+        :param selection: Optional document selection, e.g. "toponym.is_staging==true".
+        :param field_set: Optional field set, e.g. "toponym:name_strict,places".
+        :param slices: Number of slices visited concurrently.
+        :param max_pending: Maximum number of documents fetched but not yet consumed.
+        :return: Async generator of documents, each `{"id": <full document ID>, "fields": {...}}`.
+        """
+        path = f"/document/v1/{urllib.parse.quote(self.namespace, safe='')}/{doc_type}/docid"
+        queue = asyncio.Queue(maxsize=max_pending)
+        done = object()
+
+        async def visit_slice(slice_id):
+            params = {"wantedDocumentCount": 1000, "slices": slices, "sliceId": slice_id,
+                      **({"selection": selection} if selection else {}),
+                      **({"fieldSet": field_set} if field_set else {})}
+            try:
+                while True:
+                    response = await self._send("GET", path, params=params)
+                    if not response.is_success:
+                        raise ValueError(f"Visit failed: {response.status_code}, Response: {response.text[:1000]}")
+                    result = response.json()
+                    for document in result.get("documents", []):
+                        await queue.put(document)
+                    if not result.get("continuation"):
+                        break
+                    params["continuation"] = result["continuation"]
+            finally:
+                await queue.put(done)
+
+        tasks = [asyncio.create_task(visit_slice(slice_id)) for slice_id in range(slices)]
+        try:
+            remaining = slices
+            while remaining:
+                document = await queue.get()
+                if document is done:
+                    remaining -= 1
+                else:
+                    yield document
+            for task in tasks:
+                task.result()  # Raise any visit error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def feed_document(self, doc_type, data_id, fields):
+        return await self.request("POST", doc_type, data_id, body={"fields": fields})
+
+    async def update_document(self, doc_type, data_id, fields, create=False, namespace=None):
+        """
+        Sends a partial update. `fields` may contain either plain values (which are assigned) or update operations,
+        e.g. {"names": {"add": [...]}}.
+        """
+        operations = {
+            field: value if isinstance(value, dict) and len(value) == 1 and next(iter(value)) in {
+                "assign", "add", "remove", "increment", "decrement", "multiply", "divide"
+            } else {"assign": value}
+            for field, value in fields.items()
+        }
+        return await self.request("PUT", doc_type, data_id, body={"fields": operations},
+                                  params={"create": "true"} if create else None, namespace=namespace)
+
+    async def remove_document(self, doc_type, data_id):
+        return await self.request("DELETE", doc_type, data_id)
+
+    async def feed(self, doc_type, stream, start=0, on_progress=None, on_success=None):
+        """
+        Feeds every `{"id": ..., "fields": {...}}` item of an async stream as a document of the given type.
+
+        Progress is tracked as a `position`: the number of leading stream items (counted from `start`) that have all
+        completed, whether successfully or not. Because requests complete out of order, this is the point from which a
+        resumed feed can safely restart.
+
+        :param doc_type: Vespa document type (schema).
+        :param stream: Async iterator of items.
+        :param start: Position of the first item of the stream (for resumed feeds).
+        :param on_progress: Optional callable receiving the position after each throughput report.
+        :param on_success: Optional callable receiving each successfully fed item.
+        :return: Dictionary of success and failure counts, and the final position.
+        """
+        return await self._run_operations(
+            doc_type, stream, lambda item: self.feed_document(doc_type, item['id'], item['fields']),
+            f"processed_{doc_type}s", start=start, on_progress=on_progress, on_success=on_success
+        )
+
+    async def remove(self, doc_type, stream, on_success=None):
+        """
+        Removes every `{"id": ...}` item of an async stream.
+
+        :param doc_type: Vespa document type (schema).
+        :param stream: Async iterator of items.
+        :param on_success: Optional callable receiving each successfully removed item.
+        :return: Dictionary of success and failure counts.
+        """
+        return await self._run_operations(
+            doc_type, stream, lambda item: self.remove_document(doc_type, item['id']), f"deleted_{doc_type}s",
+            on_success=on_success
+        )
+
+    async def update(self, doc_type, stream, create=False, start=0, on_progress=None, on_success=None):
+        """
+        Sends a partial update for every `{"id": ..., "fields": {...}}` item of an async stream. Items may also carry
+        a "namespace", for documents outside the feeder's own namespace.
+
+        :param doc_type: Vespa document type (schema).
+        :param stream: Async iterator of items.
+        :param create: If True, documents that do not exist are created.
+        :param start: Position of the first item of the stream (for resumed updates; see `feed`).
+        :param on_progress: Optional callable receiving the position after each throughput report.
+        :param on_success: Optional callable receiving each successfully updated item.
+        :return: Dictionary of success and failure counts, and the final position.
+        """
+        return await self._run_operations(
+            doc_type, stream,
+            lambda item: self.update_document(doc_type, item['id'], item['fields'], create=create,
+                                              namespace=item.get('namespace')),
+            f"updated_{doc_type}s", start=start, on_progress=on_progress, on_success=on_success
+        )
+
+    async def rewrite(self, doc_type, stream, rewrite_fields, on_success=None):
+        """
+        Reads, rewrites and updates every `{"id": ...}` item of an async stream: each document is fetched, passed with
+        its item to `rewrite_fields(item, fields)`, and the fields returned (if any) are assigned.
+
+        :param doc_type: Vespa document type (schema).
+        :param stream: Async iterator of items.
+        :param rewrite_fields: Callable returning a dictionary of fields to assign, or None to leave the document as is.
+        :param on_success: Optional callable receiving each successfully rewritten item.
+        :return: Dictionary of success and failure counts.
+        """
+        async def operation(item):
+            response = await self.request("GET", doc_type, item['id'])
+            if not response.is_success:
+                return response
+            fields = rewrite_fields(item, response.json().get("fields", {}))
+            return await self.update_document(doc_type, item['id'], fields) if fields else response
+
+        return await self._run_operations(doc_type, stream, operation, f"updated_{doc_type}s", on_success=on_success)
+
+    async def _run_operations(self, doc_type, stream, operation, counter, start=0, on_progress=None, on_success=None):
+        """
+        Applies a document operation to every item of an async stream, keeping up to `max_in_flight` requests in
+        flight and reporting progress, throughput and failures.
+        """
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        pending = set()
+        completed = set()
+        stats = {"success": 0, "failure": 0, "position": start}
+        reporter = asyncio.create_task(self._report_throughput(doc_type, stats, on_progress))
+
+        def complete(sequence):
+            completed.add(sequence)
+            while stats["position"] in completed:
+                completed.remove(stats["position"])
+                stats["position"] += 1
+
+        async def process_item(item, sequence):
+            try:
+                response = await operation(item)
+                if response.is_success:
+                    stats["success"] += 1
+                    self._update_task({counter: 1, "success": 1})
+                    if on_success:
+                        on_success(item)
+                else:
+                    stats["failure"] += 1
+                    error_msg = (f"Failed operation on document {item['id']}: {response.status_code}, "
+                                 f"Response: {response.text}")
+                    self._update_task({counter: 1, "failure": 1, "error": error_msg})
+                    logger.error(error_msg)
+            except Exception as e:
+                stats["failure"] += 1
+                error_msg = f"Error in document operation: {e}, item: {item.get('id')}"
+                self._update_task({counter: 1, "failure": 1, "error": error_msg})
+                logger.error(error_msg, exc_info=True)
+            finally:
+                semaphore.release()
+            complete(sequence)  # Not reached if cancelled, so an unfinished item is never counted as done
+
+        try:
+            async for sequence, item in _enumerate(stream, start):
+                await semaphore.acquire()
+                task = asyncio.create_task(process_item(item, sequence))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending)
+        finally:
+            for task in pending:
+                task.cancel()
+            reporter.cancel()
+            self._update_task({f"{doc_type}_feed_rate": 0})
+
+        logger.info(f"Completed {counter}: {stats}")
+        return stats
+
+    async def _report_throughput(self, doc_type, stats, on_progress=None):
+        last_count, last_time = 0, time.monotonic()
+        while True:
+            await asyncio.sleep(self.report_interval)
+            count, now = stats["success"] + stats["failure"], time.monotonic()
+            self._update_task({f"{doc_type}_feed_rate": round((count - last_count) / (now - last_time), 1)})
+            last_count, last_time = count, now
+            if on_progress:
+                on_progress(stats["position"])
+
+    def _update_task(self, updates):
+        if self.task_id:
+            task_tracker.update_task(self.task_id, updates)
+
+
+async def _enumerate(stream, start=0):
+    async for item in stream:
+        yield start, item
+        start += 1
@@ -12,8 +12,13 @@ import pyarrow as pa
 import pyarrow.parquet as pq
 from tqdm import tqdm
 
-from config import REMOTE_DATASET_CONFIGS
-from streamer import StreamFetcher
+if __package__:
+    from .config import REMOTE_DATASET_CONFIGS
+    from .streamer import StreamFetcher
+else:  # Run as a script: the streamer uses package-relative imports, so import it through the `api` package
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from api.ingestion.config import REMOTE_DATASET_CONFIGS
+    from api.ingestion.streamer import StreamFetcher
 
 logging.basicConfig(
     level=logging.INFO,
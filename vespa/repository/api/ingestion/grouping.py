@@ -0,0 +1,122 @@
+# /ingestion/grouping.py
+import heapq
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+from ..utils import distinct_dicts
+
+logger = logging.getLogger(__name__)
+
+
+class PlaceNamesGrouper:
+    """
+    Groups the staged partial places of a transformed NDJSON file (e.g. one per GeoNames alternate name) by the place
+    they belong to, producing one partial update per place that assigns all of its names: those of the place itself,
+    read from the place files fed before (e.g. the GeoNames primary records), followed by those of its partial
+    places. Assigning the full array makes the update idempotent, so re-feeding it (on a resumed or `no_delete` run)
+    never duplicates names. Places without partial places are left out.
+
+    The files may be far larger than memory, so grouping is an external sort: the (record ID, names) pairs are read in
+    runs of `run_size`, each run is sorted in memory and spilled to a temporary file, and the sorted runs are then
+    merged with a k-way heap merge, so that all names of a place arrive together.
+
+    Input items:  {"id": ..., "fields": {"record_id": <place ID>, "names": [...], ...}}
+    Place items:  {"id": <place ID>, "fields": {"names": [...], ...}}
+    Output items: {"id": <place ID>, "fields": {"names": [...]}}, ordered by place ID
+
+    Usage:
+        groups = PlaceNamesGrouper(input_path, output_path, place_paths).group()
+    """
+
+    def __init__(self, input_path, output_path, place_paths=(), run_size=1_000_000):
+        """
+        :param input_path: Path of the transformed NDJSON file of staged partial places.
+        :param output_path: Path of the NDJSON file of grouped updates (replaced atomically once complete).
+        :param place_paths: Paths of the transformed NDJSON files of the places themselves.
+        :param run_size: Number of items sorted in memory per run.
+        """
+        self.input_path = input_path
+        self.output_path = output_path
+        self.place_paths = list(place_paths)
+        self.run_size = run_size
+
+    def group(self) -> int:
+        """
+        :return: Number of places (grouped updates) written.
+        """
+        work_path = tempfile.mkdtemp(prefix="group_", dir=os.path.dirname(self.output_path) or None)
+        try:
+            run_paths = self._write_runs(work_path)
+            groups = self._merge_runs(run_paths)
+        finally:
+            shutil.rmtree(work_path, ignore_errors=True)
+        logger.info(f"Grouped {self.input_path} into {groups} place updates: {self.output_path}")
+        return groups
+
+    def _write_runs(self, work_path) -> list:
+        run_paths = []
+        run = []
+
+        def spill():
+            # Stable sort: the names of a place keep their file order, with those of the place itself first
+            run.sort(key=lambda entry: entry[0])
+            run_paths.append(path := os.path.join(work_path, f"run_{len(run_paths)}.ndjson"))
+            with open(path, "w", encoding="utf-8") as f:
+                for entry in run:
+                    f.write(json.dumps(entry, ensure_ascii=False))
+                    f.write("\n")
+            run.clear()
+
+        for path, partial in [*((path, False) for path in self.place_paths), (self.input_path, True)]:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    item = json.loads(line)
+                    fields = item.get("fields", {})
+                    record_id = fields.get("record_id") if partial else item.get("id")
+                    names = fields.get("names")
+                    if not record_id or not names or (not partial and fields.get("is_staging")):
+                        continue
+                    run.append((str(record_id), names, partial))
+                    if len(run) >= self.run_size:
+                        spill()
+        if run:
+            spill()
+        logger.info(f"Sorted {', '.join([*self.place_paths, self.input_path])} into {len(run_paths)} runs")
+        return run_paths
+
+    def _merge_runs(self, run_paths) -> int:
+        handles = [open(path, "r", encoding="utf-8") for path in run_paths]
+        temporary_path = f"{self.output_path}.tmp"
+        groups = 0
+        try:
+            with open(temporary_path, "w", encoding="utf-8") as output:
+                def write(place_id, names):
+                    output.write(json.dumps({"id": place_id, "fields": {"names": distinct_dicts(names, [])}},
+                                            ensure_ascii=False))
+                    output.write("\n")
+
+                place_id, names, partial = None, [], False
+                for record_id, run_names, run_partial in heapq.merge(
+                        *((json.loads(line) for line in handle) for handle in handles), key=lambda entry: entry[0]):
+                    if record_id != place_id:
+                        if partial:
+                            write(place_id, names)
+                            groups += 1
+                        place_id, names, partial = record_id, [], False
+                    names.extend(run_names)
+                    partial = partial or run_partial
+                if partial:
+                    write(place_id, names)
+                    groups += 1
+            os.replace(temporary_path, self.output_path)
+        finally:
+            for handle in handles:
+                handle.close()
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+        return groups
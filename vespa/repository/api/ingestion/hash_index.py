@@ -0,0 +1,166 @@
+# /ingestion/hash_index.py
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentHashIndex:
+    """
+    On-disk index of the content hash of every document last fed to a Vespa namespace, keyed by doc type and doc ID.
+
+    Used by delta ingestion: documents whose hash is unchanged since the last run are not fed again, and documents that
+    are in the index but were not seen during the current run have vanished from the source and can be deleted.
+
+    Each row also records the ID of the run that last saw the document (see `begin_run`). Seen documents keep their previous hash until
+    they have been fed successfully, so a failed feed is retried on the next run rather than being mistaken for either
+    an unchanged or a vanished document.
+
+    The index is a SQLite database in WAL mode. All access goes through a lock, so it may be used from worker threads
+    (e.g. via asyncio.to_thread).
+    """
+
+    BATCH_SIZE = 500  # Maximum number of IDs per SQL statement (well within SQLite's parameter limit)
+
+    def __init__(self, path):
+        """
+        :param path: Path of the SQLite database file (created if missing).
+        """
+        self.path = path
+        self.run_id = None
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_type TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                hash BLOB NOT NULL,
+                run_id TEXT NOT NULL,
+                PRIMARY KEY (doc_type, doc_id)
+            ) WITHOUT ROWID
+        """)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._connection.commit()
+
+    def begin_run(self, run_id, resume=False) -> str:
+        """
+        Starts a run. When resuming, the unfinished run (if any) is continued, so that documents already seen by the
+        interrupted run are not treated as vanished.
+
+        :param run_id: Unique ID of the new run.
+        :param resume: If True, continues the unfinished run instead of starting a new one.
+        :return: The ID of the active run.
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM meta WHERE key = 'active_run'").fetchone()
+            if resume and row:
+                self.run_id = row[0]
+            else:
+                self.run_id = run_id
+                self._connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('active_run', ?)",
+                                         (run_id,))
+                self._connection.commit()
+        logger.info(f"Document hash index {self.path}: active run {self.run_id}")
+        return self.run_id
+
+    def finish_run(self):
+        """
+        Marks the active run as complete.
+        """
+        with self._lock:
+            self._connection.execute("DELETE FROM meta WHERE key = 'active_run'")
+            self._connection.commit()
+
+    @staticmethod
+    def remove_index(path):
+        """
+        Deletes an index (e.g. after the namespace has been wiped), including its WAL files.
+        """
+        if not os.path.exists(path):
+            return
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        logger.info(f"Deleted document hash index: {path}")
+
+    @staticmethod
+    def content_hash(fields) -> bytes:
+        """
+        :param fields: JSON-serializable document fields.
+        :return: A 128-bit digest of the canonical JSON serialization of the fields.
+        """
+        canonical = json.dumps(fields, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+        return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).digest()
+
+    def changed(self, doc_type, hashes) -> tuple:
+        """
+        Marks a batch of documents as seen in this run and returns those that need feeding.
+
+        :param doc_type: Vespa document type.
+        :param hashes: Dictionary of doc ID to content hash.
+        :return: Tuple of two sets of doc IDs: those not yet indexed, and those whose content has changed.
+        """
+        doc_ids = list(hashes)
+        existing = {}
+        with self._lock:
+            for i in range(0, len(doc_ids), self.BATCH_SIZE):
+                batch = doc_ids[i:i + self.BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                existing.update(self._connection.execute(
+                    f"SELECT doc_id, hash FROM documents WHERE doc_type = ? AND doc_id IN ({placeholders})",
+                    [doc_type, *batch]
+                ).fetchall())
+            self._connection.executemany(
+                "UPDATE documents SET run_id = ? WHERE doc_type = ? AND doc_id = ?",
+                [(self.run_id, doc_type, doc_id) for doc_id in existing]
+            )
+            self._connection.commit()
+        new = {doc_id for doc_id in hashes if doc_id not in existing}
+        modified = {doc_id for doc_id, content_hash in existing.items() if hashes[doc_id] != content_hash}
+        return new, modified
+
+    def record(self, doc_type, hashes):
+        """
+        Records the hashes of successfully fed documents.
+
+        :param doc_type: Vespa document type.
+        :param hashes: Dictionary of doc ID to content hash.
+        """
+        with self._lock:
+            self._connection.executemany(
+                "INSERT INTO documents (doc_type, doc_id, hash, run_id) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (doc_type, doc_id) DO UPDATE SET hash = excluded.hash, run_id = excluded.run_id",
+                [(doc_type, doc_id, content_hash, self.run_id) for doc_id, content_hash in hashes.items()]
+            )
+            self._connection.commit()
+
+    def vanished(self, doc_type) -> list:
+        """
+        :param doc_type: Vespa document type.
+        :return: IDs of indexed documents that were not seen during this run.
+        """
+        with self._lock:
+            return [row[0] for row in self._connection.execute(
+                "SELECT doc_id FROM documents WHERE doc_type = ? AND run_id != ?", (doc_type, self.run_id)
+            )]
+
+    def remove(self, doc_type, doc_ids):
+        """
+        Removes documents from the index.
+        """
+        with self._lock:
+            self._connection.executemany(
+                "DELETE FROM documents WHERE doc_type = ? AND doc_id = ?",
+                [(doc_type, doc_id) for doc_id in doc_ids]
+            )
+            self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
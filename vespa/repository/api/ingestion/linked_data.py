@@ -0,0 +1,271 @@
+# /ingestion/linked_data.py
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+import zlib
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class LinkedDataCache:
+    """
+    On-disk cache of linked-data pages (e.g. TGN JSON-LD), keyed by item ID.
+
+    Each entry holds the page as compact, single-line JSON (zlib-compressed), with the validators (ETag,
+    Last-Modified) needed to revalidate it and the time it was last fetched or revalidated. Items that do not exist
+    (HTTP 404 or 410) are cached with no body, so that they are not requested again on every run.
+
+    The cache is a SQLite database in WAL mode. Writes are committed in batches; call `close` to commit the rest.
+    Its methods are blocking, and may be called from any thread (e.g. through `asyncio.to_thread`).
+    """
+
+    COMMIT_INTERVAL = 500  # Writes between commits
+    LOOKUP_SIZE = 500  # Item IDs per query of `get_many`
+
+    def __init__(self, path):
+        """
+        :param path: Path of the SQLite database file (created if missing).
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                id TEXT PRIMARY KEY,
+                body BLOB,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self._connection.commit()
+        self._uncommitted = 0
+
+    @staticmethod
+    def _entry(row):
+        body, etag, last_modified, fetched_at = row
+        return {
+            "body": zlib.decompress(body) if body is not None else None,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": fetched_at,
+        }
+
+    def get(self, item_id):
+        """
+        :return: Dictionary of the cached entry (with `body` decompressed, or None for a missing item), or None if the
+                 item is not cached.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT body, etag, last_modified, fetched_at FROM pages WHERE id = ?", (item_id,)
+            ).fetchone()
+        return self._entry(row) if row is not None else None
+
+    def get_many(self, item_ids) -> dict:
+        """
+        :param item_ids: List of item IDs.
+        :return: Dictionary of the cached entries (as returned by `get`) by item ID. Items not cached are omitted.
+        """
+        entries = {}
+        with self._lock:
+            for start in range(0, len(item_ids), self.LOOKUP_SIZE):
+                chunk = item_ids[start:start + self.LOOKUP_SIZE]
+                rows = self._connection.execute(
+                    "SELECT id, body, etag, last_modified, fetched_at FROM pages "
+                    f"WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for item_id, *row in rows:
+                    entries[item_id] = self._entry(row)
+        return entries
+
+    def put(self, item_id, body, etag=None, last_modified=None):
+        """
+        :param body: Page as single-line JSON bytes, or None if the item does not exist.
+        """
+        body = zlib.compress(body) if body is not None else None
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO pages (id, body, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (item_id, body, etag, last_modified, time.time())
+            )
+            self._written()
+
+    def touch(self, item_id):
+        """
+        Records that a cached entry has been revalidated.
+        """
+        with self._lock:
+            self._connection.execute("UPDATE pages SET fetched_at = ? WHERE id = ?", (time.time(), item_id))
+            self._written()
+
+    def _written(self):
+        self._uncommitted += 1
+        if self._uncommitted >= self.COMMIT_INTERVAL:
+            self._connection.commit()
+            self._uncommitted = 0
+
+    def close(self):
+        with self._lock:
+            self._connection.commit()
+            self._connection.close()
+
+
+class LinkedDataFetcher:
+    """
+    Fetches linked-data pages for a stream of item IDs over one shared HTTP/2 client, backed by a `LinkedDataCache`.
+
+    Requests are issued through a sliding window: as soon as one completes, the next is started, so throughput is not
+    held back by the slowest request of a batch. Cached pages younger than `max_age` are returned without any request;
+    older ones are revalidated with a conditional GET, so a re-run transfers only new and changed pages. The cache is
+    read in batches of `window` item IDs, and read and written off the event loop.
+
+    Usage:
+        async with LinkedDataFetcher(cache_path, "https://vocab.getty.edu/tgn/{id}.jsonld") as fetcher:
+            async for item_id, body, cached in fetcher.fetch_all(ids):
+                ...
+    """
+
+    RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+    MISSING_STATUS_CODES = {404, 410}
+    MAX_AGE = 30 * 24 * 3600  # Seconds for which a cached page is used without revalidation
+
+    def __init__(self, cache_path, url_template, window=64, max_connections=16, timeout=10, max_retries=3,
+                 max_age=MAX_AGE):
+        """
+        :param cache_path: Path of the cache database.
+        :param url_template: URL of an item's page, with an `{id}` placeholder.
+        :param window: Maximum number of requests in flight.
+        :param max_connections: Maximum number of connections (HTTP/2 multiplexes many requests over each).
+        :param timeout: Per-request timeout in seconds.
+        :param max_retries: Maximum number of retries for throttled or transiently failing requests.
+        :param max_age: Seconds for which a cached page is used without revalidation.
+        """
+        self.cache_path = cache_path
+        self.url_template = url_template
+        self.window = window
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_age = max_age
+        self.client = None
+        self.cache = None
+
+    async def __aenter__(self):
+        self.client = httpx.AsyncClient(
+            http2=True,
+            timeout=self.timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+        )
+        self.cache = await asyncio.to_thread(LinkedDataCache, self.cache_path)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.client.aclose()
+        self.client = None
+        await asyncio.to_thread(self.cache.close)
+        self.cache = None
+        return False
+
+    async def fetch_all(self, item_ids):
+        """
+        Fetches the page of every item ID of an async iterator. Pages are yielded in completion order, not input order.
+
+        :param item_ids: Async iterator of item IDs.
+        :return: Async generator of (item_id, body, cached) tuples, where `body` is the page as single-line JSON bytes
+                 and `cached` is True if no page had to be transferred. Missing and failed items are not yielded.
+        """
+        pending = set()
+        try:
+            async for batch in self._batches(item_ids):
+                entries = await asyncio.to_thread(self.cache.get_many, batch)
+                for item_id in batch:
+                    entry = entries.get(item_id)
+                    if entry is not None and time.time() - entry["fetched_at"] < self.max_age:
+                        if entry["body"] is not None:
+                            yield item_id, entry["body"], True
+                        continue
+                    pending.add(asyncio.create_task(self._fetch(item_id, entry)))
+                    if len(pending) >= self.window:
+                        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                        for result in self._results(done):
+                            yield result
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for result in self._results(done):
+                    yield result
+        finally:
+            for task in pending:  # Consumer stopped early
+                task.cancel()
+
+    async def _batches(self, item_ids):
+        batch = []
+        async for item_id in item_ids:
+            batch.append(item_id)
+            if len(batch) >= self.window:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _results(done):
+        for task in done:
+            result = task.result()
+            if result is not None and result[1] is not None:
+                yield result
+
+    async def _fetch(self, item_id, entry):
+        """
+        Requests one page, conditionally if a cached copy exists, and updates the cache.
+
+        :return: Tuple of (item_id, body, cached), with `body` None if the item does not exist or could not be fetched.
+        """
+        url = self.url_template.format(id=item_id)
+        headers = {}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        attempt = 0
+        while True:
+            try:
+                response = await self.client.get(url, headers=headers)
+                if response.status_code not in self.RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    break
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    logger.warning(f"Failed to fetch {url}: {e}")
+                    return item_id, None, False
+                logger.debug(f"Transport error for {url}: {e}")
+            attempt += 1
+            await asyncio.sleep(min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.0))
+
+        if response.status_code == 304 and entry is not None:
+            await asyncio.to_thread(self.cache.touch, item_id)
+            return item_id, entry["body"], True
+        if response.status_code in self.MISSING_STATUS_CODES:
+            await asyncio.to_thread(self.cache.put, item_id, None)
+            return item_id, None, False
+        if response.status_code != 200:
+            logger.warning(f"Failed to fetch {url}: HTTP {response.status_code}")
+            return item_id, None, False
+        try:
+            page = response.json()
+        except ValueError as e:
+            logger.warning(f"Invalid JSON at {url}: {e}")
+            return item_id, None, False
+        body = json.dumps(page, ensure_ascii=False, separators=(",", ":")).encode() if page else None
+        await asyncio.to_thread(self.cache.put, item_id, body, response.headers.get("ETag"),
+                                response.headers.get("Last-Modified"))
+        return item_id, body, False
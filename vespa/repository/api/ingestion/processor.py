@@ -1,25 +1,47 @@
 # /ingestion/processor.py
 import asyncio
+import functools
 import json
 import logging
 import os
 import time
 
-import httpx
-
+from .checkpoint import IngestionCheckpoint
+from .condensation import PlaceCondenser, ToponymCondenser
 from .config import REMOTE_DATASET_CONFIGS
-from .streamer import StreamFetcher
+from .feeder import DocumentFeeder
+from .grouping import PlaceNamesGrouper
+from .hash_index import DocumentHashIndex
+from .linked_data import LinkedDataFetcher
+from .streamer import StreamFetcher, INGESTION_PATH
+from .subtransformers.geonames.classes import GeoNamesClassIndex, GeoNamesClassIndexBuilder
+from .toponym_dictionary import ToponymDictionary
+from .transform_pool import ParallelTransformer
 from .transformers import DocTransformer
-from ..bcp_47.bcp_47 import bcp47_fields
+from .writer import TransformedDocumentWriter
 from ..config import VespaClient
-from ..utils import task_tracker, distinct_dicts, escape_yql
+from ..utils import task_tracker
 
 logger = logging.getLogger(__name__)
 logging.getLogger("httpx").setLevel(logging.WARNING)
 
 
+async def _skip_items(stream, count):
+    """
+    Discards the first `count` items of an async stream.
+    """
+    async for item in stream:
+        if count > 0:
+            count -= 1
+            continue
+        yield item
+
+
 class TransformationManager:
-    def __init__(self, source_file_path, dataset_name, transformer_index, task_id, skip_transform=False):
+    DEDUPLICATION_BATCH_SIZE = 1000  # Transformed records resolved against the toponym dictionary per transaction
+
+    def __init__(self, source_file_path, dataset_name, transformer_index, task_id, skip_transform=False,
+                 resume=False, namespace=None, toponym_dictionary=None):
         """
         Initializes TransformationManager with output file path based on source file.
 
@@ -28,16 +50,40 @@ class TransformationManager:
         :param transformer_index: Index of the transformer.
         :param task_id: Unique identifier for the ingestion task.
         :param skip_transform: If True, skips transformation.
+        :param resume: If True, resumes from the checkpoint of a previous run (if any).
+        :param namespace: Namespace of the dataset (required with a toponym dictionary).
+        :param toponym_dictionary: Optional ToponymDictionary applied to the transformed documents.
         """
         self.dataset_name = dataset_name
         self.transformer_index = transformer_index
         self.task_id = task_id
+        self.namespace = namespace
+        self.toponym_dictionary = toponym_dictionary
+        self._undeduplicated = []  # Transformed records awaiting the toponym dictionary
         self.output_files = self._get_output_file_paths(source_file_path, transformer_index)
-        if not skip_transform:
-            for output_file in self.output_files.values():
-                if os.path.exists(output_file):
-                    os.remove(output_file)  # Delete pre-existing file unless skip_transform is True
-                    logger.info(f"Deleted existing file: {output_file}")
+        self.writer = None
+        self.checkpoint = IngestionCheckpoint(
+            f"{os.path.splitext(source_file_path)[0]}_transformed_{transformer_index}_checkpoint.json")
+        if resume and self.checkpoint.load():
+            self._truncate_output_files()
+        else:
+            self.checkpoint.reset()
+            if not skip_transform:
+                for output_file in self.output_files.values():
+                    if os.path.exists(output_file):
+                        os.remove(output_file)  # Delete pre-existing file unless skip_transform is True
+                        logger.info(f"Deleted existing file: {output_file}")
+
+    def _truncate_output_files(self):
+        """
+        Discards anything written to the output files after the last checkpoint, so that the records transformed after
+        it are not duplicated when transformation resumes.
+        """
+        for doc_type, output_file in self.output_files.items():
+            offset = self.checkpoint.output_offsets.get(doc_type, 0)
+            if os.path.exists(output_file) and os.path.getsize(output_file) > offset:
+                os.truncate(output_file, offset)
+                logger.info(f"Truncated {output_file} to checkpoint offset {offset}")
 
     def _get_output_file_paths(self, source_file_path, transformer_index):
         """
@@ -54,43 +100,123 @@ class TransformationManager:
 
         return output_file_paths
 
+    async def __aenter__(self):
+        self.writer = TransformedDocumentWriter(self.output_files)
+        self.writer.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                await self._deduplicate_and_store()
+        finally:
+            self._undeduplicated = []
+            writer, self.writer = self.writer, None
+            await writer.close()
+        return False
+
+    async def save_checkpoint(self, source_records, complete=False, source_offset=None):
+        """
+        Waits for all buffered output to reach disk, then records the source and output positions.
+
+        :param source_records: Number of raw source records consumed so far.
+        :param complete: True when transformation has finished.
+        :param source_offset: Byte offset of the source consumed so far (sharded reads only).
+        """
+        await self._deduplicate_and_store()
+        await self.writer.sync()
+        self.checkpoint.record_transform(source_records, self.writer.offsets(), complete, source_offset)
+
     async def transform_and_store(self, document):
         """
-        Transforms the document and stores the result in the output file.
+        Transforms the document and passes the result to the buffered writer.
+        Must be called within the `async with transformation_manager:` block that owns the writer.
 
         :param document: The document to be transformed and stored.
         """
-        place, toponyms, links = DocTransformer.transform(document, self.dataset_name, self.transformer_index)
+        result = DocTransformer.transform(document, self.dataset_name, self.transformer_index)
+        if self.toponym_dictionary:
+            # Resolved in batches, each in one transaction off the event loop, and stored in order
+            self._undeduplicated.append(result)
+            if len(self._undeduplicated) >= self.DEDUPLICATION_BATCH_SIZE:
+                await self._deduplicate_and_store()
+        else:
+            await self.store(*result)
+
+    async def _deduplicate_and_store(self):
+        """
+        Resolves the transformed records awaiting the toponym dictionary and passes them to the buffered writer.
+        """
+        if not self._undeduplicated:
+            return
+        results, self._undeduplicated = self._undeduplicated, []
+        for result in await asyncio.to_thread(self.toponym_dictionary.deduplicate, self.namespace, results):
+            await self.store(*result)
+
+    async def transform_batch_and_store(self, batch):
+        """
+        Transforms a RecordBatch of source rows with the dataset's columnar transformer and passes the results to the
+        buffered writer.
+
+        :param batch: A pyarrow.RecordBatch.
+        """
+        def transform_and_serialize():
+            lines = {"place": [], "toponym": [], "link": []}
+            results = DocTransformer.transform_batch(batch, self.dataset_name, self.transformer_index)
+            if self.toponym_dictionary:
+                results = self.toponym_dictionary.deduplicate(self.namespace, results)
+            for place, toponyms, links in results:
+                if place:
+                    lines["place"].append(json.dumps(place))
+                lines["toponym"].extend(json.dumps(toponym) for toponym in toponyms or [])
+                lines["link"].extend(json.dumps(link) for link in links or [])
+            return ({doc_type: "\n".join(doc_lines) + "\n" if doc_lines else "" for doc_type, doc_lines in lines.items()},
+                    {doc_type: len(doc_lines) for doc_type, doc_lines in lines.items()})
+
+        # Transformed and serialized in bulk off the event loop, then written as one payload per doc type
+        await self.store_serialized(*await asyncio.to_thread(transform_and_serialize))
+
+    async def store_serialized(self, payloads, counts):
+        """
+        Passes documents transformed and serialized by a worker process to the buffered writer.
+
+        :param payloads: Dictionary of doc type to NDJSON payload.
+        :param counts: Dictionary of doc type to number of documents in the payload.
+        """
+        for doc_type, payload in payloads.items():
+            await self.writer.write_serialized(doc_type, payload, counts[doc_type])
+        task_tracker.update_task(self.task_id, {f"transformed_{doc_type}s": count for doc_type, count in counts.items()})
+
+    async def store(self, place, toponyms, links):
+        """
+        Passes already-transformed documents to the buffered writer.
 
+        :param place: The transformed place, if any.
+        :param toponyms: List of transformed toponyms, if any.
+        :param links: List of transformed links, if any.
+        """
         # Write place to file
         if place:
-            await asyncio.to_thread(self._write_to_file, place, 'place')
+            await self.writer.write('place', place)
             task_tracker.update_task(self.task_id, {"transformed_places": 1})
 
         # Write toponyms to file
         if toponyms:
             for toponym in toponyms:
-                await asyncio.to_thread(self._write_to_file, toponym, 'toponym')
+                await self.writer.write('toponym', toponym)
             task_tracker.update_task(self.task_id, {"transformed_toponyms": len(toponyms)})
 
         # Write links to file
         if links:
             for link in links:
-                await asyncio.to_thread(self._write_to_file, link, 'link')
+                await self.writer.write('link', link)
             task_tracker.update_task(self.task_id, {"transformed_links": len(links)})
 
-    def _write_to_file(self, transformed_data, doc_type):
-        """
-        Synchronous method to write transformed data to a file. Called from asyncio.to_thread.
-        """
-        with open(self.output_files[doc_type], "a") as f:
-            json.dump(transformed_data, f)
-            f.write("\n")
-
 
 class IngestionManager:
     def __init__(self, dataset_name, task_id, limit=None, delete_only=False, no_delete=False, skip_transform=False,
-                 condense_only=False, convert_triples=False, number_of_consumers=500):
+                 condense_only=False, convert_triples=False, max_in_flight=500, resume=False, delta=False,
+                 seed_toponyms=False):
         """
         Initializes IngestionManager with dataset configuration and Vespa client.
 
@@ -102,12 +228,17 @@ class IngestionManager:
         :param skip_transform: If True, skips transformation
         :param condense_only: If True, only condenses existing toponyms.
         :param convert_triples: If True, converts triples to JSON-LD.
+        :param max_in_flight: Maximum number of concurrent feed requests.
+        :param resume: If True, skips records already transformed and fed by an interrupted run (implies no_delete).
+        :param delta: If True, feeds only new or changed documents and deletes vanished ones (implies no_delete).
+        :param seed_toponyms: If True, first seeds the toponym dictionary with the toponyms of every namespace in Vespa
+                              (otherwise only namespaces not yet seeded are, and only for datasets that use it).
         """
         self.dataset_name = dataset_name
         self.task_id = task_id
         self.limit = limit
         self.delete_only = delete_only
-        self.no_delete = no_delete or condense_only
+        self.no_delete = no_delete or condense_only or resume or delta
         self.dataset_config = self._get_dataset_config()
         self.transformer_index = None
         self.update_place = False
@@ -116,8 +247,13 @@ class IngestionManager:
         self.condense_only = condense_only
         self.convert_triples = convert_triples
         task_tracker.add_task(self.task_id)
-        self.task_queue = asyncio.Queue()
-        self.number_of_consumers = number_of_consumers
+        self.max_in_flight = max_in_flight
+        self.resume = resume
+        self.delta = delta
+        self.hash_index = None
+        self.modified_place_ids = set()
+        self.seed_toponyms = seed_toponyms
+        self.toponym_dictionary = None
 
     def _get_dataset_config(self):
         """
@@ -141,6 +277,13 @@ class IngestionManager:
         logger.info(f"Deleting all documents for namespace: {self.dataset_config['namespace']}")
         if schema is None:
             schema = ['place', 'toponym', 'link', 'variant']
+            DocumentHashIndex.remove_index(self._hash_index_path())  # The index no longer reflects Vespa
+            if os.path.exists(self._toponym_dictionary_path()):
+                toponym_dictionary = ToponymDictionary(self._toponym_dictionary_path())
+                try:
+                    await asyncio.to_thread(toponym_dictionary.forget, self.dataset_config['namespace'])
+                finally:
+                    toponym_dictionary.close()
 
         with VespaClient.sync_context("feed") as sync_app:
 
@@ -169,7 +312,19 @@ class IngestionManager:
                 await self._delete_existing_data()
 
             if not self.delete_only:
-                await self._process_dataset()
+                if self._uses_toponym_dictionary():
+                    self.toponym_dictionary = ToponymDictionary(self._toponym_dictionary_path())
+                try:
+                    if self.seed_toponyms or self.toponym_dictionary:
+                        await self._seed_toponym_dictionary(force=self.seed_toponyms)
+                    if self.delta:
+                        await self._process_dataset_delta()
+                    else:
+                        await self._process_dataset()
+                finally:
+                    if self.toponym_dictionary:
+                        self.toponym_dictionary.close()
+                        self.toponym_dictionary = None
 
             task_tracker.update_task(self.task_id, {
                 "status": "completed",
@@ -180,12 +335,64 @@ class IngestionManager:
             logger.exception(f"Error during ingestion: {e}")
             task_tracker.update_task(self.task_id, {"status": "failed", "error": str(e)})
 
+    def _hash_index_path(self):
+        return os.path.join(INGESTION_PATH, f"{self.dataset_config['namespace']}_hash_index.sqlite")
+
+    @staticmethod
+    def _toponym_dictionary_path():
+        return os.path.join(INGESTION_PATH, "toponym_dictionary.sqlite")  # Shared by all datasets
+
+    def _uses_toponym_dictionary(self):
+        """
+        Toponyms are deduplicated during transformation (see ToponymDictionary) if the dataset configuration sets
+        `'toponym_dictionary': True`, unless the run only condenses toponyms already in Vespa. The toponyms of such
+        datasets are then not condensed after feeding.
+        """
+        return self.dataset_config.get('toponym_dictionary', False) and not self.condense_only
+
+    async def _seed_toponym_dictionary(self, force=False):
+        """
+        Seeds the toponym dictionary with the unstaged toponyms in Vespa of every configured namespace not yet seeded
+        (see `ToponymDictionary.forget`), so that it is complete before its first use.
+
+        :param force: If True, seeds every configured namespace.
+        """
+        toponym_dictionary = self.toponym_dictionary or ToponymDictionary(self._toponym_dictionary_path())
+        try:
+            seeded = set() if force else await asyncio.to_thread(toponym_dictionary.seeded)
+            for namespace in dict.fromkeys(config['namespace'] for config in REMOTE_DATASET_CONFIGS):
+                if namespace in seeded:
+                    continue
+                async with DocumentFeeder(VespaClient.get_url("feed"), namespace, self.task_id) as feeder:
+                    await toponym_dictionary.seed(feeder)
+        finally:
+            if toponym_dictionary is not self.toponym_dictionary:
+                toponym_dictionary.close()
+
+    async def _process_dataset_delta(self):
+        """
+        Processes the dataset against the document hash index of the namespace: unchanged documents are not fed again,
+        and documents fed by a previous run but no longer produced by the source are deleted before post-processing.
+        """
+        self.hash_index = DocumentHashIndex(self._hash_index_path())
+        try:
+            await asyncio.to_thread(self.hash_index.begin_run, self.task_id, self.resume)
+            await self._process_dataset()
+            await asyncio.to_thread(self.hash_index.finish_run)
+        finally:
+            await asyncio.to_thread(self.hash_index.close)
+            self.hash_index = None
+            self.modified_place_ids = set()
+
     async def _process_dataset(self):
         """
         Processes each file in the dataset configuration by fetching data from the stream,
         initiating document processing, and handling any post-processing steps.
         """
         if not self.condense_only:
+            if self.dataset_config.get('geonames_classes') and not self.skip_transform:
+                await self._build_geonames_class_index()
+            place_file_paths = []  # Transformed place files of the dataset, whose names grouped updates include
             for self.transformer_index, file_config in enumerate(self.dataset_config['files']):
                 logger.info(f"Fetching items from stream: {file_config['url']}")
                 self.update_place = file_config.get("update_place", False)
@@ -197,7 +404,8 @@ class IngestionManager:
                     else:
                         stream_fetcher = StreamFetcher({
                             'url': stream_fetcher.get_file_path().replace(file_config['local_name'], file_config['ld_file']),
-                            'file_type': 'ndjson'
+                            'file_type': 'ndjson',
+                            'schema': file_config.get('schema'),
                         })
 
                 # Get the source file path from StreamFetcher
@@ -209,8 +417,12 @@ class IngestionManager:
                     self.dataset_name,
                     self.transformer_index,
                     self.task_id,
-                    skip_transform=self.skip_transform
+                    skip_transform=self.skip_transform,
+                    resume=self.resume,
+                    namespace=self.dataset_config['namespace'],
+                    toponym_dictionary=self.toponym_dictionary,
                 )
+                checkpoint = self.transformation_manager.checkpoint
 
                 logger.info(f"Output files: {self.transformation_manager.output_files}")
                 logger.info(f"Skip transform: {self.skip_transform}")
@@ -218,19 +430,40 @@ class IngestionManager:
 
                 if self.skip_transform:
                     logger.info(f"Skipping transformation - using existing transformed file.")
+                elif checkpoint.transform_complete:
+                    logger.info(f"Skipping transformation - completed by a previous run.")
+                elif self._use_shards(stream_fetcher):
+                    logger.info(f"Starting sharded transformation...")
+                    async with self.transformation_manager:
+                        await self._transform_shards(stream_fetcher)
+                elif self._use_batches(stream_fetcher, file_config):
+                    logger.info(f"Starting columnar transformation...")
+                    async with self.transformation_manager:
+                        await self._transform_batches(stream_fetcher)
                 else:
                     stream = stream_fetcher.get_items()
                     logger.info(f"Starting transformation...")
-                    await self._transform_documents(stream)
-                    stream_fetcher.close_stream()
+                    try:
+                        # Output files stay open for the whole run and are flushed and closed even on failure
+                        async with self.transformation_manager:
+                            await self._transform_documents(stream)
+                    finally:
+                        stream_fetcher.close_stream()
 
                 # Process each document type
-                with VespaClient.sync_context("feed") as sync_app:
+                async with DocumentFeeder(VespaClient.get_url("feed"), self.dataset_config['namespace'], self.task_id,
+                                          max_in_flight=self.max_in_flight) as feeder:
                     for doc_type in ["place", "toponym", "link"]:
+                        if checkpoint.feed_complete(doc_type):
+                            logger.info(f"Skipping {doc_type} ingestion - completed by a previous run.")
+                            continue
                         transformed_file_path = self.transformation_manager.output_files[doc_type]
                         if not os.path.exists(transformed_file_path):
                             logger.warning(f"No {doc_type} data found in {transformed_file_path}")
                             continue
+                        if doc_type == "place" and self.update_place:
+                            transformed_file_path = await self._group_place_names(transformed_file_path,
+                                                                                  place_file_paths)
                         transformed_stream_fetcher = StreamFetcher({
                             'url': transformed_file_path,
                             'file_type': 'ndjson'
@@ -239,344 +472,467 @@ class IngestionManager:
                         transformed_stream = transformed_stream_fetcher.get_items()
                         logger.info(f"Starting ingestion from {transformed_file_path}...")
                         # Ingest data from the transformed stream
-                        await self._feed_documents(doc_type, transformed_stream, sync_app)
+                        await self._feed_documents(doc_type, transformed_stream, feeder, checkpoint)
                         transformed_stream_fetcher.close_stream()  # Close the transformed stream
 
+                if not self.update_place and os.path.exists(self.transformation_manager.output_files["place"]):
+                    place_file_paths.append(self.transformation_manager.output_files["place"])
+
+        if self.hash_index and not self.condense_only:
+            if self.limit is None:
+                await self._delete_vanished_documents()
+            else:
+                logger.warning("Not deleting vanished documents: the run was limited")
+
         logger.info("Starting post-processing...")
         await self._condense_places()  # Condense places after all are processed
-        await self._condense_toponyms()  # Condense toponyms after all are processed
+        if self.toponym_dictionary and not self.skip_transform:
+            logger.info("Skipping toponym condensation - toponyms were deduplicated during transformation.")
+        else:
+            await self._condense_toponyms()  # Condense toponyms after all are processed
 
         # TODO: Post-process links: check if the link already existed
         # TODO: If the predicate is symmetrical, also check if the reverse link exists
 
         logger.info(f"Completed processing dataset {self.dataset_name}")
 
+    async def _build_geonames_class_index(self, batch_size=10000):
+        """
+        Builds the GeoNames class index (see GeoNamesClassIndex) from the GeoNames dump, unless it is newer than the
+        dump already.
+        """
+        path = GeoNamesClassIndex.default_path()
+        geonames_config = next(config for config in REMOTE_DATASET_CONFIGS if config['dataset_name'] == 'GeoNames')
+        stream_fetcher = StreamFetcher(geonames_config['files'][0])
+        dump_path = stream_fetcher.get_file_path()
+        if os.path.exists(path) and (not os.path.exists(dump_path) or os.path.getmtime(path) >= os.path.getmtime(
+                dump_path)):
+            logger.info(f"Using existing GeoNames class index {path}")
+            return
+
+        logger.info(f"Building GeoNames class index {path} from {dump_path}...")
+        columns = ['geonameid', 'feature_class', 'feature_code']
+        builder = await asyncio.to_thread(GeoNamesClassIndexBuilder, path)
+        built = False
+        try:
+            if stream_fetcher.supports_batches():
+                async for batch in stream_fetcher.get_batches():
+                    await asyncio.to_thread(builder.add, zip(*(batch.column(column).to_pylist() for column in columns)))
+            else:
+                rows = []
+                async for row in stream_fetcher.get_items():
+                    rows.append(tuple(row.get(column) for column in columns))
+                    if len(rows) >= batch_size:
+                        await asyncio.to_thread(builder.add, rows)
+                        rows = []
+                await asyncio.to_thread(builder.add, rows)
+            await asyncio.to_thread(builder.commit)
+            built = True
+        finally:
+            if not built:
+                await asyncio.to_thread(builder.abort)
+            stream_fetcher.close_stream()
+
     async def _convert_triples(self, stream_fetcher, file_config):
+        """
+        Fetches the JSON-LD page of every place in an N-Triples place map (TGN), writing them as NDJSON. Pages are
+        cached on disk, so a re-run requests only new pages and revalidates stale ones.
+        """
         source_file_path = stream_fetcher.get_file_path()
         ld_source_path = source_file_path.replace(file_config['local_name'], file_config['ld_file'])
-        if os.path.exists(ld_source_path):
-            os.remove(ld_source_path)
+        cache_path = os.path.join(INGESTION_PATH, f"{self.dataset_config['namespace']}_jsonld_cache.sqlite")
         stream = stream_fetcher.get_items()
 
-        async def fetch_jsonld(triple: dict, semaphore: asyncio.Semaphore):
-            async with semaphore:
-                try:
-                    place_id = triple.get("subject", "").split('/')[-1]
-
-                    # Reject if not an integer
-                    if not place_id.isdigit():
-                        return None
-                    # Reject if predicate is not focus
-                    if triple.get("predicate", "") != "http://xmlns.com/foaf/0.1/focus":
-                        return None
-
-                    url = f"https://vocab.getty.edu/tgn/{place_id}.jsonld"
-                    async with httpx.AsyncClient() as client:
-                        response = await client.get(url, timeout=10)
-                        response.raise_for_status()
-                        jsonld = response.json()
-                        if jsonld:
-                            return jsonld  # Return the JSON-LD data
-                except Exception as e:
-                    logger.error(f"Error processing triple {triple}: {e}", exc_info=True)
-                    return None  # Return None in case of an error
-
-        async def write_batch(batch: list):
-            with open(ld_source_path, "a") as f:
-                for jsonld in batch:
-                    if jsonld:  # Check if jsonld is not None
-                        json.dump(jsonld, f)
-                        f.write("\n")
-                        task_tracker.update_task(self.task_id, {f"processed_triples": 1})
-
-        # Create a semaphore to limit concurrency
-        semaphore = asyncio.Semaphore(10)
-
-        batch_size = 1000  # Define the batch size
-        batch = []
-        counter = 0
-
-        async for item in stream:
-            counter += 1
+        async def place_ids():
+            counter = 0
+            async for triple in stream:
+                counter += 1
+                if self.limit and counter > self.limit:
+                    break
+                # Reject if predicate is not focus
+                if triple.get("predicate", "") != "http://xmlns.com/foaf/0.1/focus":
+                    continue
+                place_id = triple.get("subject", "").split('/')[-1]
+                # Reject if not an integer
+                if place_id.isdigit():
+                    yield place_id
 
-            if self.limit and counter > self.limit:
-                break
-            batch.append(item)
-            if len(batch) >= batch_size:
-                # Fetch JSON-LD for the batch concurrently
-                fetch_tasks = [fetch_jsonld(triple, semaphore) for triple in batch]
-                results = await asyncio.gather(*fetch_tasks)
-                # Write the fetched JSON-LD data to the file
-                await write_batch(results)
-                batch = []  # Clear the batch
-
-        # Process any remaining items in the batch
-        if batch:
-            fetch_tasks = [fetch_jsonld(triple, semaphore) for triple in batch]
-            results = await asyncio.gather(*fetch_tasks)
-            await write_batch(results)
-
-        stream_fetcher.close_stream()
+        url_template = self.dataset_config['api_item'].replace('<id>', '{id}')
+        max_age = file_config.get('cache_max_age', LinkedDataFetcher.MAX_AGE)
+        try:
+            async with LinkedDataFetcher(cache_path, url_template, max_age=max_age) as fetcher:
+                with open(ld_source_path, "wb") as f:
+                    async for place_id, jsonld, cached in fetcher.fetch_all(place_ids()):
+                        f.write(jsonld)
+                        f.write(b"\n")
+                        task_tracker.update_task(self.task_id, {"processed_triples": 1, "cached_triples": int(cached)})
+        finally:
+            stream_fetcher.close_stream()
 
         return StreamFetcher({
             'url': ld_source_path,
-            'file_type': 'ndjson'
+            'file_type': 'ndjson',
+            'schema': file_config.get('schema'),
         })
 
-
     async def _transform_documents(self, stream):
         """
         Processes documents from the stream, applying filters and handling concurrency.
+        Uses a pool of worker processes if `transform_workers` is set in the dataset configuration.
+        Progress is checkpointed periodically, and records consumed by a previous run are skipped.
         """
+        checkpoint = self.transformation_manager.checkpoint
+        source_records = checkpoint.source_records
+        if source_records:
+            logger.info(f"Resuming transformation after {source_records} source records")
+            stream = _skip_items(stream, source_records)
+
+        workers = self.dataset_config.get('transform_workers', 0)
+        if workers > 1:
+            return await self._transform_documents_parallel(stream, workers, source_records)
+
         counter = 0
+        limited = False
         filters = self.dataset_config.get('files')[self.transformer_index].get('filters')
 
         async for document in stream:
+            source_records += 1
+            if source_records % 1000 == 0 and checkpoint.due():
+                await self.transformation_manager.save_checkpoint(source_records - 1)
+
             # Apply filters (if any)
             if filters and not any(f(document) for f in filters):
                 continue
 
-            # It is necessary to await the task to ensure that the file is written (otherwise the file may not be closed correctly)
             await self.transformation_manager.transform_and_store(document)
             counter += 1
 
             # Stop processing if the limit is reached
             if self.limit is not None and counter >= self.limit:
+                limited = True
                 break
 
-        return
+        # A limited run leaves the rest of the source to be transformed by a resumed run
+        await self.transformation_manager.save_checkpoint(source_records, complete=not limited)
 
-    async def _feed_documents(self, doc_type, stream, async_app):
-        try:
+    async def _transform_documents_parallel(self, stream, workers, source_records):
+        """
+        Filters and transforms documents in worker processes, writing the results in input order.
+        """
+        counter = 0
+        limited = False
+        checkpoint = self.transformation_manager.checkpoint
+        logger.info(f"Transforming with {workers} worker processes")
+
+        async with ParallelTransformer(self.dataset_name, self.transformer_index, workers,
+                                       toponym_dictionary_path=self._worker_toponym_dictionary_path()) as transformer:
+            async for results, positions, record_count in transformer.transform(stream):
+                for (place, toponyms, links), position in zip(results, positions):
+                    await self.transformation_manager.store(place, toponyms, links)
+                    counter += 1
+
+                    # Stop processing if the limit is reached
+                    if self.limit is not None and counter >= self.limit:
+                        source_records += position  # Only the records of the chunk up to the last one stored
+                        limited = True
+                        break
+                else:
+                    source_records += record_count
+                    if checkpoint.due():
+                        await self.transformation_manager.save_checkpoint(source_records)
+                    continue
+                break
 
-            # Start the producer to enqueue items from the stream
-            producer_task = asyncio.create_task(self._enqueue_items(stream))
+        # A limited run leaves the rest of the source to be transformed by a resumed run
+        await self.transformation_manager.save_checkpoint(source_records, complete=not limited)
 
-            # Start the consumers to process items from the queue
-            consumer_tasks = [
-                asyncio.create_task(self._process_item(async_app, doc_type))
-                for _ in range(self.number_of_consumers)
-            ]
+    def _worker_toponym_dictionary_path(self):
+        return self.toponym_dictionary.path if self.toponym_dictionary else None
 
-            # Wait for the producer and consumers to finish their tasks
-            await producer_task
-            await self.task_queue.join()  # Ensure all items have been processed
+    def _use_batches(self, stream_fetcher, file_config):
+        """
+        Columnar transformation is used for files read as Arrow RecordBatches when the dataset has a batch transformer
+        for the file and the file has no row filters.
+        """
+        return (stream_fetcher.supports_batches() and not file_config.get('filters')
+                and DocTransformer.supports_batches(self.dataset_name, self.transformer_index))
 
-            # Stop the consumers by adding None to the queue
-            for _ in range(self.number_of_consumers):
-                await self.task_queue.put(None)
+    async def _transform_batches(self, stream_fetcher):
+        """
+        Reads the source as Arrow RecordBatches and transforms a whole batch at a time. Rows consumed by a previous
+        run are skipped, and progress is checkpointed as a count of source rows.
+        """
+        checkpoint = self.transformation_manager.checkpoint
+        source_records = skip = checkpoint.source_records
+        if skip:
+            logger.info(f"Resuming transformation after {skip} source records")
 
-            # Wait for all consumer tasks to finish
-            await asyncio.gather(*consumer_tasks)
+        counter = 0
+        limited = False
+        batches = stream_fetcher.get_batches()
+        try:
+            async for batch in batches:
+                if skip:
+                    if skip >= batch.num_rows:
+                        skip -= batch.num_rows
+                        continue
+                    batch, skip = batch.slice(skip), 0
+                if self.limit is not None:
+                    batch = batch.slice(0, self.limit - counter)
+
+                await self.transformation_manager.transform_batch_and_store(batch)
+                counter += batch.num_rows
+                source_records += batch.num_rows
+                if checkpoint.due():
+                    await self.transformation_manager.save_checkpoint(source_records)
+
+                # Stop processing if the limit is reached
+                if self.limit is not None and counter >= self.limit:
+                    limited = True
+                    break
+        finally:
+            await batches.aclose()
+            stream_fetcher.close_stream()
 
-        except:
-            logger.exception(f"Error feeding documents to Vespa: {doc_type}")
-            raise
+        # A limited run leaves the rest of the source to be transformed by a resumed run
+        await self.transformation_manager.save_checkpoint(source_records, complete=not limited)
 
-    async def _enqueue_items(self, stream):
-        """Producer: Enqueue items from the stream."""
-        async for item in stream:
-            await self.task_queue.put(item)
+    def _use_shards(self, stream_fetcher):
+        """
+        Sharded reads are used for uncompressed line-oriented files when the dataset has transformation workers, except
+        for limited runs (a shard is always transformed in full) and runs resumed from a record-count checkpoint.
+        """
+        checkpoint = self.transformation_manager.checkpoint
+        return (self.dataset_config.get('transform_workers', 0) > 1 and self.limit is None
+                and not (checkpoint.source_records and not checkpoint.source_offset)
+                and stream_fetcher.is_shardable())
 
-    async def _process_item(self, app, doc_type):
-        """Consumer: Dequeue an item and feed it to Vespa."""
-        while True:
-            try:
-                item = await asyncio.wait_for(self.task_queue.get(), timeout=60)
-                if item is None:
-                    break  # Sentinel value
+    async def _transform_shards(self, stream_fetcher, shard_size=32 * 1024 * 1024):
+        """
+        Reads and transforms the source in byte-range shards, each handled entirely by one worker process, so that
+        neither reading, decoding nor transformation is limited to a single core. Results are written in file order,
+        and the source offset of the last completed shard is checkpointed.
 
-                try:
-                    if doc_type == "place":
-                        item['fields']['namespace'] = self.dataset_config['namespace']
-
-                    response = app.feed_data_point(
-                        schema=doc_type,
-                        namespace=self.dataset_config['namespace'],
-                        data_id=item['id'],
-                        fields=item['fields'],
-                    )
-                    if response.is_successful():
-                        task_tracker.update_task(self.task_id, {f"processed_{doc_type}s": 1, "success": 1})
-                        logger.debug(f"Successfully fed document {item['id']}")
+        :param stream_fetcher: A StreamFetcher whose file is shardable.
+        :param shard_size: Approximate size of each shard in bytes (bounds the memory used by shards in flight).
+        """
+        checkpoint = self.transformation_manager.checkpoint
+        workers = self.dataset_config['transform_workers']
+        source_records, source_offset = checkpoint.source_records, checkpoint.source_offset
+        if source_offset:
+            logger.info(f"Resuming sharded transformation at byte {source_offset}")
+
+        file_size = os.path.getsize(stream_fetcher.get_file_path())
+        shards = await asyncio.to_thread(stream_fetcher.shards,
+                                         max(workers, (file_size - source_offset) // shard_size + 1), source_offset)
+        logger.info(f"Transforming {len(shards)} shards with {workers} worker processes")
+
+        async with ParallelTransformer(self.dataset_name, self.transformer_index, workers,
+                                       toponym_dictionary_path=self._worker_toponym_dictionary_path()) as transformer:
+            async for payloads, counts, record_count, shard in transformer.transform_shards(shards):
+                await self.transformation_manager.store_serialized(payloads, counts)
+                source_records += record_count
+                source_offset = shard.end
+                if checkpoint.due():
+                    await self.transformation_manager.save_checkpoint(source_records, source_offset=source_offset)
+
+        await self.transformation_manager.save_checkpoint(source_records, complete=True, source_offset=source_offset)
+
+    async def _group_place_names(self, place_file_path, primary_file_paths):
+        """
+        Groups the staged partial places of a file that updates existing places (`update_place`, e.g. GeoNames
+        alternate names) into one partial update per place (see PlaceNamesGrouper), so that they are fed as updates
+        rather than as staged places to be condensed. Each update assigns the full names of its place, including those
+        of the place files fed before. The grouped file is kept beside the transformed file, and is only rebuilt when
+        any of the files it is grouped from is newer.
+
+        :param place_file_path: Path of the transformed place file.
+        :param primary_file_paths: Paths of the transformed place files of the places themselves.
+        :return: Path of the grouped place file.
+        """
+        grouped_file_path = place_file_path.replace(".ndjson", "_grouped.ndjson")
+        if not primary_file_paths:
+            logger.warning(f"No place file precedes {place_file_path}: grouped updates will hold only its names")
+        if os.path.exists(grouped_file_path) and all(
+                os.path.getmtime(grouped_file_path) >= os.path.getmtime(path)
+                for path in [place_file_path, *primary_file_paths]):
+            logger.info(f"Using existing grouped place file: {grouped_file_path}")
+        else:
+            logger.info(f"Grouping {place_file_path} by place...")
+            await asyncio.to_thread(PlaceNamesGrouper(place_file_path, grouped_file_path, primary_file_paths).group)
+        return grouped_file_path
+
+    async def _feed_documents(self, doc_type, stream, feeder, checkpoint):
+        """
+        Feeds all documents of a transformed stream to Vespa through the async feeder, skipping and recording the
+        records fed according to the checkpoint.
+
+        :param doc_type: Vespa document type (schema).
+        :param stream: Async iterator of transformed documents.
+        :param feeder: An open DocumentFeeder.
+        :param checkpoint: The IngestionCheckpoint of the transformed file.
+        """
+        # In delta mode the hash index records what has been fed, so a resumed feed simply re-filters the whole file
+        start = 0 if self.hash_index else checkpoint.fed(doc_type)
+        if start:
+            logger.info(f"Resuming {doc_type} ingestion after {start} documents")
+
+        async def prepared_stream():
+            async for item in _skip_items(stream, start):
+                if doc_type == "place":
+                    item['fields']['namespace'] = self.dataset_config['namespace']
+                yield item
+
+        feed = feeder.feed
+        if doc_type == "toponym" and self.toponym_dictionary:
+            # Deduplicated toponyms are partial updates, which may extend toponyms fed by other records or datasets
+            feed = functools.partial(feeder.update, create=True)
+        grouped = doc_type == "place" and self.update_place
+        if grouped:
+            # Grouped updates assign the names of the places fed from another file (see `_group_place_names`)
+            feed = functools.partial(feeder.update, create=True)
+        # Grouped updates share the IDs of the places they update, so their hashes are indexed separately
+        index_type = "place_names" if grouped else doc_type
+
+        pending_hashes = {}  # Hashes of documents in flight
+        fed_hashes = {}  # Hashes of documents fed successfully, not yet recorded in the index
+
+        # Places added to deduplicated toponyms are recorded in the dictionary only once fed (see ToponymDictionary)
+        records_places = doc_type == "toponym" and self.toponym_dictionary is not None
+        fed_updates = []  # Toponym updates fed successfully, not yet recorded in the dictionary
+
+        def record_success(item):
+            content_hash = pending_hashes.pop(item['id'], None)
+            if content_hash is not None:
+                fed_hashes[item['id']] = content_hash
+            if records_places:
+                fed_updates.append(item)
+
+        async def record_places():
+            if fed_updates:
+                recorded = list(fed_updates)
+                fed_updates.clear()
+                await asyncio.to_thread(self.toponym_dictionary.record, self.dataset_config['namespace'], recorded)
+
+        async def recording_stream(items, batch_size=1000):
+            """
+            Passes on the items of a stream, recording the places of the updates fed so far after every batch.
+            """
+            count = 0
+            async for item in items:
+                yield item
+                count += 1
+                if records_places and count % batch_size == 0:
+                    await record_places()
+
+        async def delta_stream(batch_size=1000):
+            """
+            Yields only the new and changed documents, recording the hashes of those fed successfully.
+            """
+            batch = []
+
+            async def filtered_batch():
+                hashes = {item['id']: DocumentHashIndex.content_hash(item['fields']) for item in batch}
+                new, modified = await asyncio.to_thread(self.hash_index.changed, index_type, hashes)
+                unchanged = 0
+                for item in batch:
+                    if item['id'] in new or item['id'] in modified or self._depends_on_modified_place(doc_type, item):
+                        if (doc_type == "place" and not grouped and item['id'] in modified
+                                and not item['fields'].get('is_staging')):
+                            self.modified_place_ids.add(item['id'])
+                        pending_hashes[item['id']] = hashes[item['id']]
+                        yield item
                     else:
-                        error_msg = f"Failed to feed document {item['id']}: {response.get_status_code()}, Response: {response}"
-                        task_tracker.update_task(self.task_id, {f"processed_{doc_type}s": 1, "failure": 1, "error": error_msg})
-                        logger.error(error_msg)
+                        unchanged += 1
+                task_tracker.update_task(self.task_id, {f"unchanged_{doc_type}s": unchanged})
+                if fed_hashes:
+                    recorded = dict(fed_hashes)
+                    fed_hashes.clear()
+                    await asyncio.to_thread(self.hash_index.record, index_type, recorded)
+
+            async for item in prepared_stream():
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    async for changed_item in filtered_batch():
+                        yield changed_item
+                    batch = []
+            if batch:
+                async for changed_item in filtered_batch():
+                    yield changed_item
 
-                except Exception as e:
-                    error_msg = f"Error feeding data point: {e}, item: {item}"
-                    task_tracker.update_task(self.task_id, {f"processed_{doc_type}s": 1, "failure": 1, "error": error_msg})
-                    logger.error(error_msg, exc_info=True)
+        try:
+            if self.hash_index:
+                stats = await feed(doc_type, recording_stream(delta_stream()), on_success=record_success)
+                await asyncio.to_thread(self.hash_index.record, index_type, fed_hashes)
+            else:
+                stats = await feed(doc_type, recording_stream(prepared_stream()), start=start,
+                                   on_progress=lambda position: checkpoint.record_feed(doc_type, position),
+                                   on_success=record_success)
+            # Output still to be transformed (after a limited run) is fed by a resumed run
+            checkpoint.record_feed(doc_type, stats["position"], complete=checkpoint.transform_complete)
+        except:
+            logger.exception(f"Error feeding documents to Vespa: {doc_type}")
+            raise
+        finally:
+            await record_places()
 
-            except asyncio.TimeoutError:
-                logger.warning("task_queue.get() timed out.")
-                continue
+    def _depends_on_modified_place(self, doc_type, item):
+        """
+        Re-feeding a modified place replaces the names merged into it by condensation or assigned by grouped updates,
+        so its staged places, grouped updates and toponyms are re-fed as well (even if unchanged).
+        """
+        if not self.modified_place_ids:
+            return False
+        fields = item['fields']
+        if doc_type == "place":
+            if self.update_place:  # Grouped update (see `_group_place_names`)
+                return item['id'] in self.modified_place_ids
+            return fields.get('is_staging', False) and fields.get('record_id') in self.modified_place_ids
+        if doc_type == "toponym":
+            places = fields.get('places', [])
+            if isinstance(places, dict):  # Partial update of a deduplicated toponym
+                places = places.get('add', [])
+            return any(place_id in self.modified_place_ids for place_id in places)
+        return False
+
+    async def _delete_vanished_documents(self):
+        """
+        Deletes documents recorded in the hash index by a previous run but not produced by the current one.
+        """
+        async with DocumentFeeder(VespaClient.get_url("feed"), self.dataset_config['namespace'], self.task_id,
+                                  max_in_flight=self.max_in_flight) as feeder:
+            for doc_type in ["place", "toponym", "link"]:
+                vanished = await asyncio.to_thread(self.hash_index.vanished, doc_type)
+                if not vanished:
+                    continue
+                logger.info(f"Deleting {len(vanished)} vanished {doc_type} documents")
 
-            except Exception as e:
-                logger.error(f"Error in _process_item: {e}", exc_info=True)
+                async def vanished_stream():
+                    for doc_id in vanished:
+                        yield {"id": doc_id}
 
-            finally:
-                self.task_queue.task_done()
+                removed = []
+                await feeder.remove(doc_type, vanished_stream(), on_success=lambda item: removed.append(item['id']))
+                await asyncio.to_thread(self.hash_index.remove, doc_type, removed)
 
     async def _condense_places(self):
         """
-        Condenses staged places in Vespa, iterating until no more are found.
+        Merges the staged places of the namespace into their places in bulk (see PlaceCondenser).
         """
-        with VespaClient.sync_context("feed") as sync_app:
-            logger.info("Condensing places...")
-            while True:
-                yql = 'select * from place where is_staging = true limit 1'
-                staging_place = await asyncio.to_thread(sync_app.query_existing, {'yql': yql}, schema='place')
-
-                if not staging_place:
-                    break
-
-                staging_id = staging_place['fields']['record_id']
-
-                # Find all staged places with the same record_id
-                yql = f'select documentid, names from place where record_id contains "{staging_id}" and is_staging = true'
-                query_response = await asyncio.to_thread(sync_app.query, {'yql': yql}, schema='place')
-
-                if not query_response.is_successful():
-                    logger.error(f"Failed to query places: {query_response.get_status_code()}")
-                    break
-
-                matching_places = [doc.get('fields', {}) for doc in
-                                   query_response.get_json().get('root', {}).get('children', [])]
-
-                # Delete the staged places
-                matching_ids = [place['documentid'].split('::')[-1] for place in matching_places]
-                for place_id in matching_ids:
-                    await asyncio.to_thread(sync_app.delete_data,
-                                            namespace=self.dataset_config['namespace'],
-                                            schema='place',
-                                            data_id=place_id
-                                            )
-                    task_tracker.update_task(self.task_id, {"unstaged_places": 1})
-
-                # Fetch the parent place from Vespa
-                parent_place = await asyncio.to_thread(sync_app.get_existing,
-                                                       namespace=self.dataset_config['namespace'],
-                                                       schema='place',
-                                                       data_id=staging_id)
-
-                # Update the parent place with the merged names
-                await asyncio.to_thread(sync_app.update_existing,
-                                        namespace=self.dataset_config['namespace'],
-                                        schema='place',
-                                        data_id=staging_id,
-                                        fields={
-                                            "names": distinct_dicts(
-                                                parent_place['fields'].get('names', []),
-                                                [name for place in matching_places for name in place.get('names', [])]
-                                            )
-                                        }
-                                        )
+        logger.info("Condensing places...")
+        namespace = self.dataset_config['namespace']
+        async with DocumentFeeder(VespaClient.get_url("feed"), namespace, self.task_id,
+                                  max_in_flight=self.max_in_flight) as feeder:
+            await PlaceCondenser(feeder, os.path.join(INGESTION_PATH, f"{namespace}_place_condensation.sqlite"),
+                                 self.task_id).condense()
 
     async def _condense_toponyms(self):
         """
-        Condenses staged toponyms in Vespa, iterating until no more are found.
+        Condenses the staged toponyms of the namespace in bulk (see ToponymCondenser).
         """
-        with VespaClient.sync_context("feed") as sync_app:
-            logger.info("Condensing toponyms...")
-            while True:
-                yql = 'select * from toponym where is_staging = true limit 1'
-                staging_toponym = await asyncio.to_thread(sync_app.query_existing, {'yql': yql}, schema='toponym')
-
-                if not staging_toponym:
-                    break  # No more staging toponyms
-
-                # Find all matching toponyms, ordered by creation timestamp
-                name = staging_toponym['fields']['name_strict']
-                yql = f'select documentid, places, is_staging, created from toponym where name_strict contains "{escape_yql(name)}" '
-                for field in bcp47_fields:
-                    if staging_toponym.get("fields", {}).get(f"bcp47_{field}"):
-                        yql += f'and bcp47_{field} contains "{staging_toponym["fields"][f"bcp47_{field}"]}" '
-                yql += 'order by created asc'  # Order by creation timestamp
-                query_response = await asyncio.to_thread(sync_app.query, {'yql': yql}, schema='toponym')
-
-                if not query_response.is_successful():
-                    logger.error(f"Failed to query toponyms: {query_response.get_status_code()}")
-                    break
-
-                matching_toponyms = [doc.get('fields', {}) for doc in
-                                     query_response.get_json().get('root', {}).get('children', [])]
-
-                # Catch a no-match scenario for debugging
-                # See https://stackoverflow.com/questions/79491894/vespa-indexing-anomaly-on-exact-indexed-field-with-diacritical-variants-and-no
-                if not matching_toponyms:
-                    logger.error(f"Failed to find matching toponyms for {staging_toponym['fields']['name_strict']}")
-                    # Remove the is_staging flag from the staging_toponym
-                    # result = await asyncio.to_thread(
-                    #     sync_app.update_existing,
-                    #     namespace=self.dataset_config['namespace'],
-                    #     schema='toponym',
-                    #     data_id=staging_toponym['document_id'],
-                    #     fields={"is_staging": False}
-                    # )
-                    continue
-
-
-                # Remove the oldest toponym from the list using pop, and if necessary clear the is_staging flag
-                oldest_toponym = matching_toponyms.pop(0)
-                oldest_toponym_id = oldest_toponym['documentid'].split('::')[-1]
-                deleted_toponyms = []
-                if oldest_toponym.get('is_staging'):
-                    result = await asyncio.to_thread(
-                        sync_app.update_existing,
-                        namespace=self.dataset_config['namespace'],
-                        schema='toponym',
-                        data_id=oldest_toponym_id,
-                        fields={"is_staging": False}
-                    )
-                    task_tracker.update_task(self.task_id, {"unstaged_toponyms": 1})
-
-                # If any matching toponyms remain, merge them with the oldest toponym
-                if matching_toponyms:
-                    unique_places = set(oldest_toponym.get('places', []))
-
-                    # For each, replace the toponym id in the linked place with the oldest toponym id
-                    for toponym in matching_toponyms:
-                        toponym_id = toponym['documentid'].split('::')[-1]
-                        toponym_places = toponym.get('places', [])
-
-                        # Update the place(s) linked to the toponym
-                        for place_id in toponym_places:
-                            place = await asyncio.to_thread(sync_app.get_existing,
-                                                            namespace=self.dataset_config['namespace'],
-                                                            schema='place',
-                                                            data_id=place_id)
-                            place_names = place['fields'].get('names', [])
-                            # Find the matching name and replace the toponym id
-                            for name in place_names:
-                                if name.get('toponym_id') == toponym_id:
-                                    name['toponym_id'] = oldest_toponym_id
-                            # Update the place with the replaced toponym id
-                            await asyncio.to_thread(sync_app.update_existing,
-                                                    namespace=self.dataset_config['namespace'],
-                                                    schema='place',
-                                                    data_id=place_id,
-                                                    fields={"names": place_names}
-                                                    )
-                            # Add the place to the unique set
-                            unique_places.add(place_id)
-
-                        # Delete the merged toponym
-                        await asyncio.to_thread(sync_app.delete_data,
-                                                namespace=self.dataset_config['namespace'],
-                                                schema='toponym',
-                                                data_id=toponym_id
-                                                )
-                        task_tracker.update_task(self.task_id, {"unstaged_toponyms": 1})
-                        deleted_toponyms += [toponym_id]
-
-                    # Update the oldest toponym with merged places
-                    await asyncio.to_thread(sync_app.update_existing,
-                                            namespace=self.dataset_config['namespace'],
-                                            schema='toponym',
-                                            data_id=oldest_toponym_id,
-                                            fields={
-                                                "places": list(unique_places)
-                                            }
-                                            )
+        logger.info("Condensing toponyms...")
+        namespace = self.dataset_config['namespace']
+        async with DocumentFeeder(VespaClient.get_url("feed"), namespace, self.task_id,
+                                  max_in_flight=self.max_in_flight) as feeder:
+            await ToponymCondenser(feeder, os.path.join(INGESTION_PATH, f"{namespace}_toponym_condensation.sqlite"),
+                                   self.task_id).condense()
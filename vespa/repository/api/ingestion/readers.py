@@ -0,0 +1,333 @@
+# /ingestion/readers.py
+import asyncio
+import concurrent.futures
+import csv
+import io
+import logging
+import mmap
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa  # Optional: columnar CSV reading (see `read_csv_batches`)
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = pa_csv = None
+
+BLOCK_SIZE = 8 * 1024 * 1024  # Bytes (or characters, for text streams) read from the source per block
+MAX_PENDING = 4  # Maximum number of blocks or batches waiting to be consumed
+RECORD_BATCH_SIZE = 1000  # Records handed to the event loop per batch
+RING_BUFFER_SIZE = 16 * 1024 * 1024  # Initial size of the buffer used for separated records in compressed streams
+RELEASE_INTERVAL = 256 * 1024 * 1024  # Bytes of a memory-mapped file consumed between releases of its pages
+
+_END = object()
+
+
+async def iterate_in_thread(produce, max_pending=MAX_PENDING):
+    """
+    Runs a blocking generator in a dedicated thread and yields its items to the event loop.
+
+    Items are passed through a bounded asyncio queue: the thread blocks when `max_pending` items are waiting, so memory
+    use stays bounded however far the producer could run ahead. Exceptions raised by the producer are re-raised in the
+    consumer. If the consumer stops early (e.g. a limit is reached, or the async generator is closed), the thread is
+    told to stop and the producer generator is closed.
+
+    :param produce: Callable returning a (blocking) generator.
+    :param max_pending: Maximum number of items produced but not yet consumed.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=max_pending)
+    stopped = threading.Event()
+
+    def put(item):
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def run():
+        error = None
+        generator = produce()
+        try:
+            for item in generator:
+                if stopped.is_set():
+                    return
+                put((item, None))
+        except BaseException as e:
+            error = e
+        finally:
+            generator.close()
+        if not stopped.is_set():
+            try:
+                put((_END, error))
+            except (RuntimeError, concurrent.futures.CancelledError):  # Event loop closed or closing
+                pass
+
+    threading.Thread(target=run, name="stream-reader", daemon=True).start()
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
+        while not queue.empty():  # Unblock a pending put, so that the thread can see it has been stopped
+            queue.get_nowait()
+
+
+def read_blocks(file_obj, block_size=BLOCK_SIZE):
+    """
+    Reads a file object in blocks of `block_size` (blocking generator).
+    """
+    while True:
+        block = file_obj.read(block_size)
+        if not block:
+            return
+        yield block
+
+
+def read_line_batches(file_obj, block_size=BLOCK_SIZE, decode=None):
+    """
+    Reads a binary or text file object in large blocks and splits each block into complete lines (blocking generator).
+
+    :param file_obj: File object opened in binary or text mode.
+    :param block_size: Size of each read.
+    :param decode: Optional callable applied to each non-blank line. It may return None to drop a line.
+    :return: Generator of lists of lines (without line terminators) or of decoded records.
+    """
+    remainder = None
+    for block in read_blocks(file_obj, block_size):
+        if remainder:
+            block = remainder + block
+        lines = block.split(b"\n" if isinstance(block, bytes) else "\n")
+        remainder = lines.pop()  # Incomplete line (or empty, if the block ended with a line terminator)
+        yield _prepare_lines(lines, decode)
+    if remainder:
+        yield _prepare_lines([remainder], decode)
+
+
+def _prepare_lines(lines, decode):
+    if decode is None:
+        return lines
+    records = []
+    for line in lines:
+        if line.strip():
+            record = decode(line)
+            if record is not None:
+                records.append(record)
+    return records
+
+
+async def stream_line_batches(file_obj, decode=None, block_size=BLOCK_SIZE, max_pending=MAX_PENDING):
+    """
+    Yields batches of lines (or of records, if `decode` is given) read from a file object in a background thread.
+    Reading, line splitting and decoding all happen in the thread, with one event-loop handoff per batch.
+    """
+    async for batch in iterate_in_thread(lambda: read_line_batches(file_obj, block_size, decode), max_pending):
+        yield batch
+
+
+async def stream_lines(file_obj, decode=None, block_size=BLOCK_SIZE, max_pending=MAX_PENDING):
+    """
+    Yields the lines (or records, if `decode` is given) of a file object, read in a background thread.
+
+    Usage:
+        async for record in stream_lines(open(path, 'rb'), decode=json.loads):
+            ...
+    """
+    async for batch in stream_line_batches(file_obj, decode, block_size, max_pending):
+        for item in batch:
+            yield item
+
+
+async def stream_blocks(file_obj, block_size=BLOCK_SIZE, max_pending=MAX_PENDING):
+    """
+    Yields the raw blocks of a file object, read in a background thread.
+    """
+    async for block in iterate_in_thread(lambda: read_blocks(file_obj, block_size), max_pending):
+        yield block
+
+
+def read_mapped_records(file_obj, separator, decode, batch_size=RECORD_BATCH_SIZE, start=0, end=None):
+    """
+    Reads separator-delimited records from an uncompressed file by memory-mapping it (blocking generator).
+
+    Separators are located with `find` directly on the mapping, and each record is copied out exactly once, to be
+    decoded. Pages that have been consumed are released periodically, so resident memory stays constant however large
+    the file.
+
+    :param file_obj: Binary file object backed by a regular file.
+    :param separator: Record separator, e.g. b"\x1e" for GeoJSON Text Sequences (RFC 8142).
+    :param decode: Callable applied to each non-blank record. It may return None to drop a record.
+    :param batch_size: Number of decoded records per yielded batch.
+    :param start: Offset at which to start reading (see `aligned_offsets`).
+    :param end: Offset at which to stop reading (default: end of file).
+    :return: Generator of lists of decoded records.
+    """
+    if os.fstat(file_obj.fileno()).st_size == 0:
+        return  # Empty files cannot be mapped
+    with mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+        size = len(mapping) if end is None else min(end, len(mapping))
+        if hasattr(mapping, "madvise"):
+            mapping.madvise(mmap.MADV_SEQUENTIAL)
+        released = start // mmap.PAGESIZE * mmap.PAGESIZE  # Page-aligned offset up to which pages have been released
+        batch = []
+        while start < size:
+            position = mapping.find(separator, start, size)
+            if position == -1:
+                position = size
+            if position > start:
+                record = mapping[start:position]
+                if not record.isspace() and (decoded := decode(record)) is not None:
+                    batch.append(decoded)
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+            start = position + len(separator)
+            if hasattr(mapping, "madvise") and start - released >= RELEASE_INTERVAL:
+                release_to = min(start, size) // mmap.PAGESIZE * mmap.PAGESIZE
+                mapping.madvise(mmap.MADV_DONTNEED, released, release_to - released)
+                released = release_to
+        if batch:
+            yield batch
+
+
+def aligned_offsets(file_path, count, separator, start=0):
+    """
+    Divides a file of separator-delimited records into up to `count` byte ranges of similar size, each beginning at a
+    separator (or at `start`), so that every record falls entirely within one range.
+
+    :param file_path: Path of an uncompressed file.
+    :param count: Number of ranges.
+    :param separator: Record separator.
+    :param start: Offset of the first range (must itself be a range boundary).
+    :return: Sorted list of boundary offsets, from `start` to the file size; range i is [offsets[i], offsets[i + 1]).
+    """
+    size = os.path.getsize(file_path)
+    offsets = [start]
+    if size > start:
+        with open(file_path, "rb") as file_obj, mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+            for i in range(1, count):
+                nominal = start + (size - start) * i // count
+                position = mapping.find(separator, max(nominal, offsets[-1] + 1))
+                if position == -1:
+                    break
+                offsets.append(position)
+    if offsets[-1] < size:
+        offsets.append(size)
+    return offsets
+
+
+def read_buffered_records(file_obj, separator, decode, batch_size=RECORD_BATCH_SIZE, buffer_size=RING_BUFFER_SIZE):
+    """
+    Reads separator-delimited records from a (typically compressed) stream into a fixed, reused buffer (blocking
+    generator). Only the tail of an incomplete record is ever moved; the buffer grows only if a single record is larger
+    than it.
+
+    :param file_obj: Binary file object supporting `readinto`.
+    :param separator: Record separator.
+    :param decode: Callable applied to each non-blank record. It may return None to drop a record.
+    :param batch_size: Number of decoded records per yielded batch.
+    :param buffer_size: Initial buffer size.
+    :return: Generator of lists of decoded records.
+    """
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    start = end = 0  # Unconsumed data is buffer[start:end]
+    batch = []
+    eof = False
+    while not eof or start < end:
+        if not eof:
+            if start > 0:  # Move the incomplete record to the front of the buffer
+                buffer[:end - start] = view[start:end]
+                end -= start
+                start = 0
+            if end == len(buffer):  # A single record fills the whole buffer
+                logger.warning(f"Record exceeds {len(buffer)} bytes: growing read buffer")
+                view.release()
+                buffer.extend(bytes(len(buffer)))
+                view = memoryview(buffer)
+            read = file_obj.readinto(view[end:])
+            if read:
+                end += read
+            else:
+                eof = True
+        scan = start
+        while True:
+            position = buffer.find(separator, scan, end)
+            if position == -1:
+                if not eof:
+                    break
+                position = end  # The final record need not be followed by a separator
+            if position > scan:
+                record = bytes(view[scan:position])
+                if not record.isspace() and (decoded := decode(record)) is not None:
+                    batch.append(decoded)
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+            scan = position + len(separator)
+            if scan >= end:
+                break
+        start = min(scan, end)
+    if batch:
+        yield batch
+
+
+async def stream_separated_records(file_obj, decode, separator=b"\x1e", max_pending=MAX_PENDING):
+    """
+    Yields the decoded records of a separator-delimited file object, read in a background thread: uncompressed files
+    are memory-mapped, and other streams are read through a fixed-size buffer.
+    """
+    if isinstance(file_obj, io.BufferedReader) and file_obj.seekable():
+        produce = lambda: read_mapped_records(file_obj, separator, decode)
+    else:
+        produce = lambda: read_buffered_records(file_obj, separator, decode)
+    async for batch in iterate_in_thread(produce, max_pending):
+        for record in batch:
+            yield record
+
+
+def read_csv_batches(file_obj, delimiter=",", column_names=None, column_types=None, quote_char='"',
+                     block_size=BLOCK_SIZE):
+    """
+    Reads a delimited text file as Arrow RecordBatches with pyarrow's C++ CSV reader (blocking generator). Requires
+    pyarrow (check `pa_csv is not None`).
+
+    Columns are read as strings unless `column_types` gives them a type, so that identifiers and codes keep their exact
+    text (e.g. leading zeros) rather than being inferred as numbers. Empty fields are empty strings in string columns
+    and nulls in typed columns. Rows with the wrong number of fields are logged and skipped.
+
+    :param file_obj: Binary file object (e.g. a member of a ZIP archive).
+    :param delimiter: Field delimiter.
+    :param column_names: Column names; if None, they are read from the header line.
+    :param column_types: Optional dictionary of column name to Arrow type name, e.g. {"latitude": "float64"}.
+    :param quote_char: Quote character, or False if fields are never quoted (e.g. GeoNames dumps).
+    :param block_size: Bytes of the file parsed per batch.
+    :return: Generator of pyarrow.RecordBatch.
+    """
+    if column_names is None:
+        header = file_obj.readline().decode("utf-8-sig").rstrip("\r\n")
+        column_names = next(csv.reader([header], delimiter=delimiter, quotechar=quote_char or '"',
+                                       quoting=csv.QUOTE_MINIMAL if quote_char else csv.QUOTE_NONE))
+    types = {name: pa.string() for name in column_names}
+    types.update({name: pa.type_for_alias(type_name) for name, type_name in (column_types or {}).items()})
+
+    def skip_invalid_row(row):
+        logger.warning(f"Skipping row with {row.actual_columns} of {row.expected_columns} fields: "
+                       f"{(row.text or '')[:1000]}")
+        return "skip"
+
+    reader = pa_csv.open_csv(
+        file_obj,
+        read_options=pa_csv.ReadOptions(column_names=column_names, block_size=block_size),
+        parse_options=pa_csv.ParseOptions(delimiter=delimiter, quote_char=quote_char,
+                                          invalid_row_handler=skip_invalid_row),
+        convert_options=pa_csv.ConvertOptions(column_types=types, strings_can_be_null=False,
+                                              quoted_strings_can_be_null=False),
+    )
+    for batch in reader:
+        if batch.num_rows:
+            yield batch
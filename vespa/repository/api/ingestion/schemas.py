@@ -0,0 +1,80 @@
+# /ingestion/schemas.py
+"""
+Record schemas for schema-directed decoding of large source records (see `record_decoder` in streamer.py).
+
+Each schema lists only the fields read by the dataset's transformer, subtransformers and filters. When a file
+configuration sets `'schema'` to the name of one of them, records are decoded with msgspec, which skips every other
+field inside its C decoder instead of building it as Python objects. Schemas are TypedDicts, so decoded records are
+still plain dictionaries (with absent keys omitted) and the transformers and filter lambdas consume them unchanged.
+
+Values whose shape varies between records are typed `Any` and decoded in full, so that schema-directed decoding never
+rejects a record that `json.loads` would accept.
+"""
+from typing import Any, Dict, List, TypedDict, Union
+
+
+# Wikidata: https://doc.wikimedia.org/Wikibase/master/php/docs_topics_json.html
+
+class WikidataDataValue(TypedDict, total=False):
+    value: Any
+
+
+class WikidataSnak(TypedDict, total=False):
+    datavalue: WikidataDataValue
+
+
+class WikidataStatement(TypedDict, total=False):
+    mainsnak: WikidataSnak
+
+
+WikidataClaims = TypedDict('WikidataClaims', {
+    'P31': List[WikidataStatement],  # Instance of
+    'P625': List[WikidataStatement],  # Coordinate location
+    'P1566': List[WikidataStatement],  # GeoNames ID
+}, total=False)
+
+
+class WikidataLabel(TypedDict, total=False):
+    language: str
+    value: str
+
+
+class WikidataEntity(TypedDict, total=False):
+    id: str
+    labels: Union[Dict[str, WikidataLabel], List[Any]]  # Empty maps may be serialised as []
+    claims: Union[WikidataClaims, List[Any]]
+
+
+# Library of Congress MADS/RDF JSON-LD
+
+LOCGraphItem = TypedDict('LOCGraphItem', {
+    '@type': Any,
+    'madsrdf:hasExactExternalAuthority': Any,
+    'madsrdf:hasCloseExternalAuthority': Any,
+    'madsrdf:identifiesRWO': Any,
+}, total=False)
+
+LOCRecord = TypedDict('LOCRecord', {
+    '@graph': List[LOCGraphItem],
+}, total=False)
+
+
+# Getty TGN Linked Art JSON-LD
+
+class LinkedArtReference(TypedDict, total=False):
+    id: str
+
+
+class LinkedArtIdentifier(TypedDict, total=False):
+    id: str
+    type: Any
+    value: Any
+    content: Any
+    classified_as: List[LinkedArtReference]
+    language: List[LinkedArtReference]
+
+
+class LinkedArtPlace(TypedDict, total=False):
+    id: str
+    identified_by: List[LinkedArtIdentifier]
+    classified_as: List[LinkedArtReference]
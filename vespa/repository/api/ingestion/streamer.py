@@ -11,27 +11,191 @@ import urllib.parse
 import zipfile
 
 import ijson
-import requests
 import xmltodict
-from tqdm import tqdm
+
+from . import schemas
+from .decompression import open_external, open_parallel
+from .downloader import DownloadManager
+from .readers import (aligned_offsets, iterate_in_thread, pa_csv, read_csv_batches, read_mapped_records, stream_lines,
+                      stream_separated_records)
 
 logger = logging.getLogger(__name__)
 
+try:
+    ijson_backend = ijson.get_backend('yajl2_c')  # C backend: several times faster than the pure-Python default
+except ImportError:
+    logger.warning("ijson yajl2_c backend not available, falling back to the default backend")
+    ijson_backend = ijson
+
+try:
+    import msgspec  # Optional: schema-directed partial decoding (see schemas.py)
+except ImportError:
+    msgspec = None
+
+INGESTION_PATH = "/ix1/whcdh/data"  # Path to the ingestion folder
+
+# Record separators of the file types that can be read in independent byte ranges (see `StreamFetcher.shards`)
+SHARD_SEPARATORS = {
+    'ndjson': b"\n",
+    'wikidata': b"\n",
+    'geojsonseq': b"\x1e",
+}
 
-class AsyncLineIterator:
-    def __init__(self, file_obj):
-        self.file_obj = file_obj
+CSV_FILE_TYPES = ['csv', 'tsv', 'txt']  # File types parsed as delimited text (see `StreamFetcher.get_batches`)
+
+
+def prefiltered(decode, prefilter):
+    """
+    Wraps a record decoder with a byte-level prefilter: raw records that contain none of the `prefilter` substrings are
+    dropped without being decoded. Prefilters are a cheap first pass only; the dataset's `filters` still apply to the
+    decoded records.
 
-    def __aiter__(self):
-        return self
+    :param decode: Record decoder.
+    :param prefilter: List of substrings (str or bytes), or None.
+    :return: The wrapped decoder (or `decode` itself if there is no prefilter).
+    """
+    if not prefilter:
+        return decode
+    patterns = [pattern.encode('utf-8') if isinstance(pattern, str) else pattern for pattern in prefilter]
+    text_patterns = [pattern.decode('utf-8') for pattern in patterns]
+
+    def decode_matching(record):
+        for pattern in text_patterns if isinstance(record, str) else patterns:
+            if pattern in record:
+                return decode(record)
+        return None
+
+    return decode_matching
+
+
+def record_decoder(file_type, schema=None, prefilter=None):
+    """
+    Builds the decoder for the raw records (lines, or GeoJSON Text Sequence records) of a file.
 
-    async def __anext__(self):
-        loop = asyncio.get_running_loop()
-        line = await loop.run_in_executor(None, self.file_obj.readline)
-        if line:
-            return line
+    :param file_type: File type; lines of a 'wikidata' dump are elements of a JSON array, with trailing commas.
+    :param schema: Optional name of a record schema in schemas.py: only its fields are decoded, using msgspec.
+    :param prefilter: Optional list of substrings, at least one of which a raw record must contain (see `prefiltered`).
+    :return: Callable decoding one raw record, or returning None for records to be skipped.
+    """
+    loads = json.loads
+    if schema is not None:
+        if msgspec is None:
+            logger.warning(f"msgspec not available: decoding {schema} records in full")
         else:
-            raise StopAsyncIteration
+            loads = msgspec.json.Decoder(getattr(schemas, schema)).decode
+
+    def decode_record(record):
+        try:
+            return loads(record)
+        except Exception as e:  # json.JSONDecodeError or msgspec.DecodeError
+            logger.error(f"Error decoding JSON record: {record[:1000]}. Error: {e}")
+            raise
+
+    def decode_wikidata_line(line):
+        line = line.rstrip().rstrip(b"," if isinstance(line, bytes) else ",")
+        if len(line) <= 1:  # Opening or closing bracket of the array
+            return None
+        return decode_record(line)
+
+    return prefiltered(decode_wikidata_line if file_type == 'wikidata' else decode_record, prefilter)
+
+
+def triple_decoder(predicates=None, objects=None, distinct_subjects=False):
+    """
+    Builds the decoder for the lines of an N-Triples file.
+
+    Lines are first checked with byte substring tests against the allow-lists, so that the great majority of lines
+    of a large dump are rejected without being decoded or split. The allow-lists are then applied exactly to the
+    lines that pass.
+
+    :param predicates: Optional list of predicate IRIs, one of which a triple must have.
+    :param objects: Optional list of object IRIs, one of which a triple must have.
+    :param distinct_subjects: If True, only the first accepted triple of each subject is returned.
+    :return: Callable decoding one line (bytes) into a {'subject', 'predicate', 'object'} dictionary, or returning
+             None for lines to be skipped.
+    """
+    predicate_terms = {f"<{predicate}>".encode('utf-8') for predicate in predicates or []}
+    object_terms = {f"<{obj}>".encode('utf-8') for obj in objects or []}
+    seen_subjects = set()
+
+    def decode_triple(line):
+        if predicate_terms and not any(term in line for term in predicate_terms):
+            return None
+        if object_terms and not any(term in line for term in object_terms):
+            return None
+        line = line.strip()
+        if not line or line.startswith(b'#'):
+            return None
+        if line.endswith(b'.'):
+            line = line[:-1].rstrip()
+        parts = line.split(maxsplit=2)
+        if len(parts) != 3:
+            logger.error(f"Failed to parse N-Triple line: {line[:1000]}. Triple must have exactly three components")
+            return None
+        subject, predicate, obj = parts
+        if predicate_terms and predicate not in predicate_terms or object_terms and obj not in object_terms:
+            return None  # The term occurred elsewhere in the line, e.g. inside a literal
+        if distinct_subjects:
+            if subject in seen_subjects:
+                return None
+            seen_subjects.add(subject)
+        return {
+            'subject': subject.decode('utf-8', errors='replace').strip('<>'),
+            'predicate': predicate.decode('utf-8', errors='replace').strip('<>'),
+            'object': obj.decode('utf-8', errors='replace').strip('<>'),
+        }
+
+    return decode_triple
+
+
+class StreamShard:
+    """
+    An independent reader over one byte range of an uncompressed, separator-delimited file (see
+    `StreamFetcher.shards`). Shards hold no open resources, so they can be sent to worker processes.
+    """
+
+    def __init__(self, file_path, file_type, start, end, prefilter=None, schema=None):
+        """
+        :param file_path: Path of the file.
+        :param file_type: One of the keys of SHARD_SEPARATORS.
+        :param start: Offset of the start of the range (a separator, or the start of the file).
+        :param end: Offset of the end of the range (exclusive).
+        :param prefilter: Optional list of substrings, at least one of which a raw record must contain.
+        :param schema: Optional name of a record schema (see schemas.py).
+        """
+        self.file_path = file_path
+        self.file_type = file_type
+        self.start = start
+        self.end = end
+        self.prefilter = prefilter
+        self.schema = schema
+
+    def __repr__(self):
+        return f"StreamShard({self.file_path!r}, {self.start}-{self.end})"
+
+    def iter_batches(self):
+        """
+        Blocking generator of lists of decoded records.
+        """
+        with open(self.file_path, 'rb') as file_obj:
+            yield from read_mapped_records(file_obj, SHARD_SEPARATORS[self.file_type],
+                                           record_decoder(self.file_type, self.schema, self.prefilter),
+                                           start=self.start, end=self.end)
+
+    def iter_items(self):
+        """
+        Blocking generator of decoded records.
+        """
+        for batch in self.iter_batches():
+            yield from batch
+
+    async def get_items(self):
+        """
+        Yields the decoded records of the range, read in a background thread.
+        """
+        async for batch in iterate_in_thread(self.iter_batches):
+            for item in batch:
+                yield item
 
 
 class StreamFetcher:
@@ -69,9 +233,6 @@ class StreamFetcher:
         _parse_nt_stream(stream):
             Parses an N-Triple stream and yields subject-predicate-object triples.
 
-        _split_triple(line):
-            Splits a line from an N-Triple stream into subject, predicate, and object.
-
     Exceptions:
         ValueError: Raised if the file format is unsupported or if required elements are not found.
         Exception: Raised for network or file processing errors.
@@ -86,9 +247,21 @@ class StreamFetcher:
         self.item_path = file.get('item_path', None)  # Path to the items in a JSON file
         self.fieldnames = file.get('fieldnames', None)  # Fieldnames for CSV files
         self.delimiter = file.get('delimiter', '\t')  # Delimiter for CSV files
+        self.column_types = file.get('column_types', None)  # Arrow types of CSV columns (others are read as strings)
+        self.quote_char = file.get('quote_char', '"')  # Quote character for CSV files, or False if never quoted
         self.local_name = file.get('local_name', None)  # Local name for the downloaded file
-        self.ingestion_path = "/ix1/whcdh/data"  # Path to the ingestion folder
+        self.prefilter = file.get('prefilter', None)  # Substrings, one of which a raw record must contain
+        self.checksum = file.get('checksum', None)  # Expected digest of the download, e.g. "sha256:<hex>"
+        self.checksum_url = file.get('checksum_url', None)  # URL of a published checksum file (e.g. md5sums.txt)
+        self.schema = file.get('schema', None)  # Name of a record schema for partial decoding (see schemas.py)
+        self.predicates = file.get('predicates', None)  # Predicate IRIs of the N-Triples to keep
+        self.objects = file.get('objects', None)  # Object IRIs of the N-Triples to keep
+        self.distinct_subjects = file.get('distinct_subjects', False)  # Keep only the first triple of each subject
+        self.decompression_workers = file.get('decompression_workers', min(8, os.cpu_count() or 1))
+        self.external_decompressor = file.get('external_decompressor', None)  # e.g. 'pigz' for plain gzip files
+        self.ingestion_path = INGESTION_PATH
         self.stream = None
+        self.downloaded_path = None
 
     def close_stream(self):
         """
@@ -129,33 +302,11 @@ class StreamFetcher:
             self.logger.info(f"Using existing local file: {file_path}")
             return file_path
 
-        file_path = self.get_file_path()
-        if os.path.exists(file_path):
-            self.logger.info(f"File already exists at {file_path}, skipping download.")
-            return file_path
-
-        self.logger.info(f"Downloading file from {self.file_url} to {file_path}")
-
-        try:
-            with requests.get(self.file_url, stream=True, timeout=30) as r:
-                r.raise_for_status()
-                total = int(r.headers.get('content-length', 0))
-                with open(file_path, 'wb') as f, tqdm(
-                        desc=os.path.basename(file_path),
-                        total=total,
-                        unit='B',
-                        unit_scale=True,
-                        unit_divisor=1024,
-                ) as bar:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                        bar.update(len(chunk))
-            self.logger.info(f"File downloaded successfully to {file_path}")
-            return file_path
-
-        except requests.RequestException as e:
-            self.logger.error(f"Failed to download file: {e}")
-            raise
+        if self.downloaded_path is None:  # Revalidate once per StreamFetcher
+            # Downloads in parallel, resumes partial downloads, revalidates existing files and verifies checksums
+            self.downloaded_path = DownloadManager().download(self.file_url, self.get_file_path(),
+                                                              checksum=self.checksum, checksum_url=self.checksum_url)
+        return self.downloaded_path
 
     def get_stream(self):
         try:
@@ -164,7 +315,7 @@ class StreamFetcher:
 
             # For Wikidata, open stream in 'rt' mode:
             if file_path == '/ix1/whcdh/data/wikidata/latest-all/latest-all.json.gz':
-                return gzip.open(file_path, 'rt', encoding='utf-8')
+                return io.TextIOWrapper(self._open_compressed(file_path, 'gzip'), encoding='utf-8')
 
             # if self.file_type == 'pleiades':
             #     logger.info(f"Opening Pleiades file {file_path} in text mode")
@@ -178,18 +329,11 @@ class StreamFetcher:
                 # Reattach to the tmux session with `tmux attach -t osmium_export`
                 exit("OSM PBF files are not supported. Please convert to geojsonseq format first.")
 
-            # Check for gzip compression by inspecting magic bytes
-            with open(file_path, 'rb') as file:
-                magic_bytes = file.read(2)
-                is_gzip = magic_bytes == b'\x1f\x8b'
-                is_bz2 = magic_bytes == b'\x42\x5a'
-
-            if is_gzip:
-                self.logger.info(f"Detected gzip compression for file {file_path}")
-                return gzip.open(file_path, 'rb')
-            elif is_bz2:
-                self.logger.info(f"Detected bz2 compression for file {file_path}")
-                return bz2.open(file_path, 'rb')
+            compression = self._detect_compression(file_path)
+
+            if compression:
+                self.logger.info(f"Detected {compression} compression for file {file_path}")
+                return self._open_compressed(file_path, compression)
             elif file_path.endswith('.zip'):
                 self.logger.info(f"Opening zip archive {file_path}")
                 return self._get_zip_stream(file_path)
@@ -200,18 +344,68 @@ class StreamFetcher:
             self.logger.error(f"Failed to open stream for {self.file_url}. Error: {e}")
             raise
 
-    def _get_regular_file_stream(self, file_path):
-        """Return an asynchronous file stream."""
+    @staticmethod
+    def _detect_compression(file_path):
+        """
+        Checks for gzip or bz2 compression by inspecting magic bytes.
 
-        async def async_file_stream():
-            with open(file_path, 'rb') as file:
-                while True:
-                    line = await asyncio.to_thread(file.readline)
-                    if not line:  # EOF
-                        break
-                    yield line
+        :return: 'gzip', 'bz2' or None.
+        """
+        with open(file_path, 'rb') as file:
+            magic_bytes = file.read(2)
+        if magic_bytes == b'\x1f\x8b':
+            return 'gzip'
+        if magic_bytes == b'\x42\x5a':
+            return 'bz2'
+        return None
+
+    def _open_compressed(self, file_path, compression):
+        """
+        Opens a gzip or bz2 file as a decompressed binary stream, using (in order of preference) parallel block
+        decompression, the configured external decompressor, or the standard library.
+        """
+        stream = open_parallel(file_path, compression, self.decompression_workers)
+        if stream is None and self.external_decompressor:
+            stream = open_external(file_path, self.external_decompressor)
+        if stream is None:
+            stream = gzip.open(file_path, 'rb') if compression == 'gzip' else bz2.open(file_path, 'rb')
+        return stream
+
+    def is_shardable(self):
+        """
+        :return: True if the file can be read in independent byte ranges with `shards`.
+        """
+        if self.file_type not in SHARD_SEPARATORS:
+            return False
+        file_path = self._download_file()
+        return not file_path.endswith('.zip') and self._detect_compression(file_path) is None
+
+    def shards(self, n, start=0):
+        """
+        Divides the file into up to `n` independent readers over byte ranges of similar size. Ranges are aligned to
+        record separators, so each record is read by exactly one shard, and concatenating the shards' records in order
+        reproduces the file.
+
+        :param n: Number of shards.
+        :param start: Byte offset from which to shard, which must be a shard boundary (e.g. the `end` of a shard
+                      returned by an earlier call with the same file).
+        :return: List of StreamShard objects, in file order.
+        :raises ValueError: If the file is compressed or not separator-delimited.
+        """
+        if not self.is_shardable():
+            raise ValueError(f"Cannot shard {self.file_type} file {self.file_url}: an uncompressed "
+                             f"{'/'.join(SHARD_SEPARATORS)} file is required")
+        file_path = self._download_file()
+        offsets = aligned_offsets(file_path, n, SHARD_SEPARATORS[self.file_type], start)
+        self.logger.info(f"Divided {file_path} into {len(offsets) - 1} shards from offset {start}")
+        return [StreamShard(file_path, self.file_type, offset, end, self.prefilter, self.schema)
+                for offset, end in zip(offsets, offsets[1:])]
 
-        return async_file_stream()
+    def _get_regular_file_stream(self, file_path):
+        """
+        Return a binary file object. Parsers read it in large blocks in a background thread (see readers.py).
+        """
+        return open(file_path, 'rb')
 
     def _get_zip_stream(self, zip_path):
         with zipfile.ZipFile(zip_path, 'r') as zip_file:
@@ -239,7 +433,7 @@ class StreamFetcher:
             return self._parse_ndjson_stream(self.stream)
         elif format_type == 'geojsonseq':
             return self._parse_geojsonseq_stream(self.stream)
-        elif format_type in ['csv', 'tsv', 'txt']:
+        elif format_type in CSV_FILE_TYPES:
             return self._parse_csv_stream(self.stream)
         elif format_type == 'xml':
             return self._parse_xml_stream(self.stream)
@@ -260,14 +454,28 @@ class StreamFetcher:
     #     for item in iterator:
     #         yield item
 
-    def _parse_json_stream(self, stream):
-        # Use asyncio.to_thread to run the ijson parsing in a separate thread
-        parser = asyncio.to_thread(ijson.items, stream, f"{self.item_path}.item")
+    def _parse_json_stream(self, stream, batch_size=256):
+        """
+        Parses the items of a JSON array in a dedicated thread, so that parsing never blocks the event loop and
+        overlaps with transformation and feeding. Items are handed over in batches through a bounded queue.
+        """
+        prefix = f"{self.item_path}.item"
+
+        def parse_batches():
+            batch = []
+            # use_float: numbers are parsed as floats rather than Decimal, which json.dumps cannot serialise
+            for item in ijson_backend.items(stream, prefix, use_float=True, buf_size=1024 * 1024):
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
 
         async def iterator():
-            # Await the result from asyncio.to_thread and process items in a normal loop
-            for item in await parser:
-                yield item
+            async for batch in iterate_in_thread(parse_batches):
+                for item in batch:
+                    yield item
 
         return iterator()
 
@@ -276,75 +484,55 @@ class StreamFetcher:
         Parses a Wikidata JSON dump from a pre-opened text stream (e.g., gzip.open(..., 'rt')).
         Yields individual JSON items.
         """
-
-        def iter_wikidata_stream(f):
-            for line in f:
-                if line in {'[\n', ']\n'}:
-                    continue
-                if line.endswith(',\n'):
-                    line = line[:-2]
-                obj = json.loads(line)
-                yield obj
-
-        loop = asyncio.get_running_loop()
-        gen = iter_wikidata_stream(self.file_name)
-
-        def next_item():
-            try:
-                return next(gen)
-            except StopIteration:
-                return None
-
-        while True:
-            item = await loop.run_in_executor(None, next_item)
-            if item is None:
-                break
+        async for item in stream_lines(stream, decode=record_decoder('wikidata', self.schema, self.prefilter)):
             yield item
 
     async def _parse_ndjson_stream(self, stream):
         """
         Asynchronously parses an NDJSON stream and yields each document.
         """
-        async for line in AsyncLineIterator(stream):
-            line = line.strip()
-            if line:
-                try:
-                    yield json.loads(line)
-                except json.JSONDecodeError as e:
-                    self.logger.error(f"Error decoding JSON line: {line}. Error: {e}")
-                    raise
+        async for document in stream_lines(stream, decode=record_decoder('ndjson', self.schema, self.prefilter)):
+            yield document
 
     def _parse_geojsonseq_stream(self, stream):
-        async def iterator():
-            # Process each record one-by-one
-            buffer = b""
-
-            async for chunk in stream:
-                buffer += chunk
-
-                # Only process when we have enough data to complete a record
-                while True:
-                    # Find the position of the Record Separator (RS) in the buffer
-                    rs_pos = buffer.find(b'\x1e')  # Record Separator is 0x1e (RS)
-                    if rs_pos == -1:
-                        break  # No more complete records yet, wait for more data
-
-                    # Process the record up to the RS
-                    record = buffer[:rs_pos].decode("utf-8").strip()
-                    if record:
-                        try:
-                            yield json.loads(record)  # Yield the parsed JSON object
-                        except json.JSONDecodeError as e:
-                            self.logger.error(f"Error parsing line: {record}. Error: {e}")
-                            raise
-
-                    # Move the buffer past the processed record and RS
-                    buffer = buffer[rs_pos + 1:]
+        """
+        Parses a GeoJSON Text Sequence (records preceded by the 0x1e Record Separator). Uncompressed files are
+        memory-mapped; compressed streams are read through a fixed-size buffer.
+        """
+        return stream_separated_records(stream, record_decoder('geojsonseq', self.schema, self.prefilter))
 
-        return iterator()
+    def supports_batches(self):
+        """
+        :return: True if the file can be read as Arrow RecordBatches with `get_batches`.
+        """
+        return self.file_type in CSV_FILE_TYPES and pa_csv is not None
+
+    def _read_csv_batches(self, stream):
+        return read_csv_batches(stream, delimiter=self.delimiter, column_names=self.fieldnames,
+                                column_types=self.column_types, quote_char=self.quote_char)
+
+    async def get_batches(self):
+        """
+        Yields the rows of a CSV file as Arrow RecordBatches, parsed in a background thread (see `supports_batches`).
+        """
+        self.stream = self.get_stream()
+        async for batch in iterate_in_thread(lambda: self._read_csv_batches(self.stream)):
+            yield batch
 
     def _parse_csv_stream(self, stream):
-        # Parse CSV from stream
+        """
+        Parses CSV rows into dictionaries. Rows are read in columnar batches with pyarrow if it is available, falling
+        back to csv.DictReader.
+        """
+        if pa_csv is not None:
+            async def batch_rows():
+                async for batch in iterate_in_thread(lambda: self._read_csv_batches(stream)):
+                    for row in batch.to_pylist():
+                        yield row
+
+            return batch_rows()
+
+        logger.warning("pyarrow not available: parsing CSV with csv.DictReader")
         wrapper = io.TextIOWrapper(stream, encoding='utf-8', errors='replace')
         csv_reader = csv.DictReader(wrapper, delimiter=self.delimiter, fieldnames=self.fieldnames)
 
@@ -373,39 +561,11 @@ class StreamFetcher:
         # Return the async iterator
         return async_generator()
 
-    def _split_triple(self, line):
-        parts = line.rstrip(' .').split(' ', 2)
-
-        if len(parts) != 3:
-            self.logger.error(f"Triple must have exactly three components: {line}")
-            raise ValueError("Triple must have exactly three components")
-
-        subject, predicate, obj = parts
-        return subject, predicate, obj
-
     async def _parse_nt_stream(self, stream):
-        wrapper = io.TextIOWrapper(stream, encoding='utf-8', errors='replace')
-
-        for line in wrapper:
-            # Simulate asynchronous I/O
-            await asyncio.sleep(0)
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-
-            try:
-                # Split N-Triple line into three components (subject, predicate, object)
-                subject, predicate, obj = self._split_triple(line)
-
-                # TODO: This would work only on a single filter, not a list of filters
-                # if self.filters and not predicate in self.filters:
-                #     continue
-
-                yield {
-                    'subject': subject.strip('<>'),
-                    'predicate': predicate.strip('<>'),
-                    'object': obj.strip('<>')
-                }
-            except ValueError as e:
-                self.logger.error(f"Failed to parse N-Triple line: {line}. Error: {e}")
-                continue
+        """
+        Parses an N-Triples stream in a background thread, yielding the triples that pass the `predicates` and
+        `objects` allow-lists (and, if `distinct_subjects` is set, only the first of each subject).
+        """
+        decode = triple_decoder(self.predicates, self.objects, self.distinct_subjects)
+        async for triple in stream_lines(stream, decode=decode):
+            yield triple
@@ -0,0 +1,123 @@
+# /ingestion/subtransformers/geonames/classes.py
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from ...streamer import INGESTION_PATH
+
+logger = logging.getLogger(__name__)
+
+
+class GeoNamesClassIndex:
+    """
+    A read-only lookup of the feature class and code of every GeoNames place by geonameid, for classifying the places
+    of other datasets (e.g. Wikidata, through P1566) without a Vespa query per record.
+
+    The index is a SQLite database built from the GeoNames dump (see GeoNamesClassIndexBuilder) and replaced
+    atomically, so it is opened as immutable: every process (transformation workers included) opens its own
+    connection (see `shared`) with no locking, and pages are memory-mapped.
+    """
+
+    RETRY_INTERVAL = 60  # Seconds before checking again for an index that was not found
+    MMAP_SIZE = 1 << 30
+
+    _shared = None
+    _lock = threading.Lock()
+    _failed_at = None
+
+    def __init__(self, path):
+        """
+        :param path: Path of the SQLite database file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(f"file:{path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+        self._connection.execute(f"PRAGMA mmap_size={self.MMAP_SIZE}")
+
+    @staticmethod
+    def default_path():
+        return os.path.join(INGESTION_PATH, "geonames_classes.sqlite")
+
+    @classmethod
+    def shared(cls):
+        """
+        :return: The index of this process, opened on first use, or None if it has not been built (checked again
+                 after RETRY_INTERVAL seconds).
+        """
+        if cls._shared is None:
+            with cls._lock:
+                if cls._shared is None and (cls._failed_at is None
+                                            or time.monotonic() - cls._failed_at >= cls.RETRY_INTERVAL):
+                    path = cls.default_path()
+                    if os.path.exists(path):
+                        cls._shared = cls(path)
+                        logger.info(f"Opened GeoNames class index {path}")
+                    else:
+                        logger.warning(f"GeoNames class index {path} not found: falling back to Vespa queries")
+                        cls._failed_at = time.monotonic()
+        return cls._shared
+
+    def get(self, geonameid):
+        """
+        :param geonameid: GeoNames ID (string or integer).
+        :return: Tuple of (feature class, feature code), or None if the ID is unknown.
+        """
+        try:
+            geonameid = int(geonameid)
+        except (TypeError, ValueError):
+            return None
+        with self._lock:
+            return self._connection.execute(
+                "SELECT feature_class, feature_code FROM classes WHERE geonameid = ?", (geonameid,)
+            ).fetchone()
+
+
+class GeoNamesClassIndexBuilder:
+    """
+    Builds a GeoNamesClassIndex in a temporary file, which replaces the index only once complete.
+
+    Usage:
+        builder = GeoNamesClassIndexBuilder(GeoNamesClassIndex.default_path())
+        builder.add(rows)  # Repeatedly
+        builder.commit()
+    """
+
+    def __init__(self, path):
+        """
+        :param path: Path of the index to (re)build.
+        """
+        self.path = path
+        self.temporary_path = f"{path}.tmp"
+        if os.path.exists(self.temporary_path):
+            os.remove(self.temporary_path)
+        self.count = 0
+        self._connection = sqlite3.connect(self.temporary_path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=OFF")
+        self._connection.execute("PRAGMA synchronous=OFF")
+        self._connection.execute(
+            "CREATE TABLE classes (geonameid INTEGER PRIMARY KEY, feature_class TEXT, feature_code TEXT)")
+
+    def add(self, rows):
+        """
+        :param rows: Iterable of (geonameid, feature class, feature code) tuples. Rows without a numeric ID are skipped.
+        """
+        rows = [(int(geonameid), feature_class or "", feature_code or "")
+                for geonameid, feature_class, feature_code in rows if geonameid and str(geonameid).isdigit()]
+        self._connection.executemany("INSERT OR REPLACE INTO classes VALUES (?, ?, ?)", rows)
+        self.count += len(rows)
+
+    def commit(self):
+        """
+        Completes the index and moves it into place.
+        """
+        self._connection.commit()
+        self._connection.close()
+        os.replace(self.temporary_path, self.path)
+        logger.info(f"Built GeoNames class index {self.path} of {self.count} places")
+
+    def abort(self):
+        self._connection.close()
+        if os.path.exists(self.temporary_path):
+            os.remove(self.temporary_path)
@@ -3,7 +3,7 @@ from typing import Dict, Any
 
 from ....bcp_47.bcp_47 import parse_bcp47_fields
 from ....dates.dates import year_from_value
-from ....utils import get_uuid
+from ....utils import get_stable_id
 
 logger = logging.getLogger(__name__)
 
@@ -49,7 +49,7 @@ class NamesProcessor:
         if isolanguage == 'wkdt':
             self.output['links'].append(
                 {
-                    "id": get_uuid(),
+                    "id": get_stable_id("gn", f'gn:{self.document_id}', 'owl:sameAs', f'wd:{alternateName}'),
                     "fields": {
                         'record_id': self.document_id,
                         'place_curie': f'gn:{self.document_id}',
@@ -66,7 +66,8 @@ class NamesProcessor:
         }
 
         self.output['names'].append({
-            'toponym_id': (toponym_id := self.name.get("alternateNameId", get_uuid())),
+            'toponym_id': (toponym_id := self.name.get("alternateNameId") or get_stable_id(
+                "gn", self.document_id, alternateName, isolanguage)),
             **years,
             **({'is_preferred': is_preferred} if (is_preferred := self.name.get('isPreferredName')) else {}),
         })
@@ -3,6 +3,7 @@ import re
 from typing import List, Dict, Any
 
 from ...namespace import namespaces
+from ....utils import get_stable_id
 
 logger = logging.getLogger(__name__)
 
@@ -69,9 +70,12 @@ class LinksProcessor:
         seen_pairs = set()  # Track pairs to avoid duplicates
         self.links.extend([
             {
-                "place_curie": x,
-                "predicate": "owl:sameAs",
-                "object": y,
+                "id": get_stable_id("loc", x, "owl:sameAs", y),
+                "fields": {
+                    "place_curie": x,
+                    "predicate": "owl:sameAs",
+                    "object": y,
+                }
             }
             for x in self.uris
             for y in self.uris
@@ -3,7 +3,7 @@ from typing import Dict, Any
 
 from ....bcp_47.bcp_47 import parse_bcp47_fields
 from ....dates.dates import year_from_value
-from ....utils import get_uuid
+from ....utils import get_stable_id
 
 logger = logging.getLogger(__name__)
 
@@ -60,7 +60,7 @@ class NamesProcessor:
         for name in name.split(';'):
             name = name.strip()
             self.output['names'].append({
-                'toponym_id': (toponym_id := get_uuid()),
+                'toponym_id': (toponym_id := get_stable_id("osm", self.document_id, name, isolanguage)),
                 **years,
                 **({'is_preferred': 1} if name_type == 'name' else {}),
                 **({'ipa': ipa} if ipa else {}),
@@ -2,7 +2,7 @@ import logging
 from typing import List, Dict, Any
 
 from ....dates.dates import year_from_value
-from ....utils import get_uuid
+from ....utils import get_stable_id
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +29,8 @@ class LinksProcessor:
         for link in self.place_links:
             links.append(
                 {
-                    "id": get_uuid(),
+                    "id": get_stable_id("pleiades", self.document_id, link.get("id"), link.get("connectionTypeURI"),
+                                        link.get("connectsTo")),
                     "fields": {
                         "record_id": link.get("id"),  # Pleiades connection ID
                         "place_curie": f"pleiades:{self.record_id}",
@@ -3,7 +3,7 @@ import re
 from typing import List, Dict, Any
 
 from ....dates.dates import year_from_value
-from ....utils import get_uuid, debracket
+from ....utils import get_stable_id, debracket
 
 logger = logging.getLogger(__name__)
 
@@ -77,7 +77,7 @@ class NamesProcessor:
             if expanded_toponym == "Ad Preto+ivm":
                 expanded_toponym = "Ad Pretorivm"
 
-            toponym_id = get_uuid()
+            toponym_id = get_stable_id("pleiades", self.document_id, expanded_toponym, toponym_language)
             self.output['names'].append({
                 'toponym_id': toponym_id,
                 **years,
@@ -0,0 +1,117 @@
+# /ingestion/subtransformers/points.py
+import json
+import logging
+
+import numpy as np
+
+from ...gis.utils import geo_to_cartesian_array
+from ...utils import get_stable_id
+
+logger = logging.getLogger(__name__)
+
+
+class PointBatchProcessor:
+    """
+    Transforms a pyarrow.RecordBatch of point records (e.g. GeoNames, GB1900) in bulk, producing one place and one
+    toponym per row, and no links.
+
+    Coordinates are validated and converted to ECEF for the whole batch at once, with numpy and a single pyproj call.
+    For a point, the bounding box, convex hull and representative point are the point itself, so no geometry objects are
+    built: the geometry fields of each place are assembled directly from its coordinates.
+    """
+
+    def __init__(self, batch, namespace, id_column, name_column, year_start, year_end, record_url=None,
+                 class_column=None, ccode_column=None, ccodes=None, language="en"):
+        """
+        :param batch: RecordBatch with `latitude` and `longitude` columns (float64, null where missing).
+        :param namespace: Namespace prefix of stable IDs (e.g. "gn").
+        :param id_column: Column holding the record ID.
+        :param name_column: Column holding the name of the place.
+        :param year_start: Start year of the names.
+        :param year_end: End year of the names.
+        :param record_url: Optional URL template of a record, with an `{id}` placeholder.
+        :param class_column: Optional column holding the (GeoNames) feature class.
+        :param ccode_column: Optional column holding an ISO 3166-1 alpha-2 country code.
+        :param ccodes: Optional fixed list of country codes for every place (used if there is no `ccode_column`).
+        :param language: BCP 47 language of the names.
+        """
+        self.batch = batch
+        self.namespace = namespace
+        self.id_column = id_column
+        self.name_column = name_column
+        self.year_start = year_start
+        self.year_end = year_end
+        self.record_url = record_url
+        self.class_column = class_column
+        self.ccode_column = ccode_column
+        self.ccodes = ccodes
+        self.language = language
+
+    def _column(self, name):
+        return self.batch.column(name).to_pylist() if name else [None] * self.batch.num_rows
+
+    def process(self) -> list:
+        """
+        :return: List of (place, toponyms, links) tuples, one per row.
+        """
+        lats = self.batch.column("latitude").to_numpy(zero_copy_only=False)
+        lngs = self.batch.column("longitude").to_numpy(zero_copy_only=False)
+        valid = np.isfinite(lats) & np.isfinite(lngs)
+        xs, ys, zs = geo_to_cartesian_array(lats, lngs).T
+
+        results = []
+        for i, (record_id, name, feature_class, ccode, lat, lng, x, y, z, has_point) in enumerate(zip(
+                self._column(self.id_column), self._column(self.name_column), self._column(self.class_column),
+                self._column(self.ccode_column), lats.tolist(), lngs.tolist(), xs.tolist(), ys.tolist(), zs.tolist(),
+                valid.tolist())):
+            document_id = record_id or get_stable_id(
+                self.namespace, json.dumps(self.batch.slice(i, 1).to_pylist()[0], sort_keys=True, default=str))
+            name = name or ""
+            toponym_id = get_stable_id(self.namespace, document_id, name, self.language)
+
+            fields = {
+                **({"record_id": record_id} if record_id else {}),
+                **({"record_url": self.record_url.format(id=record_id)} if self.record_url and record_id else {}),
+                "names": [
+                    {"toponym_id": toponym_id, "year_start": self.year_start, "year_end": self.year_end},
+                ],
+            }
+            if has_point:
+                point = json.dumps({"type": "Point", "coordinates": [lng, lat]})
+                fields.update({
+                    "bbox_sw_lat": lat,
+                    "bbox_sw_lng": lng,
+                    "bbox_ne_lat": lat,
+                    "bbox_ne_lng": lng,
+                    "bbox_antimeridial": False,
+                    "convex_hull": point,
+                    "locations": [{"geometry": point}],
+                    "representative_point": {"lat": lat, "lng": lng},
+                    "cartesian": [x, y, z],
+                })
+            else:
+                fields["bbox_antimeridial"] = False
+            if self.class_column:
+                fields["classes"] = [feature_class or ""]
+            if ccode:
+                fields["ccodes"] = [ccode]
+            elif self.ccodes:
+                fields["ccodes"] = self.ccodes
+
+            results.append((
+                {"id": document_id, "fields": fields},
+                [
+                    {
+                        "id": toponym_id,
+                        "fields": {
+                            "is_staging": True,
+                            "name_strict": name,
+                            "name": name,
+                            "places": [document_id],
+                            "bcp47_language": self.language,
+                        }
+                    }
+                ],
+                None  # No links
+            ))
+        return results
@@ -4,10 +4,11 @@ import re
 import unicodedata
 from typing import Dict, Any
 
+from shapely.geometry.geo import shape
+
 from ....bcp_47.bcp_47 import parse_bcp47_fields
-from ....gis.intersections import GeometryIntersect
+from ....gis.countries import country_codes
 from ....gis.utils import geo_to_cartesian
-from ....utils import get_uuid
 
 logger = logging.getLogger(__name__)
 
@@ -99,10 +100,7 @@ class LinkedArtProcessor:
 
                     'types': [aat.get('id').split('/')[-1] for aat in self.linked_art_ld.get('classified_as', [])],
 
-                    **({"ccodes": [
-                            meta["ISO_A2"] for result in GeometryIntersect(geometry=point_json).resolve()
-                            if (meta := json.loads(result["meta"]))["ISO_A2"] != "-"
-                        ]} if bbox_sw_lat and bbox_sw_lng else {}),
+                    **({"ccodes": country_codes(shape(point_json))} if bbox_sw_lat and bbox_sw_lng else {}),
 
                 },
                 'toponyms': self.toponyms,
@@ -1,7 +1,7 @@
 import logging
 from typing import Dict
 
-from ....utils import get_uuid
+from ....utils import get_stable_id
 
 logger = logging.getLogger(__name__)
 
@@ -60,7 +60,7 @@ class NamesProcessor:
                 continue
 
             self.output['names'].append({
-                'toponym_id': (toponym_id := get_uuid()),
+                'toponym_id': (toponym_id := get_stable_id("wd", self.document_id, name, language)),
                 'language': language,
                 'year_start': 2025,
                 'year_end': 2025,
@@ -1,6 +1,7 @@
 import logging
 from typing import List, Dict, Any
 
+from ..geonames.classes import GeoNamesClassIndex
 from ....config import VespaClient
 
 logger = logging.getLogger(__name__)
@@ -31,11 +32,16 @@ class TypesProcessor:
             if instance_of:
                 types.append(f"wd:{instance_of}")
 
+        index = GeoNamesClassIndex.shared() if self.geonames_id else None
         for geoname in self.geonames_id:
-            # Use Vespa query on gn: namespace to get GeoNames class
             record_id = geoname.get("mainsnak", {}).get("datavalue", {}).get("value")
             if not record_id:
                 continue
+            if index is not None:  # Look up the GeoNames class in the local index
+                if (entry := index.get(record_id)) and entry[0]:
+                    classes.append(entry[0])
+                continue
+            # Use Vespa query on gn: namespace to get GeoNames class
             try:
                 with VespaClient.sync_context("feed") as sync_app:
                     yql = f'select * from place where record_id = "{record_id}"'
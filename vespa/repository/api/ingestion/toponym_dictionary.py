@@ -0,0 +1,237 @@
+# /ingestion/toponym_dictionary.py
+import asyncio
+import logging
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ToponymDictionary:
+    """
+    On-disk dictionary of every toponym fed to Vespa, keyed by name, BCP 47 language and script, and shared by all
+    datasets, so that duplicate toponyms are resolved during transformation instead of being staged and condensed in
+    Vespa afterwards.
+
+    `deduplicate` is applied to the output of every transformer. The first toponym seen for a key becomes its
+    canonical toponym; later toponyms with the same key are dropped, the names of their places are pointed at the
+    canonical toponym (which may belong to another namespace), and each place is added to the canonical toponym once.
+    Toponyms are therefore fed as partial updates with `create` (see `IngestionManager._feed_documents`), with
+    `places` as an `add` operation, so documents fed by other records or datasets are extended rather than replaced.
+    Every update carries the fields of the toponym, so whichever update reaches Vespa first creates a complete
+    document.
+
+    The dictionary also records which places each toponym has been given, so re-running a dataset adds nothing that
+    is already in Vespa. Places are recorded only once their update has been fed (see `record`), so a failed,
+    interrupted or resumed run adds them again. The dictionary is seeded from the toponyms already in Vespa (see
+    `seed`), and the entries of a namespace are forgotten when its documents are deleted (see `forget`).
+
+    The dictionary is a SQLite database in WAL mode. Each process opens its own connection (worker processes
+    included), and every call is one transaction, so concurrent writers agree on the canonical toponym of each key.
+    """
+
+    BATCH_SIZE = 1000  # Toponyms per seeding transaction
+
+    def __init__(self, path):
+        """
+        :param path: Path of the SQLite database file (created if missing).
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        # Autocommit mode: transactions are begun explicitly, as IMMEDIATE, so that writers queue on the busy timeout
+        self._connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS toponyms (
+                name TEXT NOT NULL,
+                language TEXT NOT NULL,
+                script TEXT NOT NULL,
+                namespace TEXT NOT NULL,
+                toponym_id TEXT NOT NULL,
+                PRIMARY KEY (name, language, script)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS toponyms_namespace ON toponyms (namespace);
+            CREATE TABLE IF NOT EXISTS memberships (
+                namespace TEXT NOT NULL,
+                toponym_id TEXT NOT NULL,
+                place_id TEXT NOT NULL,
+                PRIMARY KEY (namespace, toponym_id, place_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS seeded (
+                namespace TEXT PRIMARY KEY
+            ) WITHOUT ROWID;
+        """)
+
+    @staticmethod
+    def key(fields):
+        """
+        :param fields: Toponym fields.
+        :return: The dictionary key of a toponym, or None if it has no name.
+        """
+        name = fields.get("name_strict")
+        if not name:
+            return None
+        return name, fields.get("bcp47_language") or "", fields.get("bcp47_script") or ""
+
+    def _transaction(self, function, *args):
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = function(*args)
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+            return result
+
+    def _add_places(self, namespace, toponym_id, place_ids):
+        self._connection.executemany("INSERT OR IGNORE INTO memberships VALUES (?, ?, ?)",
+                                     ((namespace, toponym_id, place_id) for place_id in place_ids))
+
+    def _new_places(self, namespace, toponym_id, place_ids, pending) -> list:
+        """
+        :param pending: Set of (namespace, toponym_id, place_id) tuples already added by the current call.
+        :return: Those of the place IDs neither recorded for the toponym nor pending, now pending.
+        """
+        new = []
+        for place_id in place_ids:
+            membership = (namespace, toponym_id, place_id)
+            if membership in pending or self._connection.execute(
+                    "SELECT 1 FROM memberships WHERE namespace = ? AND toponym_id = ? AND place_id = ?",
+                    membership).fetchone():
+                continue
+            pending.add(membership)
+            new.append(place_id)
+        return new
+
+    def deduplicate(self, namespace, results) -> list:
+        """
+        Resolves the toponyms of transformed records against the dictionary, adding any keys that are new. Places
+        are not recorded here: `record` the updates once they have been fed.
+
+        :param namespace: Namespace of the records.
+        :param results: List of (place, toponyms, links) tuples, as produced by the transformers.
+        :return: List of (place, toponyms, links) tuples, where:
+            - the `toponym_id` of each name of the place is that of the canonical toponym;
+            - toponyms are partial updates of their canonical toponym, assigning its fields and adding any place not
+              yet recorded for it with `{"places": {"add": [...]}}`. A toponym that would add nothing to a canonical
+              toponym other than itself is dropped. Updates of toponyms of other namespaces carry their "namespace".
+        """
+        return self._transaction(self._deduplicate, namespace, results)
+
+    def _deduplicate(self, namespace, results):
+        deduplicated = []
+        pending = set()
+        for place, toponyms, links in results:
+            remapped = {}
+            updates = []
+            for toponym in toponyms or []:
+                fields = toponym.get("fields", {})
+                key = self.key(fields)
+                if key is None:
+                    updates.append(toponym)
+                    continue
+                row = self._connection.execute(
+                    "SELECT namespace, toponym_id FROM toponyms WHERE name = ? AND language = ? AND script = ?", key
+                ).fetchone()
+                if row is None:
+                    row = (namespace, toponym["id"])
+                    self._connection.execute("INSERT INTO toponyms VALUES (?, ?, ?, ?, ?)", (*key, *row))
+                canonical_namespace, canonical_id = row
+                if canonical_id != toponym["id"]:
+                    remapped[toponym["id"]] = canonical_id
+
+                places = self._new_places(canonical_namespace, canonical_id, fields.get("places", []), pending)
+                if not places and canonical_id != toponym["id"]:
+                    continue
+                update = {"id": canonical_id,
+                          "fields": {field: value for field, value in fields.items() if field != "places"}}
+                update["fields"]["is_staging"] = False
+                if places:
+                    update["fields"]["places"] = {"add": places}
+                if canonical_namespace != namespace:
+                    update["namespace"] = canonical_namespace
+                updates.append(update)
+
+            if remapped and place:
+                for name in place.get("fields", {}).get("names", []):
+                    name["toponym_id"] = remapped.get(name.get("toponym_id"), name.get("toponym_id"))
+            deduplicated.append((place, updates, links))
+        return deduplicated
+
+    def record(self, namespace, updates):
+        """
+        Records the places added by toponym updates that have been fed successfully.
+
+        :param namespace: Namespace of the feed (that of updates without a "namespace").
+        :param updates: List of toponym updates, as returned by `deduplicate`.
+        """
+        def insert():
+            for update in updates:
+                places = update["fields"].get("places")
+                if isinstance(places, dict):
+                    self._add_places(update.get("namespace", namespace), update["id"], places.get("add", []))
+
+        self._transaction(insert)
+
+    def _insert(self, namespace, toponyms):
+        for toponym_id, fields in toponyms:
+            key = self.key(fields)
+            if key is None:
+                continue
+            self._connection.execute("INSERT OR IGNORE INTO toponyms VALUES (?, ?, ?, ?, ?)",
+                                     (*key, namespace, toponym_id))
+            self._add_places(namespace, toponym_id, fields.get("places", []))
+
+    async def seed(self, feeder, slices=8) -> int:
+        """
+        Adds the unstaged toponyms of a namespace in Vespa to the dictionary, and marks the namespace as seeded. Keys
+        already in the dictionary keep their canonical toponym.
+
+        :param feeder: An open DocumentFeeder for the namespace.
+        :param slices: Number of slices visited concurrently.
+        :return: Number of toponyms visited.
+        """
+        count = 0
+        batch = []
+        async for document in feeder.visit("toponym", selection="toponym.is_staging==false",
+                                           field_set="toponym:name_strict,bcp47_language,bcp47_script,places",
+                                           slices=slices):
+            batch.append((document["id"].split("::")[-1], document.get("fields", {})))
+            if len(batch) >= self.BATCH_SIZE:
+                count += len(batch)
+                await asyncio.to_thread(self._transaction, self._insert, feeder.namespace, batch)
+                batch = []
+        if batch:
+            count += len(batch)
+            await asyncio.to_thread(self._transaction, self._insert, feeder.namespace, batch)
+        await asyncio.to_thread(self._transaction, self._connection.execute,
+                                "INSERT OR IGNORE INTO seeded VALUES (?)", (feeder.namespace,))
+        logger.info(f"Seeded toponym dictionary {self.path} with {count} toponyms from {feeder.namespace}")
+        return count
+
+    def seeded(self) -> set:
+        """
+        :return: Set of the namespaces seeded since they were last forgotten.
+        """
+        with self._lock:
+            return {namespace for (namespace,) in self._connection.execute("SELECT namespace FROM seeded")}
+
+    def forget(self, namespace):
+        """
+        Removes the toponyms of a namespace (e.g. after its documents have been deleted), so that it is seeded again
+        before the dictionary is next used. The places of the namespace recorded for toponyms of other namespaces are
+        kept, as those toponyms still list them.
+        """
+        def delete():
+            self._connection.execute("DELETE FROM toponyms WHERE namespace = ?", (namespace,))
+            self._connection.execute("DELETE FROM memberships WHERE namespace = ?", (namespace,))
+            self._connection.execute("DELETE FROM seeded WHERE namespace = ?", (namespace,))
+
+        self._transaction(delete)
+        logger.info(f"Removed the toponyms of {namespace} from toponym dictionary {self.path}")
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
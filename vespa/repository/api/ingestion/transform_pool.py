@@ -0,0 +1,205 @@
+# /ingestion/transform_pool.py
+import asyncio
+import collections
+import json
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from .config import REMOTE_DATASET_CONFIGS
+from .toponym_dictionary import ToponymDictionary
+from .transformers import DocTransformer
+
+logger = logging.getLogger(__name__)
+
+# Per-process state, set once by `_initialise_worker`
+_dataset_name = None
+_transformer_index = None
+_filters = None
+_namespace = None
+_toponym_dictionary = None
+
+
+def _initialise_worker(dataset_name, transformer_index, toponym_dictionary_path=None):
+    """
+    Runs once in each worker process. Transformers are imported with this module, and the (unpicklable) filter
+    lambdas are looked up from the dataset configuration rather than being sent from the parent. Each worker opens its
+    own connection to the toponym dictionary, if one is used.
+    """
+    global _dataset_name, _transformer_index, _filters, _namespace, _toponym_dictionary
+    _dataset_name = dataset_name
+    _transformer_index = transformer_index
+    config = next(config for config in REMOTE_DATASET_CONFIGS if config['dataset_name'] == dataset_name)
+    _filters = config['files'][transformer_index].get('filters')
+    _namespace = config['namespace']
+    _toponym_dictionary = ToponymDictionary(toponym_dictionary_path) if toponym_dictionary_path else None
+
+
+def _deduplicate(results):
+    return _toponym_dictionary.deduplicate(_namespace, results) if _toponym_dictionary and results else results
+
+
+def _transform_chunk(documents):
+    """
+    Filters and transforms a chunk of raw records in a worker process.
+
+    :param documents: List of raw records.
+    :return: Tuple of:
+        - list of (place, toponyms, links) tuples for the records that passed the filters, in input order;
+        - list of the number of raw records up to and including the record of each result.
+    """
+    results = []
+    positions = []
+    for position, document in enumerate(documents, 1):
+        if _filters and not any(f(document) for f in _filters):
+            continue
+        results.append(DocTransformer.transform(document, _dataset_name, _transformer_index))
+        positions.append(position)
+    return _deduplicate(results), positions
+
+
+def _transform_shard(shard):
+    """
+    Reads, filters and transforms every record of a StreamShard in a worker process. The results are serialized in the
+    worker, so that the parent only has to write them out.
+
+    :param shard: A StreamShard.
+    :return: Tuple of:
+        - dictionary of doc type to NDJSON payload (empty string if none);
+        - dictionary of doc type to document count;
+        - number of raw records in the shard.
+    """
+    lines = {"place": [], "toponym": [], "link": []}
+    record_count = 0
+    results = []
+
+    def serialize():
+        for place, toponyms, links in _deduplicate(results):
+            if place:
+                lines["place"].append(json.dumps(place))
+            for toponym in toponyms or []:
+                lines["toponym"].append(json.dumps(toponym))
+            for link in links or []:
+                lines["link"].append(json.dumps(link))
+        results.clear()
+
+    for document in shard.iter_items():
+        record_count += 1
+        if _filters and not any(f(document) for f in _filters):
+            continue
+        results.append(DocTransformer.transform(document, _dataset_name, _transformer_index))
+        if len(results) >= 1000:  # Bounds the size of each toponym dictionary transaction
+            serialize()
+    serialize()
+    payloads = {doc_type: "\n".join(doc_lines) + "\n" if doc_lines else "" for doc_type, doc_lines in lines.items()}
+    return payloads, {doc_type: len(doc_lines) for doc_type, doc_lines in lines.items()}, record_count
+
+
+class ParallelTransformer:
+    """
+    Transforms a stream of raw records in a pool of worker processes.
+
+    Records are read from the async stream in chunks, and up to `2 * workers` chunks are submitted to the pool at any
+    time. Results are yielded in the original record order, so that output files are identical to a serial run.
+
+    Usage:
+        async with ParallelTransformer(dataset_name, transformer_index, workers=16) as transformer:
+            async for results, positions, record_count in transformer.transform(stream):
+                ...
+    """
+
+    def __init__(self, dataset_name, transformer_index, workers, chunk_size=500, toponym_dictionary_path=None):
+        """
+        :param dataset_name: Name of the dataset.
+        :param transformer_index: Index of the transformer (and of the file configuration).
+        :param workers: Number of worker processes.
+        :param chunk_size: Number of raw records sent to a worker per task.
+        :param toponym_dictionary_path: Optional path of a ToponymDictionary applied to the results by the workers.
+        """
+        self.dataset_name = dataset_name
+        self.transformer_index = transformer_index
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.toponym_dictionary_path = toponym_dictionary_path
+        self.executor = None
+
+    async def __aenter__(self):
+        # `forkserver` avoids forking the event loop process while writer and executor threads are running
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("forkserver"),
+            initializer=_initialise_worker,
+            initargs=(self.dataset_name, self.transformer_index, self.toponym_dictionary_path),
+        )
+        logger.info(f"Started {self.workers} transformation worker processes")
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        executor, self.executor = self.executor, None
+        # Any chunks still queued are no longer needed (e.g. the limit was reached)
+        await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+        return False
+
+    async def transform(self, stream):
+        """
+        Yields, for each chunk of raw records in input order, a tuple of:
+            - the list of (place, toponyms, links) results for the records that passed the filters;
+            - the list of the number of raw records of the chunk up to and including the record of each result (the
+              records consumed if processing stops after that result);
+            - the number of raw records in the chunk.
+
+        :param stream: Async iterator of raw records.
+        """
+        loop = asyncio.get_running_loop()
+        in_flight = collections.deque()
+        max_in_flight = 2 * self.workers
+        chunk = []
+
+        try:
+            async for document in stream:
+                chunk.append(document)
+                if len(chunk) < self.chunk_size:
+                    continue
+                in_flight.append((loop.run_in_executor(self.executor, _transform_chunk, chunk), len(chunk)))
+                chunk = []
+                if len(in_flight) >= max_in_flight:
+                    future, count = in_flight.popleft()
+                    results, positions = await future
+                    yield results, positions, count
+
+            if chunk:
+                in_flight.append((loop.run_in_executor(self.executor, _transform_chunk, chunk), len(chunk)))
+            while in_flight:
+                future, count = in_flight.popleft()
+                results, positions = await future
+                yield results, positions, count
+        finally:
+            for future, _ in in_flight:
+                future.cancel()
+
+    async def transform_shards(self, shards):
+        """
+        Yields, for each shard in order, a tuple of (payloads, counts, record_count, shard) as returned by
+        `_transform_shard`. Each shard is read and transformed entirely by one worker process; up to `2 * workers`
+        shards are in flight at any time.
+
+        :param shards: List of StreamShard objects.
+        """
+        loop = asyncio.get_running_loop()
+        in_flight = collections.deque()
+        max_in_flight = 2 * self.workers
+
+        try:
+            for shard in shards:
+                in_flight.append((loop.run_in_executor(self.executor, _transform_shard, shard), shard))
+                if len(in_flight) >= max_in_flight:
+                    future, completed_shard = in_flight.popleft()
+                    payloads, counts, record_count = await future
+                    yield payloads, counts, record_count, completed_shard
+            while in_flight:
+                future, completed_shard = in_flight.popleft()
+                payloads, counts, record_count = await future
+                yield payloads, counts, record_count, completed_shard
+        finally:
+            for future, _ in in_flight:
+                future.cancel()
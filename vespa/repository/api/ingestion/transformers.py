@@ -2,22 +2,23 @@
 import json
 import logging
 
-from subtransformers.geonames.names import NamesProcessor as GeonamesNamesProcessor
-from subtransformers.loc.links import LinksProcessor as LOCLinksProcessor
-from subtransformers.osm.names import NamesProcessor as OSMNamesProcessor
-from subtransformers.osm.types import TypesProcessor as OSMTypesProcessor
-from subtransformers.pleiades.links import LinksProcessor as PleiadesLinksProcessor
-from subtransformers.pleiades.locations import LocationsProcessor as PleiadesLocationsProcessor
-from subtransformers.pleiades.names import NamesProcessor as PleiadesNamesProcessor
-from subtransformers.pleiades.types import TypesProcessor as PleiadesTypesProcessor
-from subtransformers.pleiades.years import YearsProcessor as PleiadesYearsProcessor
-from subtransformers.tgn.linked_art import LinkedArtProcessor
-from subtransformers.wikidata.locations import LocationsProcessor as WikidataLocationsProcessor
-from subtransformers.wikidata.names import NamesProcessor as WikidataNamesProcessor
-from subtransformers.wikidata.types import TypesProcessor as WikidataTypesProcessor
+from .subtransformers.geonames.names import NamesProcessor as GeonamesNamesProcessor
+from .subtransformers.loc.links import LinksProcessor as LOCLinksProcessor
+from .subtransformers.osm.names import NamesProcessor as OSMNamesProcessor
+from .subtransformers.osm.types import TypesProcessor as OSMTypesProcessor
+from .subtransformers.pleiades.links import LinksProcessor as PleiadesLinksProcessor
+from .subtransformers.pleiades.locations import LocationsProcessor as PleiadesLocationsProcessor
+from .subtransformers.pleiades.names import NamesProcessor as PleiadesNamesProcessor
+from .subtransformers.pleiades.types import TypesProcessor as PleiadesTypesProcessor
+from .subtransformers.pleiades.years import YearsProcessor as PleiadesYearsProcessor
+from .subtransformers.points import PointBatchProcessor
+from .subtransformers.tgn.linked_art import LinkedArtProcessor
+from .subtransformers.wikidata.locations import LocationsProcessor as WikidataLocationsProcessor
+from .subtransformers.wikidata.names import NamesProcessor as WikidataNamesProcessor
+from .subtransformers.wikidata.types import TypesProcessor as WikidataTypesProcessor
 from ..gis.processor import GeometryProcessor
 from ..gis.utils import geo_to_cartesian
-from ..utils import get_uuid
+from ..utils import get_stable_id
 
 logger = logging.getLogger(__name__)
 
@@ -77,12 +78,13 @@ class DocTransformer:
         "LPF": [  # Linked Places Format: default transformer for extended GeoJSON Feature
             lambda data: (
                 {  # Feature and Locations
-                    "id": (document_id := get_uuid()),
+                    "id": (document_id := get_stable_id(
+                        "lpf", data.get("@id") or data.get("id") or json.dumps(data, sort_keys=True, default=str))),
                     "fields": {
                         "names": [
                             # TODO: Code a general ToponymProcessor to produce names and attestations
-                            {"toponym_id": (toponym_id := get_uuid()), "year_start": 2018, "year_end": 2018,
-                             "is_preferred": 1},
+                            {"toponym_id": (toponym_id := get_stable_id("lpf", document_id, "toponym")),
+                             "year_start": 2018, "year_end": 2018, "is_preferred": 1},
                         ],
                         **(geometry_etc if (  # Includes abstracted geometry properties and array of locations
                             geometry_etc := GeometryProcessor(data.get("geometry")).process()) else {}),
@@ -102,11 +104,12 @@ class DocTransformer:
         "ISO3166": [
             lambda data: (
                 {
-                    "id": (document_id := get_uuid()),
+                    "id": (document_id := get_stable_id("iso3166", data.get("properties", {}).get("ADMIN"))),
                     "fields": {
                         "names": [
-                            {"toponym_id": (toponym_id := get_uuid()), "year_start": 2018, "year_end": 2018,
-                             "is_preferred": 1},
+                            {"toponym_id": (toponym_id := get_stable_id(
+                                "iso3166", document_id, data.get("properties", {}).get("ADMIN"), "en")),
+                             "year_start": 2018, "year_end": 2018, "is_preferred": 1},
                         ],
                         "meta": json.dumps({
                             "ISO_A2": data.get("properties", {}).get("ISO_A2"),
@@ -140,7 +143,7 @@ class DocTransformer:
             # TODO: Before running this, augment the types dictionary
             lambda data: (
                 {
-                    "id": (document_id := get_uuid()),
+                    "id": (document_id := get_stable_id("pleiades", data.get("id"))),
                     "fields": {
                         **({"record_id": record_id} if (record_id := data.get("id")) else {}),
                         **({"record_url": f"https://pleiades.stoa.org/places/{record_id}"} if record_id else {}),
@@ -165,12 +168,14 @@ class DocTransformer:
             # All geometries are points, so the following is much more efficient than using the GeometryProcessor
             lambda data: (  # Transform the primary record
                 {
-                    "id": (document_id := data.get("geonameid", get_uuid())),
+                    "id": (document_id := data.get("geonameid") or get_stable_id(
+                        "gn", json.dumps(data, sort_keys=True, default=str))),
                     "fields": {
                         **({"record_id": record_id} if (record_id := data.get("geonameid")) else {}),
                         **({"record_url": f"https://www.geonames.org/{record_id}"} if record_id else {}),
                         "names": [
-                            {"toponym_id": (toponym_id := get_uuid()), "year_start": 2025, "year_end": 2025},
+                            {"toponym_id": (toponym_id := get_stable_id("gn", document_id, data.get("name", ""), "en")),
+                             "year_start": 2025, "year_end": 2025},
                         ],
                         **({"bbox_sw_lat": bbox_sw_lat} if (bbox_sw_lat := float(data.get("latitude"))) else {}),
                         **({"bbox_sw_lng": bbox_sw_lng} if (bbox_sw_lng := float(data.get("longitude"))) else {}),
@@ -206,7 +211,7 @@ class DocTransformer:
             ),
             lambda data: (  # Transform the alternate names
                 {
-                    "id": get_uuid(),
+                    "id": get_stable_id("gn", data.get("geonameid"), "alternate", data.get("alternateNameId")),
                     "fields": {
                         "is_staging": True,
                         "record_id": (document_id := data.get("geonameid")),
@@ -233,7 +238,8 @@ class DocTransformer:
         "Wikidata": [  # Depends on GeoNames having been already processed
             lambda data: (
                 {
-                    "id": (document_id := data.get("id", get_uuid())),
+                    "id": (document_id := data.get("id") or get_stable_id(
+                        "wd", json.dumps(data, sort_keys=True, default=str))),
                     "fields": {
                         "record_id": document_id,
                         "record_url": f"https://www.wikidata.org/wiki/Special:EntityData/{document_id}.json",
@@ -258,7 +264,9 @@ class DocTransformer:
         "OSM": [
             lambda data: (
                 {  # Feature and Locations
-                    "id": (document_id := get_uuid()),
+                    # Features are exported by osmium with `--add-unique-id=type_id`, e.g. "n123" or "w456"
+                    "id": (document_id := get_stable_id(
+                        "osm", data.get("id") or json.dumps(data.get("properties"), sort_keys=True, default=str))),
                     "fields": {
                         **({"names": names["names"]} if (
                             names := OSMNamesProcessor(document_id,
@@ -278,9 +286,12 @@ class DocTransformer:
                 names["toponyms"] if names else None,
                 [  # Links
                     {
-                        "place_id": document_id,
-                        "predicate": "owl:sameAs",
-                        "object": f"wd:{wikidata}",
+                        "id": get_stable_id("osm", document_id, "owl:sameAs", f"wd:{wikidata}"),
+                        "fields": {
+                            "place_id": document_id,
+                            "predicate": "owl:sameAs",
+                            "object": f"wd:{wikidata}",
+                        }
                     }
                 ] if (wikidata := properties.get("wikidata")) else []
             )
@@ -298,11 +309,14 @@ class DocTransformer:
             # All geometries are points
             lambda data: (
                 {
-                    "id": (document_id := data.get("pin_id", get_uuid())),
+                    "id": (document_id := data.get("pin_id") or get_stable_id(
+                        "GB1900", json.dumps(data, sort_keys=True, default=str))),
                     "fields": {
                         "record_id": document_id,
                         "names": [
-                            {"toponym_id": (toponym_id := get_uuid()), "year_start": 1888, "year_end": 1914},
+                            {"toponym_id": (toponym_id := get_stable_id("GB1900", document_id,
+                                                                        data.get("final_text", ""), "en")),
+                             "year_start": 1888, "year_end": 1914},
                         ],
                         **({"bbox_sw_lat": bbox_sw_lat} if (bbox_sw_lat := float(data.get("latitude"))) else {}),
                         **({"bbox_sw_lng": bbox_sw_lng} if (bbox_sw_lng := float(data.get("longitude"))) else {}),
@@ -339,7 +353,7 @@ class DocTransformer:
         "Terrarium": [  # GeoJSON detailing sources of DEM data
             lambda data: (
                 {
-                    "id": get_uuid(),
+                    "id": get_stable_id("terrarium", json.dumps(data, sort_keys=True, default=str)),
                     "fields": {
                         **({"geometry": geometry_etc.get("locations")[0].get("geometry")} if (
                             geometry_etc := GeometryProcessor(data.get("geometry"),
@@ -370,3 +384,31 @@ class DocTransformer:
         results = transformer(data)
         # logger.info(f"Transformed data: {results}")
         return results
+
+    # Columnar transformers, each taking a pyarrow.RecordBatch of source rows and returning a list of (place, toponyms,
+    # links) tuples. A dataset opts in by listing one per file (None for files that are transformed row by row); they
+    # are used when the file is read as RecordBatches (see `StreamFetcher.get_batches`) and has no row filters.
+    batch_transformers = {
+        "GeoNames": [
+            lambda batch: PointBatchProcessor(
+                batch, "gn", id_column="geonameid", name_column="name", year_start=2025, year_end=2025,
+                record_url="https://www.geonames.org/{id}", class_column="feature_class", ccode_column="country_code",
+            ).process(),
+            None,  # Alternate names are transformed row by row
+        ],
+        "GB1900": [
+            lambda batch: PointBatchProcessor(
+                batch, "GB1900", id_column="pin_id", name_column="final_text", year_start=1888, year_end=1914,
+                ccodes=["GB"],
+            ).process(),
+        ],
+    }
+
+    @staticmethod
+    def supports_batches(dataset_name, transformer_index=0):
+        transformers = DocTransformer.batch_transformers.get(dataset_name, [])
+        return transformer_index < len(transformers) and transformers[transformer_index] is not None
+
+    @staticmethod
+    def transform_batch(batch, dataset_name, transformer_index=0):
+        return DocTransformer.batch_transformers[dataset_name][transformer_index](batch)
@@ -0,0 +1,186 @@
+# /ingestion/writer.py
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class TransformedDocumentWriter:
+    """
+    Writes transformed documents to their per-doc-type NDJSON output files.
+
+    Serialized records are batched in memory and handed to a dedicated writer thread through a bounded queue, so the
+    event loop never blocks on disk I/O and each output file is opened only once for the whole run. Files are opened
+    lazily on their first write, so a doc type that produces no documents leaves no output file behind.
+
+    Usage:
+        async with TransformedDocumentWriter(output_files) as writer:
+            await writer.write('place', place)
+    """
+
+    _SENTINEL = object()
+
+    def __init__(self, output_files, batch_size=1000, queue_size=64):
+        """
+        :param output_files: Mapping of doc type to output file path.
+        :param batch_size: Number of serialized records to accumulate per doc type before queueing a write.
+        :param queue_size: Maximum number of batches waiting for the writer thread (bounds memory use).
+        """
+        self.output_files = output_files
+        self.batch_size = batch_size
+        self.batches = {doc_type: [] for doc_type in output_files}
+        self.counts = {doc_type: 0 for doc_type in output_files}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._handles = {}
+        self._error = None
+        self._thread = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+        return False
+
+    def start(self):
+        """
+        Starts the writer thread.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="transformed-document-writer", daemon=True)
+            self._thread.start()
+
+    async def write(self, doc_type, document):
+        """
+        Serializes a document and adds it to the batch for its doc type, queueing the batch when full.
+
+        :param doc_type: One of the keys of `output_files`.
+        :param document: JSON-serializable document.
+        """
+        self._raise_if_failed()
+        batch = self.batches[doc_type]
+        batch.append(json.dumps(document))
+        self.counts[doc_type] += 1
+        if len(batch) >= self.batch_size:
+            await self._enqueue(doc_type)
+
+    async def write_serialized(self, doc_type, payload, count):
+        """
+        Queues an already-serialized NDJSON payload (e.g. produced by a worker process) for its doc type, after any
+        records buffered before it.
+
+        :param doc_type: One of the keys of `output_files`.
+        :param payload: Newline-terminated NDJSON records.
+        :param count: Number of records in the payload.
+        """
+        self._raise_if_failed()
+        if not payload:
+            return
+        if self.batches[doc_type]:
+            await self._enqueue(doc_type)
+        self.counts[doc_type] += count
+        await self._put((doc_type, payload))
+
+    async def flush(self):
+        """
+        Queues all partially-filled batches.
+        """
+        for doc_type in self.batches:
+            if self.batches[doc_type]:
+                await self._enqueue(doc_type)
+
+    async def sync(self):
+        """
+        Flushes all buffered records and waits until the writer thread has written them and flushed the files, so that
+        the output file sizes reflect every record passed to `write` so far.
+        """
+        self._raise_if_failed()
+        await self.flush()
+        written = threading.Event()
+        await asyncio.to_thread(self._queue.put, written)
+        await asyncio.to_thread(written.wait)
+        self._raise_if_failed()
+
+    def offsets(self) -> dict:
+        """
+        :return: Current byte size of each output file (0 if not yet created). Only consistent after `sync`.
+        """
+        return {
+            doc_type: os.path.getsize(path) if os.path.exists(path) else 0
+            for doc_type, path in self.output_files.items()
+        }
+
+    async def close(self):
+        """
+        Flushes any buffered records, waits for the writer thread to finish and closes all output files.
+        Safe to call after a failure: whatever was buffered is still written before the files are closed.
+        """
+        if self._thread is None:
+            return
+        try:
+            if self._error is None:
+                await self.flush()
+        finally:
+            await asyncio.to_thread(self._queue.put, self._SENTINEL)
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+            logger.info(f"Closed transformed output files: {self.counts}")
+        self._raise_if_failed()
+
+    async def _enqueue(self, doc_type):
+        payload = "\n".join(self.batches[doc_type]) + "\n"
+        self.batches[doc_type] = []
+        await self._put((doc_type, payload))
+
+    async def _put(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # Apply backpressure without blocking the event loop
+            await asyncio.to_thread(self._queue.put, item)
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise RuntimeError(f"Transformed document writer failed: {self._error}") from self._error
+
+    def _run(self):
+        """
+        Writer thread: drains the queue until the sentinel is received, then closes all handles.
+        """
+        try:
+            while True:
+                item = self._queue.get()
+                if item is self._SENTINEL:
+                    break
+                if isinstance(item, threading.Event):  # Sync marker: everything queued before it has been written
+                    try:
+                        for handle in self._handles.values():
+                            handle.flush()
+                    except Exception as e:
+                        logger.error(f"Error flushing output files: {e}", exc_info=True)
+                        self._error = e
+                    item.set()
+                    continue
+                if self._error is not None:
+                    continue  # Keep draining so that producers are never left blocked on a full queue
+                doc_type, payload = item
+                try:
+                    handle = self._handles.get(doc_type)
+                    if handle is None:
+                        handle = self._handles[doc_type] = open(self.output_files[doc_type], "a", encoding="utf-8")
+                    handle.write(payload)
+                except Exception as e:
+                    logger.error(f"Error writing {doc_type} batch: {e}", exc_info=True)
+                    self._error = e
+        finally:
+            for doc_type, handle in self._handles.items():
+                try:
+                    handle.close()
+                except Exception as e:
+                    logger.error(f"Error closing {self.output_files[doc_type]}: {e}")
+            self._handles = {}
@@ -162,7 +162,10 @@ async def ingest_dataset(
         no_delete: bool = Query(False, description="Do not delete existing data"),
         skip_transform: bool = Query(False, description="Skip transformation if file found"),
         condense_only: bool = Query(False, description="Condense existing toponyms without ingestion"),
-        convert_triples: bool = Query(False, description="Convert triples to JSON-LD")
+        convert_triples: bool = Query(False, description="Convert triples to JSON-LD"),
+        resume: bool = Query(False, description="Resume an interrupted ingestion from its checkpoints"),
+        delta: bool = Query(False, description="Feed only new or changed documents and delete vanished ones"),
+        seed_toponyms: bool = Query(False, description="Re-seed the toponym dictionary from all toponyms in Vespa")
 ):
     """
     Ingest a dataset by name with an optional limit parameter.
@@ -176,11 +179,16 @@ async def ingest_dataset(
         skip_transform: If True, skip transformation if file found.
         condense_only: If True, condense existing toponyms without ingestion.
         convert_triples: If True, convert triples to JSON-LD.
+        resume: If True, skip records already transformed and fed by an interrupted run (existing data is kept).
+        delta: If True, feed only documents that are new or changed since the last delta run, and delete vanished ones.
+        seed_toponyms: If True, first re-seed the toponym dictionary with the toponyms of every namespace in Vespa
+            (namespaces not yet seeded are seeded automatically).
     """
     task_id = get_uuid()  # Generate a unique task ID
 
     ingestion_manager = IngestionManager(dataset_name, task_id, limit, delete_only, no_delete, skip_transform,
-                                         condense_only, convert_triples)
+                                         condense_only, convert_triples, resume=resume, delta=delta,
+                                         seed_toponyms=seed_toponyms)
 
     # Start the ingestion in the background
     background_tasks.add_task(ingestion_manager.ingest_data)
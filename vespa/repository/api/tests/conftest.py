@@ -0,0 +1,132 @@
+# /tests/conftest.py
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class FileServer(ThreadingHTTPServer):
+    """
+    Local HTTP server of one file, recording every request it receives.
+
+    Its behaviour can be adjusted by tests:
+        - `head_status`: status returned to HEAD requests instead of the headers (e.g. 405 to reject them);
+        - `ranges`: whether range requests are honoured (otherwise the whole file is returned);
+        - `drop_after`: bytes after which the connection of the next GET is dropped, simulating an interruption.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, content, etag='"v1"'):
+        super().__init__(("127.0.0.1", 0), FileRequestHandler)
+        self.content = content
+        self.etag = etag
+        self.last_modified = "Mon, 01 Jan 2024 00:00:00 GMT"
+        self.head_status = None
+        self.ranges = True
+        self.drop_after = None
+        self.files = {}  # Other paths served, e.g. checksum files
+        self.requests = []  # (method, path, headers) tuples
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/data/file.bin"
+
+    def url_of(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+    def ranges_requested(self):
+        return [headers.get("Range") for method, path, headers in self.requests
+                if method == "GET" and path == "/data/file.bin"]
+
+
+class FileRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _record(self):
+        with self.server.lock:
+            self.server.requests.append((self.command, self.path, dict(self.headers)))
+
+    def _send_headers(self, status, length, extra=None):
+        self.send_response(status)
+        self.send_header("Content-Length", str(length))
+        self.send_header("ETag", self.server.etag)
+        self.send_header("Last-Modified", self.server.last_modified)
+        if self.server.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        for name, value in (extra or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def _not_modified(self):
+        if self.headers.get("If-None-Match") == self.server.etag:
+            self.send_response(304)
+            self.send_header("ETag", self.server.etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return True
+        return False
+
+    def do_HEAD(self):
+        self._record()
+        if self.server.head_status:
+            self.send_response(self.server.head_status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if not self._not_modified():
+            self._send_headers(200, len(self.server.content))
+
+    def do_GET(self):
+        self._record()
+        if self.path in self.server.files:
+            body = self.server.files[self.path]
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if self._not_modified():
+            return
+        content = self.server.content
+        start, end = 0, len(content) - 1
+        status, extra = 200, {}
+        if self.server.ranges and (header := self.headers.get("Range")):
+            first, _, last = header.removeprefix("bytes=").partition("-")
+            start, end = int(first), min(int(last) if last else end, len(content) - 1)
+            status, extra = 206, {"Content-Range": f"bytes {start}-{end}/{len(content)}"}
+        body = content[start:end + 1]
+        with self.server.lock:
+            drop_after, self.server.drop_after = self.server.drop_after, None
+        self._send_headers(status, len(body), extra)
+        if drop_after is not None and drop_after < len(body):
+            self.wfile.write(body[:drop_after])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def content():
+    return bytes(range(256)) * 1200  # 300 KiB
+
+
+@pytest.fixture
+def file_server(content):
+    server = FileServer(content)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def sha256(content):
+    return f"sha256:{hashlib.sha256(content).hexdigest()}"
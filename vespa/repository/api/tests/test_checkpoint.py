@@ -0,0 +1,218 @@
+# /tests/test_checkpoint.py
+import asyncio
+import json
+
+import pytest
+
+from ..ingestion import processor
+from ..ingestion.checkpoint import IngestionCheckpoint
+from ..ingestion.processor import IngestionManager, TransformationManager
+from ..ingestion.streamer import StreamFetcher
+from ..utils import get_uuid
+
+DATASET = "CheckpointTest"
+RECORDS = 2500
+
+
+class InterruptedTransformation(Exception):
+    pass
+
+
+class FakeFeeder:
+    """
+    Stands in for a DocumentFeeder: records the items fed, and optionally stops after `fail_after` of them, having
+    reported its progress as a real feed does.
+    """
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.items = []
+        self.starts = []
+
+    async def feed(self, doc_type, stream, start=0, on_progress=None, on_success=None):
+        self.starts.append(start)
+        position = start
+        async for item in stream:
+            if self.fail_after is not None and position - start >= self.fail_after:
+                raise ConnectionError("Feed interrupted")
+            self.items.append(item)
+            position += 1
+            if on_success:
+                on_success(item)
+            if on_progress:
+                on_progress(position)
+        return {"success": position - start, "failure": 0, "position": position}
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source.ndjson"
+    with open(path, "w") as f:
+        for i in range(RECORDS):
+            f.write(json.dumps({"id": f"r{i}", "name": f"Name {i}"}) + "\n")
+    return str(path)
+
+
+@pytest.fixture
+def failing(monkeypatch, source):
+    """
+    Registers the test dataset, transformed by a simple transformer that raises on the record IDs in the set.
+    """
+    failing = set()
+
+    def transform(document, dataset_name, transformer_index):
+        if document["id"] in failing:
+            raise InterruptedTransformation(document["id"])
+        place = {"id": document["id"], "fields": {"names": [{"toponym_id": f"t{document['id']}"}]}}
+        toponym = {"id": f"t{document['id']}", "fields": {"name_strict": document["name"], "places": [document["id"]]}}
+        return place, [toponym], None
+
+    config = {"dataset_name": DATASET, "namespace": "checkpoint-test", "vespa_schema": "place",
+              "files": [{"url": source, "file_type": "ndjson"}]}
+    monkeypatch.setattr(processor, "REMOTE_DATASET_CONFIGS", [config])
+    monkeypatch.setattr(processor.DocTransformer, "transform", staticmethod(transform))
+    return failing
+
+
+def transform(source, limit=None, resume=False):
+    """
+    Runs the transformation stage of one file as `IngestionManager._process_dataset` does, with checkpoints saved at
+    every opportunity.
+
+    :return: The IngestionManager, with its TransformationManager.
+    """
+    manager = IngestionManager(DATASET, get_uuid(), limit=limit, resume=resume)
+    manager.transformer_index = 0
+    manager.transformation_manager = TransformationManager(source, DATASET, 0, manager.task_id, resume=resume)
+    manager.transformation_manager.checkpoint.interval = 0
+
+    async def run():
+        stream_fetcher = StreamFetcher({"url": source, "file_type": "ndjson"})
+        try:
+            async with manager.transformation_manager:
+                await manager._transform_documents(stream_fetcher.get_items())
+        finally:
+            stream_fetcher.close_stream()
+
+    asyncio.run(run())
+    return manager
+
+
+def feed(manager, doc_type, feeder):
+    transformation_manager = manager.transformation_manager
+
+    async def run():
+        stream_fetcher = StreamFetcher({"url": transformation_manager.output_files[doc_type], "file_type": "ndjson"})
+        stream = stream_fetcher.get_items()
+        try:
+            await manager._feed_documents(doc_type, stream, feeder, transformation_manager.checkpoint)
+        finally:
+            await stream.aclose()
+            stream_fetcher.close_stream()
+
+    asyncio.run(run())
+
+
+def ids(path):
+    with open(path) as f:
+        return [json.loads(line)["id"] for line in f]
+
+
+def saved_checkpoint(source):
+    checkpoint = IngestionCheckpoint(source.replace(".ndjson", "_transformed_0_checkpoint.json"))
+    assert checkpoint.load()
+    return checkpoint
+
+
+def test_complete_run(failing, source):
+    manager = transform(source)
+
+    assert ids(manager.transformation_manager.output_files["place"]) == [f"r{i}" for i in range(RECORDS)]
+    checkpoint = saved_checkpoint(source)
+    assert checkpoint.transform_complete
+    assert checkpoint.source_records == RECORDS
+
+
+def test_interrupted_run_is_resumed_from_checkpoint(failing, source):
+    failing.add("r2200")
+    with pytest.raises(InterruptedTransformation):
+        transform(source)
+
+    # Checkpointed before record 2000 (the last save point); output written after it is discarded on resumption
+    checkpoint = saved_checkpoint(source)
+    assert not checkpoint.transform_complete
+    assert checkpoint.source_records == 1999
+    place_file = source.replace(".ndjson", "_transformed_0_place.ndjson")
+    assert len(ids(place_file)) > 1999
+
+    failing.clear()
+    manager = transform(source, resume=True)
+
+    for doc_type, prefix in [("place", "r"), ("toponym", "tr")]:
+        assert ids(manager.transformation_manager.output_files[doc_type]) == [f"{prefix}{i}" for i in range(RECORDS)]
+    checkpoint = saved_checkpoint(source)
+    assert checkpoint.transform_complete
+    assert checkpoint.source_records == RECORDS
+    with open(place_file, "rb") as f:
+        assert checkpoint.output_offsets["place"] == len(f.read())
+
+
+def test_limited_run_is_not_complete(failing, source):
+    manager = transform(source, limit=10)
+
+    assert ids(manager.transformation_manager.output_files["place"]) == [f"r{i}" for i in range(10)]
+    checkpoint = saved_checkpoint(source)
+    assert not checkpoint.transform_complete
+    assert checkpoint.source_records == 10
+
+    feeder = FakeFeeder()
+    feed(manager, "place", feeder)
+    assert [item["id"] for item in feeder.items] == [f"r{i}" for i in range(10)]
+    assert manager.transformation_manager.checkpoint.fed("place") == 10
+    assert not manager.transformation_manager.checkpoint.feed_complete("place")
+
+    # A resumed run transforms the rest of the source, and feeds only what the limited run did not
+    manager = transform(source, resume=True)
+    assert ids(manager.transformation_manager.output_files["place"]) == [f"r{i}" for i in range(RECORDS)]
+    assert saved_checkpoint(source).transform_complete
+
+    feeder = FakeFeeder()
+    feed(manager, "place", feeder)
+    assert feeder.starts == [10]
+    assert [item["id"] for item in feeder.items] == [f"r{i}" for i in range(10, RECORDS)]
+    assert saved_checkpoint(source).feed_complete("place")
+
+
+def test_interrupted_feed_is_resumed_per_doc_type(failing, source):
+    manager = transform(source)
+    feed(manager, "place", FakeFeeder())
+    with pytest.raises(ConnectionError):
+        feed(manager, "toponym", FakeFeeder(fail_after=100))
+
+    checkpoint = saved_checkpoint(source)
+    assert checkpoint.feed_complete("place")
+    assert not checkpoint.feed_complete("toponym")
+    assert checkpoint.fed("toponym") == 100
+
+    manager = transform(source, resume=True)  # Transformation is complete, so the output is kept as it is
+    assert ids(manager.transformation_manager.output_files["toponym"]) == [f"tr{i}" for i in range(RECORDS)]
+
+    feeder = FakeFeeder()
+    feed(manager, "toponym", feeder)
+    assert feeder.starts == [100]
+    assert [item["id"] for item in feeder.items] == [f"tr{i}" for i in range(100, RECORDS)]
+    checkpoint = saved_checkpoint(source)
+    assert checkpoint.feed_complete("toponym")
+    assert checkpoint.fed("toponym") == RECORDS
+
+
+def test_run_without_resume_starts_afresh(failing, source):
+    failing.add("r2200")
+    with pytest.raises(InterruptedTransformation):
+        transform(source)
+
+    failing.clear()
+    manager = transform(source)
+
+    assert ids(manager.transformation_manager.output_files["place"]) == [f"r{i}" for i in range(RECORDS)]
+    assert saved_checkpoint(source).transform_complete
@@ -0,0 +1,173 @@
+# /tests/test_downloader.py
+import hashlib
+import json
+import os
+
+import pytest
+
+from ..ingestion import downloader
+from ..ingestion.downloader import DownloadManager
+
+SEGMENT_SIZE = 64 * 1024
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setattr(DownloadManager, "SEGMENT_SIZE", SEGMENT_SIZE)
+    monkeypatch.setattr(downloader.time, "sleep", lambda seconds: None)  # No backoff between retries
+    return DownloadManager(connections=4, timeout=5, max_retries=2)
+
+
+@pytest.fixture
+def file_path(tmp_path):
+    return str(tmp_path / "file.bin")
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def manifest_of(file_path):
+    with open(f"{file_path}.download.json") as f:
+        return json.load(f)
+
+
+def test_ranged_download(manager, file_server, file_path, content, sha256):
+    assert manager.download(file_server.url, file_path, checksum=sha256) == file_path
+
+    assert read(file_path) == content
+    assert not os.path.exists(f"{file_path}.part")
+    assert sorted(file_server.ranges_requested(), key=lambda r: int(r[6:].split("-")[0])) == [
+        f"bytes={start}-{min(start + SEGMENT_SIZE, len(content)) - 1}"
+        for start in range(0, len(content), SEGMENT_SIZE)
+    ]
+    manifest = manifest_of(file_path)
+    assert manifest["complete"] is True
+    assert manifest["size"] == len(content)
+    assert manifest["etag"] == file_server.etag
+    assert manifest["checksum"] == sha256
+    assert manifest["segments"] is None
+
+
+def test_resumes_from_manifest(manager, file_server, file_path, content):
+    # An interrupted download: the first segment is complete, the second is half done, the rest are not started
+    half = SEGMENT_SIZE // 2
+    segments = [[start, min(start + SEGMENT_SIZE, len(content)), 0] for start in range(0, len(content), SEGMENT_SIZE)]
+    segments[0][2] = SEGMENT_SIZE
+    segments[1][2] = half
+    with open(f"{file_path}.part", "wb") as f:
+        f.write(content[:SEGMENT_SIZE + half])
+        f.write(b"\0" * (len(content) - SEGMENT_SIZE - half))
+    with open(f"{file_path}.download.json", "w") as f:
+        json.dump({"url": file_server.url, "etag": file_server.etag, "last_modified": file_server.last_modified,
+                   "size": len(content), "complete": False, "segments": segments}, f)
+
+    manager.download(file_server.url, file_path)
+
+    assert read(file_path) == content
+    ranges = file_server.ranges_requested()
+    assert f"bytes={SEGMENT_SIZE + half}-{2 * SEGMENT_SIZE - 1}" in ranges
+    assert not any(r.startswith("bytes=0-") for r in ranges)
+    assert manifest_of(file_path)["complete"] is True
+
+
+def test_restarts_when_remote_file_changed(manager, file_server, file_path, content):
+    with open(f"{file_path}.part", "wb") as f:
+        f.write(b"\xff" * len(content))
+    with open(f"{file_path}.download.json", "w") as f:
+        json.dump({"url": file_server.url, "etag": '"v0"', "size": len(content), "complete": False,
+                   "segments": [[0, len(content), len(content) // 2]]}, f)
+
+    manager.download(file_server.url, file_path)
+
+    assert read(file_path) == content
+    assert f"bytes=0-{SEGMENT_SIZE - 1}" in file_server.ranges_requested()
+
+
+def test_interrupted_segment_resumes_at_completed_offset(monkeypatch, manager, file_server, file_path, content):
+    monkeypatch.setattr(DownloadManager, "CHUNK_SIZE", 256)
+    manager.connections = 1
+    file_server.drop_after = 1000
+
+    manager.download(file_server.url, file_path)
+
+    assert read(file_path) == content
+    first, retry = file_server.ranges_requested()[:2]
+    assert first == f"bytes=0-{SEGMENT_SIZE - 1}"
+    start, _, end = retry.removeprefix("bytes=").partition("-")
+    assert 0 < int(start) <= 1000 and int(end) == SEGMENT_SIZE - 1  # Resumed after the chunks received
+
+
+def test_unchanged_file_is_revalidated_not_fetched(manager, file_server, file_path, content):
+    manager.download(file_server.url, file_path)
+    file_server.requests.clear()
+
+    manager.download(file_server.url, file_path)
+
+    assert [(method, headers.get("If-None-Match")) for method, path, headers in file_server.requests] == [
+        ("HEAD", file_server.etag)]
+    assert read(file_path) == content
+
+
+def test_changed_file_is_fetched_again(manager, file_server, file_path, content):
+    manager.download(file_server.url, file_path)
+    file_server.content = content[::-1]
+    file_server.etag = '"v2"'
+
+    manager.download(file_server.url, file_path)
+
+    assert read(file_path) == content[::-1]
+    assert manifest_of(file_path)["etag"] == '"v2"'
+
+
+def test_checksum_mismatch(manager, file_server, file_path):
+    with pytest.raises(IOError, match="Checksum mismatch"):
+        manager.download(file_server.url, file_path, checksum=f"sha256:{'0' * 64}")
+
+    assert not os.path.exists(file_path)
+    assert not os.path.exists(f"{file_path}.part")
+    assert manifest_of(file_path)["complete"] is False
+
+
+def test_checksum_from_published_file(manager, file_server, file_path, content):
+    digest = hashlib.md5(content).hexdigest()
+    file_server.files["/data/md5sums.txt"] = f"{'1' * 32}  other.bin\n{digest}  file.bin\n".encode()
+
+    manager.download(file_server.url, file_path, checksum_url=file_server.url_of("/data/md5sums.txt"))
+
+    assert manifest_of(file_path)["checksum"] == f"md5:{digest}"
+
+
+@pytest.mark.parametrize("status", [403, 405])
+def test_head_rejected_probes_with_range_request(manager, file_server, file_path, content, sha256, status):
+    file_server.head_status = status
+
+    manager.download(file_server.url, file_path, checksum=sha256)
+
+    assert read(file_path) == content
+    ranges = file_server.ranges_requested()
+    assert ranges[0] == "bytes=0-0"
+    assert f"bytes=0-{SEGMENT_SIZE - 1}" in ranges
+    assert manifest_of(file_path)["size"] == len(content)
+
+
+def test_head_rejected_without_range_support(manager, file_server, file_path, content):
+    file_server.head_status = 405
+    file_server.ranges = False
+
+    manager.download(file_server.url, file_path)
+
+    assert read(file_path) == content
+    assert file_server.ranges_requested() == ["bytes=0-0", None]
+
+
+def test_head_rejected_revalidation(manager, file_server, file_path):
+    manager.download(file_server.url, file_path)
+    file_server.head_status = 405
+    file_server.requests.clear()
+
+    manager.download(file_server.url, file_path)
+
+    assert [(method, headers.get("Range")) for method, path, headers in file_server.requests] == [
+        ("HEAD", None), ("GET", "bytes=0-0")]
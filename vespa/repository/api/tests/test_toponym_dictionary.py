@@ -0,0 +1,150 @@
+# /tests/test_toponym_dictionary.py
+import asyncio
+
+import pytest
+
+from ..ingestion.toponym_dictionary import ToponymDictionary
+
+
+@pytest.fixture
+def dictionary(tmp_path):
+    dictionary = ToponymDictionary(str(tmp_path / "toponym_dictionary.sqlite"))
+    yield dictionary
+    dictionary.close()
+
+
+def toponym(toponym_id, name, places, language="en"):
+    return {"id": toponym_id, "fields": {"name_strict": name, "name": name, "bcp47_language": language,
+                                         "places": places, "is_staging": True}}
+
+
+def record(place_id, *toponyms):
+    place = {"id": place_id, "fields": {"names": [{"toponym_id": t["id"]} for t in toponyms]}}
+    return place, list(toponyms), None
+
+
+def name_ids(result):
+    return [name["toponym_id"] for name in result[0]["fields"]["names"]]
+
+
+class FakeFeeder:
+    def __init__(self, namespace, documents):
+        self.namespace = namespace
+        self.documents = documents
+
+    async def visit(self, doc_type, selection=None, field_set=None, slices=1):
+        for document in self.documents:
+            yield document
+
+
+def test_new_toponym_becomes_canonical(dictionary):
+    [result] = dictionary.deduplicate("gn", [record("P1", toponym("t1", "London", ["P1"]))])
+
+    assert name_ids(result) == ["t1"]
+    assert result[1] == [{"id": "t1", "fields": {"name_strict": "London", "name": "London", "bcp47_language": "en",
+                                                 "is_staging": False, "places": {"add": ["P1"]}}}]
+
+
+def test_duplicate_toponym_is_remapped_to_canonical(dictionary):
+    results = dictionary.deduplicate("gn", [
+        record("P1", toponym("t1", "London", ["P1"])),
+        record("P2", toponym("t2", "London", ["P2"])),
+        record("P3", toponym("t3", "London", ["P3"], language="fr")),  # Another key
+    ])
+
+    assert [name_ids(result) for result in results] == [["t1"], ["t1"], ["t3"]]
+    assert [[(u["id"], u["fields"]["places"]) for u in result[1]] for result in results] == [
+        [("t1", {"add": ["P1"]})], [("t1", {"add": ["P2"]})], [("t3", {"add": ["P3"]})]]
+
+
+def test_update_adding_nothing_is_dropped(dictionary):
+    results = dictionary.deduplicate("gn", [
+        record("P1", toponym("t1", "London", ["P1"])),
+        record("P1", toponym("t2", "London", ["P1"])),  # Same place for the same canonical toponym
+    ])
+
+    assert name_ids(results[1]) == ["t1"]
+    assert results[1][1] == []
+
+
+def test_toponym_without_name_is_kept(dictionary):
+    unnamed = {"id": "t0", "fields": {"places": ["P1"], "is_staging": True}}
+    [result] = dictionary.deduplicate("gn", [record("P1", unnamed)])
+
+    assert result[1] == [unnamed]
+
+
+def test_canonical_toponym_of_another_namespace(dictionary):
+    dictionary.deduplicate("gn", [record("P1", toponym("t1", "London", ["P1"]))])
+
+    [result] = dictionary.deduplicate("wd", [record("Q1", toponym("w1", "London", ["Q1"]))])
+
+    assert name_ids(result) == ["t1"]
+    assert result[1] == [{"id": "t1", "namespace": "gn",
+                          "fields": {"name_strict": "London", "name": "London", "bcp47_language": "en",
+                                     "is_staging": False, "places": {"add": ["Q1"]}}}]
+
+
+def test_places_are_recorded_only_once_fed(dictionary):
+    records = [record("P1", toponym("t1", "London", ["P1"])), record("P2", toponym("t2", "London", ["P2"]))]
+    first = dictionary.deduplicate("gn", records)
+
+    # Nothing recorded yet (e.g. the feed failed): a re-run adds the places again
+    again = dictionary.deduplicate("gn", records)
+    assert [result[1] for result in again] == [result[1] for result in first]
+
+    # Only the first update was fed successfully
+    dictionary.record("gn", first[0][1])
+    again = dictionary.deduplicate("gn", records)
+    assert "places" not in again[0][1][0]["fields"]  # The canonical toponym is still given its fields
+    assert again[1][1] == [first[1][1][0]]
+
+    dictionary.record("gn", again[1][1])
+    again = dictionary.deduplicate("gn", records)
+    assert [[(u["id"], "places" in u["fields"]) for u in result[1]] for result in again] == [[("t1", False)], []]
+
+
+def test_places_of_another_namespace_are_recorded_against_it(dictionary):
+    dictionary.deduplicate("gn", [record("P1", toponym("t1", "London", ["P1"]))])
+    [result] = dictionary.deduplicate("wd", [record("Q1", toponym("w1", "London", ["Q1"]))])
+
+    dictionary.record("wd", result[1])
+
+    [result] = dictionary.deduplicate("wd", [record("Q1", toponym("w1", "London", ["Q1"]))])
+    assert result[1] == []
+    dictionary.forget("wd")  # The places of wd recorded for toponyms of gn are kept
+    [result] = dictionary.deduplicate("wd", [record("Q1", toponym("w1", "London", ["Q1"]))])
+    assert result[1] == []
+
+
+def test_seed_and_forget(dictionary):
+    documents = [{"id": "id:pl:toponym::x1", "fields": {"name_strict": "Roma", "bcp47_language": "it",
+                                                         "places": ["R1"]}}]
+    assert asyncio.run(dictionary.seed(FakeFeeder("pl", documents))) == 1
+    assert dictionary.seeded() == {"pl"}
+
+    # Seeded toponyms are canonical, and their places in Vespa are not added again
+    [result] = dictionary.deduplicate("gn", [
+        record("R1", toponym("g1", "Roma", ["R1"], language="it")),
+    ])
+    assert name_ids(result) == ["x1"]
+    assert result[1] == []
+    [result] = dictionary.deduplicate("gn", [record("R2", toponym("g2", "Roma", ["R2"], language="it"))])
+    assert [(u["id"], u["namespace"], u["fields"]["places"]) for u in result[1]] == [("x1", "pl", {"add": ["R2"]})]
+
+    dictionary.forget("pl")
+    assert dictionary.seeded() == set()
+    [result] = dictionary.deduplicate("gn", [record("R1", toponym("g1", "Roma", ["R1"], language="it"))])
+    assert name_ids(result) == ["g1"]
+    assert result[1][0]["fields"]["places"] == {"add": ["R1"]}
+
+
+def test_dictionary_is_shared_between_connections(dictionary):
+    other = ToponymDictionary(dictionary.path)
+    try:
+        dictionary.deduplicate("gn", [record("P1", toponym("t1", "London", ["P1"]))])
+        [result] = other.deduplicate("gn", [record("P2", toponym("t2", "London", ["P2"]))])
+    finally:
+        other.close()
+
+    assert name_ids(result) == ["t1"]
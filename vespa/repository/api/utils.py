@@ -24,6 +24,16 @@ class TaskTracker:
             "unstaged_places": 0,
             "unstaged_links": 0,
             "processed_triples": 0,
+            "cached_triples": 0,
+            "unchanged_places": 0,
+            "unchanged_toponyms": 0,
+            "unchanged_links": 0,
+            "deleted_places": 0,
+            "deleted_toponyms": 0,
+            "deleted_links": 0,
+            "updated_places": 0,
+            "updated_toponyms": 0,
+            "updated_links": 0,
             "success": 0,
             "failure": 0,
             "errors": [],
@@ -47,6 +57,16 @@ class TaskTracker:
                     "unstaged_places",
                     "unstaged_links",
                     "processed_triples",
+                    "cached_triples",
+                    "unchanged_places",
+                    "unchanged_toponyms",
+                    "unchanged_links",
+                    "deleted_places",
+                    "deleted_toponyms",
+                    "deleted_links",
+                    "updated_places",
+                    "updated_toponyms",
+                    "updated_links",
                     "success",
                     "failure"
                 }:
@@ -93,6 +113,20 @@ def get_uuid() -> str:
     return str(uuid.uuid4())
 
 
+# Fixed UUID namespace for deterministic document identifiers (see `get_stable_id`): never change this value, or every
+# re-ingested document will be given a new ID.
+STABLE_ID_NAMESPACE = uuid.UUID("5b0f6a0e-3c1d-4a57-9d0b-2e8c7f41b6a3")
+
+
+def get_stable_id(namespace: str, *parts) -> str:
+    """
+    Generate a deterministic identifier from a Vespa namespace and source-derived parts: a record ID for places, or
+    the distinguishing content of a toponym or link. Re-ingesting the same source record yields the same document IDs,
+    so that feeding becomes an upsert.
+    """
+    return str(uuid.uuid5(STABLE_ID_NAMESPACE, "\x1f".join([namespace, *("" if p is None else str(p) for p in parts)])))
+
+
 def escape_match_yql(text: str) -> str:
     """
     Quote " and backslash \ characters in text values must be escaped by a backslash